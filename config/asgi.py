@@ -13,4 +13,16 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Импорт после get_asgi_application(): приложения Django уже загружены
+from rooms.realtime import websocket_application  # noqa: E402
+
+
+async def application(scope, receive, send):
+    # HTTP (включая SSE /api/rooms/<slug>/events/) обслуживает Django,
+    # WebSocket /ws/rooms/<slug>/ — подписка на события комнаты
+    if scope['type'] == 'websocket':
+        await websocket_application(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -53,6 +53,13 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
 # CORS должен быть как можно выше
     'corsheaders.middleware.CorsMiddleware',
+    # Сразу после CORS: общее время запроса включает все остальные middleware (core/middleware.py)
+    'core.middleware.RequestTimingMiddleware',
+    'core.middleware.ProfilingMiddleware',
+    # До SessionMiddleware/AuthenticationMiddleware: их чтения тоже маршрутизируются
+    'core.middleware.ReplicaRoutingMiddleware',
+    # Сжимает готовое тело: ниже по списку тело уже не меняется
+    'core.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
 
     'django.middleware.security.SecurityMiddleware',
@@ -100,6 +107,23 @@ DATABASES = {
         'PORT': '5432',
     }
 }
+# Реплика для чтения (core/routers.py). Локально указывает на ту же БД — так маршрутизацию
+# можно проверить без настоящей репликации; на проде замените HOST на адрес реплики.
+# В тестах это зеркало 'default'. Включается списком READ_REPLICAS['ALIASES'].
+DATABASES['replica'] = {
+    **DATABASES['default'],
+    'TEST': {'MIRROR': 'default'},
+}
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+# --- РЕПЛИКИ ДЛЯ ЧТЕНИЯ ---
+# ALIASES — алиасы из DATABASES для чтений GET/HEAD/OPTIONS (пусто — все идет в 'default').
+# После успешной записи клиент PIN_SECONDS секунд читает из основной БД (cookie COOKIE_NAME).
+READ_REPLICAS = {
+    'ALIASES': [],
+    'PIN_SECONDS': 5,
+    'COOKIE_NAME': 'primary_pin',
+}
 
 
 # Password validation
@@ -153,6 +177,11 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.AllowAny', # Пока разрешаем всем (для тестов)
     ),
+    # orjson вместо стандартного json, вывод тот же (core/renderers.py)
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
 # --- DJOSER (AUTH) ---
@@ -175,4 +204,125 @@ SIMPLE_JWT = {
     'ROTATE_REFRESH_TOKENS': True, # При обновлении токена старый сразу умирает
     'BLACKLIST_AFTER_ROTATION': True, # И попадает в черный список
     'UPDATE_LAST_LOGIN': True,
-}
\ No newline at end of file
+    # email и display_name в токене: view комнат не читают пользователя из БД (users/authentication.py)
+    'TOKEN_OBTAIN_SERIALIZER': 'users.serializers.ClaimsTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'users.serializers.ClaimsTokenRefreshSerializer',
+}
+
+# --- TOKEN BLACKLIST ---
+# Пользователь из claims access-токена без SELECT (users/authentication.py): алиас общего для всех
+# процессов кэша (Redis) для отметок об изменении пользователя. Кэш процесса не подходит —
+# проверка users.E002. None — пользователь загружается из БД на каждый запрос.
+USERS_JWT_CLAIMS = {
+    'CACHE': None,
+}
+
+# Черный список JTI в кэше (users/tokens.py): алиас общего для всех процессов кэша без вытеснения
+# ключей (Redis с noeviction), например 'CACHE': 'shared' при
+# CACHES['shared'] = {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://...'}.
+# Кэш процесса (LocMemCache) не подходит — проверка users.E001. None — проверять по таблицам
+# token_blacklist, как в simplejwt.
+# Просроченные токены чистит и кэш прогревает `python manage.py purge_expired_tokens`
+# (cron чаще READY_TTL, например каждые 10 минут).
+USERS_TOKEN_BLACKLIST = {
+    'CACHE': None,
+    'READY_TTL': 900,  # секунд: без нового прогрева проверка возвращается в БД
+}
+
+# --- REAL-TIME (SSE / WebSocket) ---
+# InMemoryBroker работает в пределах одного процесса.
+# Для нескольких воркеров: 'BACKEND': 'rooms.realtime.RedisBroker', 'OPTIONS': {'url': 'redis://...'}
+ROOMS_REALTIME = {
+    'BACKEND': 'rooms.realtime.InMemoryBroker',
+    'OPTIONS': {'max_queue': 100},
+    # Срок жизни билета подписки (?ticket=) для вошедших пользователей: EventSource не шлет Authorization
+    'TICKET_TTL': 60,
+}
+
+# --- CACHES ---
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Кэш сериализованных комнат (rooms/cache.py): TTL 5 минут, LRU-вытеснение сверх MAX_ENTRIES.
+    # Для нескольких узлов: 'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+    #                      'LOCATION': 'redis://127.0.0.1:6379/1'
+    'rooms': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'rooms-payload',
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
+}
+ROOMS_PAYLOAD_CACHE = 'rooms'
+
+# --- ПРИЕМ ГОЛОСОВ ---
+# 'sync' — голос пишется в БД в рамках запроса (201).
+# 'buffered' — проверка по состоянию в памяти, ответ 202 и пакетная запись в фоне
+# (гарантии и ограничения описаны в rooms/ingest.py).
+ROOMS_VOTE_INGESTION = {
+    'MODE': 'sync',
+    'BATCH_SIZE': 500,
+    'FLUSH_INTERVAL': 0.2,  # секунд
+    'MAX_PENDING': 10000,
+    'STATE_TTL': 2.0,  # секунд
+    'VOTED_TTL': 300.0,  # секунд: множества проголосовавших перечитываются из БД
+    'STATE_MAX_ENTRIES': 10000,  # ключей в каждом кэше состояния процесса
+}
+
+# --- СЖАТИЕ ОТВЕТОВ ---
+# brotli (если установлен пакет brotli) или gzip по Accept-Encoding, только JSON от MIN_SIZE байт
+# (core/compression.py). Ответы /api/auth/ с токенами не сжимаются (BREACH).
+RESPONSE_COMPRESSION = {
+    'MIN_SIZE': 1024,  # байт
+    'GZIP_LEVEL': 6,
+    'BROTLI_QUALITY': 5,
+    'CONTENT_TYPES': ['application/json'],
+    'EXCLUDE_PATHS': ['/api/auth/'],
+}
+
+# --- ЗАМЕРЫ ЗАПРОСОВ ---
+# Server-Timing (db / serialize / auth / total) и журнал медленных запросов (core/middleware.py).
+# SAMPLE_RATE — доля запросов с подробным замером; вне выборки считается только общее время.
+# Заголовок Server-Timing раскрывает внутренности (число SQL, время частей), поэтому отдается
+# всем только при SERVER_TIMING (по умолчанию — в DEBUG), а в проде — сотруднику (is_staff),
+# приславшему заголовок "X-Server-Timing: 1". Журнал медленных запросов остается на сервере.
+REQUEST_TIMING = {
+    'SAMPLE_RATE': 1.0 if DEBUG else 0.1,
+    'SERVER_TIMING': DEBUG,
+    'SLOW_MS': 500,
+    'SLOW_DB_MS': 200,
+    'SLOW_QUERIES': 50,
+    'TOP_STATEMENTS': 5,
+    'N_PLUS_ONE': 10,  # повторов одного SQL-шаблона за запрос
+}
+
+# --- ПРОФИЛИРОВАНИЕ ---
+# Профиль запроса по требованию: заголовок "X-Profile: 1" (или ?_profile=1) от сотрудника (is_staff).
+# Случайная выборка для прода: SAMPLE_RATE > 0 — доля запросов к SAMPLED_VIEWS, не чаще одного
+# профиля в MIN_INTERVAL секунд на процесс. Профили — в админке, хранятся последние KEEP.
+PROFILING = {
+    'SAMPLE_RATE': 0.0,
+    'SAMPLED_VIEWS': ['RoomViewSet', 'VoteCreateView'],
+    'MIN_INTERVAL': 60,  # секунд
+    'KEEP': 500,
+}
+
+# --- METRICS ---
+# GET /metrics (Prometheus). Под gunicorn с несколькими воркерами перед стартом задайте
+# PROMETHEUS_MULTIPROC_DIR — пустой каталог, общий для воркеров (см. core/metrics.py).
+# Строка — /metrics доступен только с заголовком "Authorization: Bearer <METRICS_TOKEN>";
+# None — открыт всем (закрывайте на прокси).
+METRICS_TOKEN = None
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # Одна JSON-строка на медленный запрос — удобно разбирать сборщиком логов
+        'core.slow_requests': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+    },
+}
@@ -2,6 +2,8 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from core.views import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
 
@@ -14,4 +16,7 @@ urlpatterns = [
 
     # 3. Комнаты и голосование
     path('api/', include('rooms.urls')),
+
+    # 4. Метрики Prometheus (core/metrics.py)
+    path('metrics', metrics_view, name='metrics'),
 ]
\ No newline at end of file
@@ -0,0 +1,46 @@
+from django.contrib import admin
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
+
+from .models import Profile
+
+
+@admin.register(Profile)
+class ProfileAdmin(admin.ModelAdmin):
+    list_display = ['created_at', 'view', 'path', 'status_code', 'duration_ms', 'queries', 'trigger', 'user', 'download']
+    list_filter = ['trigger', 'view']
+    search_fields = ['path']
+    exclude = ['stats']
+    readonly_fields = [
+        'created_at', 'trigger', 'user', 'method', 'path', 'view', 'status_code', 'duration_ms', 'queries',
+        'download', 'summary',
+    ]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path(
+                '<int:pk>/download/', self.admin_site.admin_view(self.download_view), name='core_profile_download',
+            ),
+            *super().get_urls(),
+        ]
+
+    @admin.display(description='Профиль')
+    def download(self, obj):
+        url = reverse('admin:core_profile_download', args=[obj.pk])
+        return format_html('<a href="{}">.pstats</a>', url)
+
+    def download_view(self, request, pk):
+        if not self.has_view_permission(request):
+            return HttpResponse(status=403)
+        profile = get_object_or_404(Profile, pk=pk)
+        response = HttpResponse(bytes(profile.stats), content_type='application/octet-stream')
+        response['Content-Disposition'] = f'attachment; filename="profile-{profile.pk}.pstats"'
+        return response
@@ -1,5 +1,11 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from .timing import install_sql_recorder
+
+        connection_created.connect(install_sql_recorder, dispatch_uid='core.install_sql_recorder')
@@ -0,0 +1,151 @@
+"""
+Мелкие утилиты для бенчмарков (management-команды bench_*): замеры и перцентили.
+"""
+import asyncio
+import json
+import math
+import os
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def uses_test_database(using=connection):
+    """Подключение смотрит в тестовую БД (manage.py test): test_<имя>, TEST['NAME'] или SQLite в памяти."""
+    name = str(using.settings_dict['NAME'])
+    test_name = using.settings_dict.get('TEST', {}).get('NAME')
+    in_memory = getattr(using.creation, 'is_in_memory_db', lambda name: False)(name)
+    return in_memory or name == test_name or os.path.basename(name).startswith('test_')
+
+
+def require_disposable_database(force):
+    """
+    Бенчмарки, которые пишут в текущую БД, запускаются только при DEBUG, на тестовой БД
+    или с явным --force — чтобы случайный запуск не нагрузил и не засорил рабочую базу.
+    """
+    if force or settings.DEBUG or uses_test_database():
+        return
+    raise CommandError(
+        f"Команда пишет в БД '{connection.settings_dict['NAME']}'. Запускайте ее при DEBUG=True, "
+        "на тестовой БД или подтвердите запуск флагом --force."
+    )
+
+
+def percentile(sorted_samples, fraction):
+    """Перцентиль по уже отсортированной выборке (метод ближайшего ранга)."""
+    if not sorted_samples:
+        return 0.0
+    rank = max(math.ceil(fraction * len(sorted_samples)) - 1, 0)
+    return sorted_samples[rank]
+
+
+def summarize(samples, elapsed=None):
+    """Сводка по длительностям в секундах: p50/p95/p99/mean в миллисекундах и пропускная способность."""
+    ordered = sorted(samples)
+    elapsed = sum(ordered) if elapsed is None else elapsed
+    return {
+        'count': len(ordered),
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(ordered, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 3),
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0,
+        'throughput_per_s': round(len(ordered) / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+@contextmanager
+def stopwatch():
+    """with stopwatch() as elapsed: ...; elapsed() — секунды с начала блока (и после выхода)."""
+    started = time.perf_counter()
+    finished = []
+    yield lambda: (finished[0] if finished else time.perf_counter()) - started
+    finished.append(time.perf_counter())
+
+
+def measure_requests(send, iterations, expected=(200,)):
+    """
+    Выполняет send(index) iterations раз: сводка summarize() плюс SQL-запросов на запрос
+    (CaptureQueriesContext). Неожиданный статус ответа прерывает замер AssertionError.
+    """
+    samples, queries = [], []
+    with stopwatch() as elapsed:
+        for index in range(iterations):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = send(index)
+                samples.append(time.perf_counter() - started)
+            queries.append(len(captured.captured_queries))
+            assert response.status_code in expected, (response.status_code, response.content[:500])
+    return {
+        **summarize(samples, elapsed()),
+        'queries_mean': round(sum(queries) / len(queries), 2) if queries else 0.0,
+        'queries_max': max(queries, default=0),
+    }
+
+
+async def asgi_get(application, path, query_string='', headers=()):
+    """
+    Один GET к ASGI-приложению в текущем event loop — так запросы видит uvicorn.
+    Возвращает (статус, тело). headers — [(b'name', b'value'), ...].
+    """
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'query_string': query_string.encode(), 'root_path': '',
+        'headers': [(b'host', b'localhost'), *headers], 'client': ('127.0.0.1', 0), 'server': ('localhost', 80),
+    }
+    body_sent = False
+    disconnected = asyncio.Event()
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # Клиент "висит" на соединении до конца ответа
+        await disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    status, chunks = None, []
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+        elif message['type'] == 'http.response.body':
+            chunks.append(message.get('body', b''))
+
+    await application(scope, receive, send)
+    disconnected.set()
+    return status, b''.join(chunks)
+
+
+COMPARED_METRICS = ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_per_s', 'queries_mean')
+
+
+def compare_reports(baseline, current):
+    """Изменение метрик относительно прошлого прогона в процентах: {сценарий: {метрика: %}}."""
+    changes = {}
+    for name, row in current.items():
+        before = baseline.get(name)
+        if not isinstance(row, dict) or not isinstance(before, dict):
+            continue
+        changes[name] = {
+            f"{metric}_change_pct": round((row[metric] - before[metric]) / before[metric] * 100, 1)
+            for metric in COMPARED_METRICS
+            if before.get(metric) and metric in row
+        }
+    return changes
+
+
+def write_report(stdout, results, as_json=False):
+    """Печатает результаты таблицей или одним JSON-документом (для сравнения между коммитами)."""
+    if as_json:
+        stdout.write(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+    for name, row in results.items():
+        details = ", ".join(f"{key}={value}" for key, value in row.items())
+        stdout.write(f"{name}: {details}")
@@ -0,0 +1,108 @@
+"""
+Сжатие ответов API (CompressionMiddleware в core/middleware.py и готовые сжатые тела из кэша).
+
+Кодировка выбирается по Accept-Encoding с учетом q: brotli ('br'), если установлен пакет brotli
+и клиент его принимает, иначе gzip. Сжимаются только ответы с типом из CONTENT_TYPES и телом
+не меньше MIN_SIZE байт: на маленьких ответах сжатие не окупается. Потоковые ответы (выгрузка
+голосов, SSE) и ответы, у которых уже есть Content-Encoding, не трогаются.
+
+Настройка RESPONSE_COMPRESSION (config/settings.py). EXCLUDE_PATHS — префиксы путей, ответы
+которых не сжимаются: ответы /api/auth/ несут токены, а сжатие секрета рядом с данными из
+запроса открывает атаки вида BREACH.
+"""
+import gzip
+import re
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен: без него отдается только gzip
+    brotli = None
+
+DEFAULTS = {
+    'MIN_SIZE': 1024,
+    'GZIP_LEVEL': 6,
+    'BROTLI_QUALITY': 5,
+    'CONTENT_TYPES': ['application/json'],
+    'EXCLUDE_PATHS': ['/api/auth/'],
+}
+
+# Порядок — предпочтение сервера при равном q
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+_coding = re.compile(r'^\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?\s*$')
+
+
+def compression_settings():
+    return {**DEFAULTS, **getattr(settings, 'RESPONSE_COMPRESSION', {})}
+
+
+def negotiate(accept_encoding):
+    """Лучшая из поддерживаемых кодировок для заголовка Accept-Encoding или None."""
+    if not accept_encoding:
+        return None
+    weights = {}
+    for item in accept_encoding.split(','):
+        match = _coding.match(item)
+        if not match:
+            continue
+        try:
+            weights[match[1].lower()] = float(match[2]) if match[2] else 1.0
+        except ValueError:
+            continue
+    best, best_weight = None, 0.0
+    for encoding in ENCODINGS:
+        weight = weights.get(encoding, weights.get('*', 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def compress(body, encoding, config):
+    """(примененная кодировка или None, тело). Маленькие и несжимаемые тела возвращаются как есть."""
+    if encoding is None or len(body) < config['MIN_SIZE']:
+        return None, body
+    if encoding == 'br':
+        compressed = brotli.compress(body, mode=brotli.MODE_TEXT, quality=config['BROTLI_QUALITY'])
+    else:
+        # mtime=0 — одинаковый вход дает одинаковые байты
+        compressed = gzip.compress(body, compresslevel=config['GZIP_LEVEL'], mtime=0)
+    if len(compressed) >= len(body):
+        return None, body
+    return encoding, compressed
+
+
+def is_compressible(request, response, config):
+    if response.streaming or response.has_header('Content-Encoding'):
+        return False
+    content_type = response.get('Content-Type', '').split(';')[0].strip()
+    if content_type not in config['CONTENT_TYPES']:
+        return False
+    return not any(request.path.startswith(prefix) for prefix in config['EXCLUDE_PATHS'])
+
+
+def encoded_response(body, encoding, content_type='application/json'):
+    """Ответ с уже закодированным телом (например, из кэша сжатых ответов)."""
+    response = HttpResponse(body, content_type=content_type)
+    if encoding is not None:
+        response['Content-Encoding'] = encoding
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def compress_response(request, response, config):
+    patch_vary_headers(response, ('Accept-Encoding',))
+    encoding, body = compress(response.content, negotiate(request.headers.get('Accept-Encoding')), config)
+    if encoding is None:
+        return response
+    response.content = body
+    response['Content-Length'] = str(len(body))
+    response['Content-Encoding'] = encoding
+    # Сжатое тело отличается побайтно — строгий ETag становится слабым (как в GZipMiddleware)
+    etag = response.get('ETag')
+    if etag and etag.startswith('"'):
+        response['ETag'] = 'W/' + etag
+    return response
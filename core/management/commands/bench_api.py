@@ -0,0 +1,172 @@
+import json
+import random
+import subprocess
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.bench import compare_reports, measure_requests, require_disposable_database, write_report
+from rooms.ingest import ingestion_settings
+from rooms.models import Choice, Room, Vote
+from rooms.seeding import SEED_PASSWORD, user_name
+
+SCENARIOS = (
+    'room_list', 'room_detail_guest', 'room_detail_creator', 'room_detail_voter',
+    'vote', 'ban', 'token_refresh',
+)
+ROOM_SAMPLE = 100
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный замер API комнат через настоящий URLconf (APIClient, все middleware и "
+        "аутентификация): список и детальная страница комнаты (гость, создатель, голосовавший), "
+        "голос, бан, обновление токена. Нужен набор seed_rooms с тем же --prefix. "
+        "Сценарии vote/ban добавляют в набор голоса и баны с уникальными никами прогона, поэтому "
+        "команда запускается только при DEBUG, на тестовой БД или с --force."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', default='seed', help="Префикс набора seed_rooms.")
+        parser.add_argument('--requests', type=int, default=200, help="Запросов на сценарий.")
+        parser.add_argument('--warmup', type=int, default=10, help="Запросов прогрева (не учитываются).")
+        parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+        parser.add_argument('--seed', type=int, default=0, help="Seed выбора комнат (воспроизводимость).")
+        parser.add_argument('--output', help="Сохранить отчет в JSON-файл (база для --compare).")
+        parser.add_argument('--compare', help="JSON-отчет прошлого прогона: изменения метрик в процентах.")
+        parser.add_argument('--json', action='store_true', help="Вывести результат в JSON.")
+        parser.add_argument('--force', action='store_true', help="Запустить на рабочей БД (без DEBUG).")
+
+    def handle(self, *args, **options):
+        require_disposable_database(options['force'])
+        prefix = options['prefix']
+        rng = random.Random(options['seed'])
+        rooms = list(
+            Room.objects.filter(slug__startswith=f"{prefix}-room-").order_by('pk')
+            .only('pk', 'slug', 'creator')[:ROOM_SAMPLE]
+        )
+        if not rooms:
+            raise CommandError(f"Набор '{prefix}' не найден: python manage.py seed_rooms --prefix {prefix}")
+        rng.shuffle(rooms)
+        self.prefix = prefix
+        self.run_id = time.time_ns()
+
+        scenarios = self.build_scenarios(rooms)
+        results = {}
+        for name in options['scenarios']:
+            if name not in scenarios:
+                self.stderr.write(f"{name}: пропущен — в наборе нет подходящих данных.")
+                continue
+            send, expected = scenarios[name]
+            warmup, requests = options['warmup'], options['requests']
+            # Прогрев берет индексы после основных, чтобы ники vote/ban не повторялись
+            measure_requests(lambda index: send(requests + index), warmup, expected)
+            results[name] = measure_requests(send, requests, expected)
+
+        report = {'meta': self.meta(options), 'scenarios': results}
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as baseline:
+                report['comparison'] = compare_reports(json.load(baseline)['scenarios'], results)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(report, output, ensure_ascii=False, indent=2)
+
+        if options['json']:
+            write_report(self.stdout, report, as_json=True)
+        else:
+            comparison = {f"{name} (vs baseline)": row for name, row in report.get('comparison', {}).items()}
+            write_report(self.stdout, {**results, **comparison})
+
+    def login(self, email):
+        client = APIClient(SERVER_NAME='localhost')
+        response = client.post('/api/auth/jwt/create/', {'email': email, 'password': SEED_PASSWORD}, format='json')
+        if response.status_code != 200:
+            raise CommandError(f"Не удалось войти как {email}: {response.status_code} {response.content[:200]}")
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        return client, response.data['refresh']
+
+    def build_scenarios(self, rooms):
+        """{сценарий: (send(index) -> response, ожидаемые статусы)}."""
+        anonymous = APIClient(SERVER_NAME='localhost')
+        room = rooms[0]
+        own_rooms = [other for other in rooms if other.creator == room.creator]
+        creator, _ = self.login(f"{room.creator}@seed.local")
+        choice_ids = list(
+            Choice.objects.filter(question__room__in=rooms, question__is_active=True)
+            .order_by('pk').values_list('pk', flat=True)
+        )
+        voter_email = (
+            Vote.objects.filter(question__room=room, user__isnull=False)
+            .order_by('pk').values_list('user__email', flat=True).first()
+        )
+
+        scenarios = {
+            'room_list': (lambda index: anonymous.get('/api/rooms/'), (200,)),
+            'room_detail_guest': (
+                lambda index: anonymous.get(
+                    f"/api/rooms/{rooms[index % len(rooms)].slug}/",
+                    {'guest_name': f"{self.prefix}-guest-{index}"},
+                ),
+                (200,),
+            ),
+            'room_detail_creator': (
+                lambda index: creator.get(f"/api/rooms/{own_rooms[index % len(own_rooms)].slug}/"), (200,),
+            ),
+            'ban': (
+                lambda index: creator.post(
+                    f"/api/rooms/{own_rooms[index % len(own_rooms)].slug}/ban_user/",
+                    {'nickname': f"bench-{self.run_id}-ban-{index}"}, format='json',
+                ),
+                (200,),
+            ),
+        }
+        if choice_ids:
+            # В буферизованном режиме голос принимается ответом 202
+            scenarios['vote'] = (
+                lambda index: anonymous.post(
+                    '/api/votes/',
+                    {'choice': choice_ids[index % len(choice_ids)], 'guest_nickname': f"bench-{self.run_id}-{index}"},
+                    format='json',
+                ),
+                (201, 202),
+            )
+        if voter_email:
+            voter, _ = self.login(voter_email)
+            scenarios['room_detail_voter'] = (lambda index: voter.get(f"/api/rooms/{room.slug}/"), (200,))
+
+        # Ротация: каждый ответ возвращает новый refresh-токен, старый попадает в черный список
+        refresh_client, refresh = self.login(f"{user_name(self.prefix, 0)}@seed.local")
+        state = {'refresh': refresh}
+
+        def refresh_token(index):
+            response = refresh_client.post('/api/auth/jwt/refresh/', {'refresh': state['refresh']}, format='json')
+            if response.status_code == 200:
+                state['refresh'] = response.data['refresh']
+            return response
+
+        scenarios['token_refresh'] = (refresh_token, (200,))
+        return scenarios
+
+    def meta(self, options):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, timeout=5,
+            ).stdout.strip() or None
+        except (OSError, subprocess.SubprocessError):
+            commit = None
+        return {
+            'commit': commit,
+            'started_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'vote_ingestion': ingestion_settings()['MODE'],
+            'prefix': options['prefix'],
+            'rooms': Room.objects.filter(slug__startswith=f"{options['prefix']}-room-").count(),
+            'requests': options['requests'],
+            'warmup': options['warmup'],
+            'seed': options['seed'],
+        }
@@ -0,0 +1,88 @@
+"""
+Метрики Prometheus для горячих путей API (GET /metrics, см. core/views.py).
+
+Под gunicorn у каждого воркера свои счетчики, поэтому используется multiprocess-режим
+prometheus_client: если задана переменная окружения PROMETHEUS_MULTIPROC_DIR (пустой каталог,
+очищаемый перед стартом gunicorn), каждый процесс пишет значения в свои mmap-файлы, а /metrics
+в любом воркере суммирует файлы всех процессов. Без переменной — обычный реестр процесса
+(runserver, один ASGI-воркер, тесты). Внешние сервисы не нужны: Prometheus только читает /metrics.
+
+Модуль не импортирует Django — метрики можно писать из любого процесса.
+"""
+import os
+
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+from prometheus_client.core import GaugeMetricFamily
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', "Время ответа по view и action DRF.", ['view'],
+)
+REQUEST_QUERIES = Histogram(
+    'http_request_db_queries', "SQL-запросов на запрос (только запросы из выборки REQUEST_TIMING).", ['view'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144),
+)
+VOTES = Counter(
+    'rooms_votes', "Голоса: принятые (accepted) и отклоненные по причине.", ['outcome'],
+)
+CACHE_REQUESTS = Counter(
+    'rooms_cache_requests', "Обращения к кэшам комнат: попадания и промахи.", ['cache', 'result'],
+)
+
+
+def view_name(request):
+    """'RoomViewSet.retrieve', 'VoteCreateView.post', 'TokenObtainPairView.post', 'room_events'."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    view_class = getattr(match.func, 'cls', None)
+    if view_class is None:
+        return getattr(match.func, '__name__', 'unknown')
+    method = request.method.lower()
+    actions = getattr(match.func, 'actions', None) or {}
+    return f"{view_class.__name__}.{actions.get(method, method)}"
+
+
+def observe_request(request, duration, queries=None):
+    view = view_name(request)
+    REQUEST_LATENCY.labels(view).observe(duration)
+    if queries is not None:
+        REQUEST_QUERIES.labels(view).observe(queries)
+
+
+class CacheHitRatioCollector:
+    """rooms_cache_hit_ratio{cache} — доля попаданий за время жизни процессов (из суммы счетчиков)."""
+
+    def __init__(self, source):
+        self.source = source
+
+    def collect(self):
+        totals = {}
+        for family in self.source.collect():
+            if family.name != 'rooms_cache_requests':
+                continue
+            for sample in family.samples:
+                if sample.name.endswith('_total'):
+                    counts = totals.setdefault(sample.labels['cache'], {'hit': 0.0, 'miss': 0.0})
+                    counts[sample.labels['result']] += sample.value
+        gauge = GaugeMetricFamily('rooms_cache_hit_ratio', "Доля попаданий в кэш.", labels=['cache'])
+        for cache, counts in sorted(totals.items()):
+            total = counts['hit'] + counts['miss']
+            gauge.add_metric([cache], counts['hit'] / total if total else 0.0)
+        yield gauge
+
+
+def source_registry():
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if not path:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=path)
+    return registry
+
+
+def exposition():
+    """Текст для /metrics: метрики всех процессов и производные доли попаданий."""
+    source = source_registry()
+    derived = CollectorRegistry(auto_describe=False)
+    derived.register(CacheHitRatioCollector(source))
+    return generate_latest(source) + generate_latest(derived)
@@ -0,0 +1,279 @@
+"""
+Замер каждого запроса: число SQL-запросов, время SQL, сериализации, аутентификации и общее
+время — в журнале медленных запросов и в заголовке Server-Timing (видно во вкладке Network браузера).
+
+Настройка REQUEST_TIMING (config/settings.py):
+  * SAMPLE_RATE — доля замеряемых запросов. Вне выборки измеряется только общее время
+    (два вызова perf_counter), заголовок не ставится, SQL не учитывается.
+  * SERVER_TIMING — отдавать Server-Timing всем клиентам (только для DEBUG: заголовок раскрывает
+    внутренности). Без него заголовок получает лишь сотрудник (is_staff), приславший
+    "X-Server-Timing: 1"; такой запрос замеряется всегда, вне зависимости от выборки.
+  * SLOW_MS / SLOW_DB_MS / SLOW_QUERIES — пороги журнала медленных запросов (логгер
+    core.slow_requests, одна JSON-строка на запрос). Для запросов из выборки в запись попадают
+    TOP_STATEMENTS самых частых SQL-шаблонов; шаблон, выполненный N_PLUS_ONE раз и больше,
+    помечается как вероятный N+1.
+
+Те же замеры попадают в гистограммы Prometheus по view/action (core/metrics.py).
+
+ProfilingMiddleware снимает cProfile-профиль отдельных запросов (core/profiling.py).
+ReplicaRoutingMiddleware направляет чтения безопасных запросов на реплики (core/routers.py).
+CompressionMiddleware сжимает JSON-ответы brotli/gzip (core/compression.py).
+"""
+import cProfile
+import json
+import logging
+import random
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+
+from . import compression, metrics, profiling, routers, timing
+
+logger = logging.getLogger('core.slow_requests')
+
+DEFAULTS = {
+    'SAMPLE_RATE': 1.0,
+    'SERVER_TIMING': False,
+    'SLOW_MS': 500,
+    'SLOW_DB_MS': 200,
+    'SLOW_QUERIES': 50,
+    'TOP_STATEMENTS': 5,
+    'N_PLUS_ONE': 10,
+}
+
+
+TIMING_HEADER = 'X-Server-Timing'
+
+
+def timing_settings():
+    return {**DEFAULTS, **getattr(settings, 'REQUEST_TIMING', {})}
+
+
+def server_timing(timings, total):
+    """Значение заголовка Server-Timing, длительности в миллисекундах."""
+    parts = [f'db;dur={timings.db_time * 1000:.1f};desc="SQL x{timings.queries}"']
+    parts += [f'{name};dur={duration * 1000:.1f}' for name, duration in timings.spans.items()]
+    parts.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(parts)
+
+
+class RequestTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = timing_settings()
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        expose = self.exposes_header(request)
+        timings, token, started = self.start(expose)
+        try:
+            response = self.get_response(request)
+        finally:
+            if token is not None:
+                timing.deactivate(token)
+        return self.finish(request, response, timings, time.perf_counter() - started, expose)
+
+    async def __acall__(self, request):
+        # Поток пула — только для запроса с X-Server-Timing (проверка сотрудника читает БД)
+        expose = self.config['SERVER_TIMING'] or (
+            TIMING_HEADER in request.headers and await sync_to_async(profiling.staff_user)(request) is not None
+        )
+        timings, token, started = self.start(expose)
+        try:
+            response = await self.get_response(request)
+        finally:
+            if token is not None:
+                timing.deactivate(token)
+        return self.finish(request, response, timings, time.perf_counter() - started, expose)
+
+    def exposes_header(self, request):
+        """Отдать ли Server-Timing: всем при SERVER_TIMING, иначе только сотруднику по X-Server-Timing."""
+        if self.config['SERVER_TIMING']:
+            return True
+        # Проверка JWT — только когда заголовок прислан, обычные запросы ее не платят
+        return TIMING_HEADER in request.headers and profiling.staff_user(request) is not None
+
+    def start(self, expose):
+        if (expose and not self.config['SERVER_TIMING']) or random.random() < self.config['SAMPLE_RATE']:
+            timings = timing.RequestTimings()
+            return timings, timing.activate(timings), time.perf_counter()
+        return None, None, time.perf_counter()
+
+    def finish(self, request, response, timings, total, expose):
+        metrics.observe_request(request, total, timings.queries if timings is not None else None)
+        if timings is not None and expose:
+            response['Server-Timing'] = server_timing(timings, total)
+        if self.is_slow(timings, total):
+            logger.warning(json.dumps(self.slow_record(request, response, timings, total), ensure_ascii=False))
+        return response
+
+    def is_slow(self, timings, total):
+        if total * 1000 >= self.config['SLOW_MS']:
+            return True
+        return timings is not None and (
+            timings.db_time * 1000 >= self.config['SLOW_DB_MS'] or timings.queries >= self.config['SLOW_QUERIES']
+        )
+
+    def slow_record(self, request, response, timings, total):
+        record = {
+            'event': 'slow_request',
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 1),
+            'sampled': timings is not None,
+        }
+        if timings is not None:
+            record.update({
+                'db_ms': round(timings.db_time * 1000, 1),
+                'queries': timings.queries,
+                'spans_ms': {name: round(duration * 1000, 1) for name, duration in timings.spans.items()},
+                'top_statements': [
+                    {'sql': sql, 'count': count, 'ms': round(duration * 1000, 1)}
+                    for sql, count, duration in timings.top_statements(self.config['TOP_STATEMENTS'])
+                ],
+            })
+            record['n_plus_one'] = [
+                statement['sql'] for statement in record['top_statements']
+                if statement['count'] >= self.config['N_PLUS_ONE']
+            ]
+        return record
+
+
+class ProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = profiling.profiling_settings()
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        self._busy = threading.Lock()
+        self._last_sampled = float('-inf')
+
+    def __call__(self, request):
+        if self.is_async:
+            # Под ASGI не профилируем (см. core/profiling.py)
+            return self.get_response(request)
+
+        trigger, user = self.trigger(request)
+        if trigger is None or not self._busy.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            timings = timing.current()
+            queries_before = timings.queries if timings is not None else None
+            profiler = cProfile.Profile()
+            started = time.perf_counter()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+            duration = time.perf_counter() - started
+        finally:
+            self._busy.release()
+
+        queries = timings.queries - queries_before if timings is not None else None
+        profile = profiling.save_profile(request, response, profiler, trigger, user, duration, queries, self.config)
+        if trigger == profile.TRIGGER_STAFF:
+            response['X-Profile-Id'] = str(profile.pk)
+        return response
+
+    def trigger(self, request):
+        """('staff', пользователь), ('sampled', None) или (None, None)."""
+        if profiling.requested(request):
+            user = profiling.staff_user(request)
+            return ('staff', user) if user is not None else (None, None)
+        if not self.config['SAMPLE_RATE'] or random.random() >= self.config['SAMPLE_RATE']:
+            return None, None
+        now = time.monotonic()
+        if now - self._last_sampled < self.config['MIN_INTERVAL']:
+            return None, None
+        if profiling.resolved_view_class(request) not in self.config['SAMPLED_VIEWS']:
+            return None, None
+        self._last_sampled = now
+        return 'sampled', None
+
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        config = routers.replica_settings()
+        if not config['ALIASES']:
+            return self.get_response(request)
+        token = routers.route_reads_to_replica(self.use_replica(request, config))
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.reset_routing(token)
+        return self.finish(request, response, config)
+
+    async def __acall__(self, request):
+        config = routers.replica_settings()
+        if not config['ALIASES']:
+            return await self.get_response(request)
+        # ContextVar копируется в потоки sync_to_async вместе с контекстом запроса
+        token = routers.route_reads_to_replica(self.use_replica(request, config))
+        try:
+            response = await self.get_response(request)
+        finally:
+            routers.reset_routing(token)
+        return self.finish(request, response, config)
+
+    def use_replica(self, request, config):
+        return request.method in SAFE_METHODS and not routers.is_pinned(request, config)
+
+    def finish(self, request, response, config):
+        # Успешная запись: свои изменения клиент PIN_SECONDS секунд читает из основной БД
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            routers.pin_to_primary(response, config)
+        return response
+
+
+class CompressionMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = compression.compression_settings()
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self.finish(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.finish(request, await self.get_response(request))
+
+    def finish(self, request, response):
+        if not compression.is_compressible(request, response, self.config):
+            return response
+        return compression.compress_response(request, response, self.config)
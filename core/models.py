@@ -1,3 +1,38 @@
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+class Profile(models.Model):
+    """
+    Профиль одного запроса (cProfile), снятый core.middleware.ProfilingMiddleware:
+    по запросу сотрудника или случайной выборкой. Скачивается из админки как .pstats
+    (python -m pstats, snakeviz).
+    """
+    TRIGGER_STAFF = 'staff'
+    TRIGGER_SAMPLED = 'sampled'
+    TRIGGERS = [
+        (TRIGGER_STAFF, 'По запросу сотрудника'),
+        (TRIGGER_SAMPLED, 'Случайная выборка'),
+    ]
+
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    trigger = models.CharField(max_length=10, choices=TRIGGERS)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    # Метка view/action, как в метриках: 'RoomViewSet.retrieve'
+    view = models.CharField(max_length=200, blank=True)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    # Число SQL-запросов (если запрос попал и в выборку REQUEST_TIMING)
+    queries = models.PositiveIntegerField(null=True, blank=True)
+    # Топ функций по cumulative-времени (pstats.print_stats) — для просмотра прямо в админке
+    summary = models.TextField()
+    # marshal-дамп pstats, как пишет Stats.dump_stats()
+    stats = models.BinaryField()
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
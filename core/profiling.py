@@ -0,0 +1,81 @@
+"""
+Профилирование отдельных запросов в работающем приложении (см. ProfilingMiddleware).
+
+Два способа снять профиль:
+  * по запросу сотрудника — заголовок "X-Profile: 1" или параметр ?_profile=1 и JWT пользователя
+    с is_staff. В ответе приходит X-Profile-Id, профиль виден в админке (Core → Profiles);
+  * случайная выборка — PROFILING['SAMPLE_RATE'] запросов к view из SAMPLED_VIEWS, не чаще
+    одного профиля в MIN_INTERVAL секунд на процесс.
+
+В процессе одновременно снимается не больше одного профиля: параллельный запрос просто
+не профилируется. Под ASGI профилирование выключено — cProfile видит только свой поток,
+а view выполняются в пуле потоков.
+"""
+import io
+import marshal
+import pstats
+
+from django.conf import settings
+from django.urls import Resolver404, resolve
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+
+from .metrics import view_name
+from .models import Profile
+
+DEFAULTS = {
+    'SAMPLE_RATE': 0.0,
+    'SAMPLED_VIEWS': ['RoomViewSet', 'VoteCreateView'],
+    'MIN_INTERVAL': 60,
+    'KEEP': 500,
+    'SUMMARY_LINES': 40,
+}
+
+TRIGGER_HEADER = 'X-Profile'
+TRIGGER_PARAM = '_profile'
+
+
+def profiling_settings():
+    return {**DEFAULTS, **getattr(settings, 'PROFILING', {})}
+
+
+def requested(request):
+    return TRIGGER_HEADER in request.headers or TRIGGER_PARAM in request.GET
+
+
+def staff_user(request):
+    """Пользователь из JWT запроса, если это сотрудник; иначе None. Ошибки токена не прерывают запрос."""
+    from users.authentication import ClaimsJWTAuthentication
+
+    try:
+        authenticated = ClaimsJWTAuthentication().authenticate(Request(request))
+    except APIException:
+        return None
+    if authenticated is None or not authenticated[0].is_staff:
+        return None
+    return authenticated[0]
+
+
+def resolved_view_class(request):
+    try:
+        func = resolve(request.path_info).func
+    except Resolver404:
+        return None
+    view_class = getattr(func, 'cls', None)
+    return view_class.__name__ if view_class else None
+
+
+def save_profile(request, response, profiler, trigger, user, duration, queries, config):
+    stats = pstats.Stats(profiler)
+    summary = io.StringIO()
+    pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(config['SUMMARY_LINES'])
+    profile = Profile.objects.create(
+        trigger=trigger, user=user, method=request.method, path=request.get_full_path()[:500],
+        view=view_name(request), status_code=response.status_code, duration_ms=round(duration * 1000, 2),
+        queries=queries, summary=summary.getvalue(), stats=marshal.dumps(stats.stats),
+    )
+    # Храним только KEEP последних профилей
+    stale = Profile.objects.order_by('-pk').values_list('pk', flat=True)[config['KEEP']:config['KEEP'] + 1]
+    if stale:
+        Profile.objects.filter(pk__lte=stale[0]).delete()
+    return profile
@@ -0,0 +1,40 @@
+"""
+JSON-рендерер DRF на orjson (DEFAULT_RENDERER_CLASSES в config/settings.py).
+
+Вывод байт в байт совпадает с rest_framework.renderers.JSONRenderer при настройках по умолчанию:
+компактно, UTF-8 без \\u-экранирования кириллицы, U+2028/U+2029 экранированы. Даты, Decimal,
+ленивые строки и прочие не-JSON типы передаются в JSONEncoder DRF — формат дат тот же
+('2026-10-01T10:00:00Z', миллисекунды). Запрошенный отступ (Accept: application/json; indent=4),
+ensure_ascii/не компактный режим в настройках DRF и значения, которые orjson не умеет
+(целые больше 64 бит), рендерятся стандартным JSONRenderer.
+"""
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+_encoder = JSONEncoder()
+_fallback = JSONRenderer()
+
+
+def render_json(data):
+    """JSON-ответ API в байтах — для DRF-view и для view вне DRF (rooms/async_views.py)."""
+    try:
+        content = orjson.dumps(data, default=_encoder.default, option=OPTIONS)
+    except orjson.JSONEncodeError:
+        return _fallback.render(data)
+    # Как JSONRenderer: эти символы допустимы в JSON, но не в JavaScript
+    if b'\xe2\x80\xa8' in content or b'\xe2\x80\xa9' in content:
+        content = content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    return content
+
+
+class ORJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if self.ensure_ascii or not self.compact or indent is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        return render_json(data)
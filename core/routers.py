@@ -0,0 +1,82 @@
+"""
+Чтение с реплик БД (READ_REPLICAS в config/settings.py).
+
+На реплику уходят только чтения безопасных HTTP-запросов (GET/HEAD/OPTIONS), которые
+ReplicaRoutingMiddleware явно пометила. Все остальное читает и пишет основная БД ('default'):
+запросы на запись целиком (валидация голоса видит актуальные данные), management-команды,
+фоновый сброс буфера голосов, тесты.
+
+Read-your-writes: после успешного запроса на запись клиент получает cookie, и PIN_SECONDS
+секунд все его чтения тоже идут в основную БД — проголосовавший сразу видит свой голос,
+даже если реплика отстает.
+"""
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+
+_use_replica = ContextVar('use_replica', default=False)
+
+DEFAULTS = {
+    'ALIASES': [],
+    'PIN_SECONDS': 5,
+    'COOKIE_NAME': 'primary_pin',
+}
+
+
+def replica_settings():
+    return {**DEFAULTS, **getattr(settings, 'READ_REPLICAS', {})}
+
+
+def route_reads_to_replica(enabled):
+    return _use_replica.set(enabled)
+
+
+def reset_routing(token):
+    _use_replica.reset(token)
+
+
+def pin_expires_at(request, config):
+    """Момент окончания привязки клиента к основной БД (0 — привязки нет)."""
+    try:
+        return int(request.COOKIES.get(config['COOKIE_NAME'], 0))
+    except ValueError:
+        return 0
+
+
+def is_pinned(request, config):
+    return pin_expires_at(request, config) > time.time()
+
+
+def pin_to_primary(response, config):
+    expires_at = int(time.time()) + config['PIN_SECONDS']
+    response.set_cookie(
+        config['COOKIE_NAME'], str(expires_at), max_age=config['PIN_SECONDS'], httponly=True, samesite='Lax',
+    )
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_replica.get():
+            aliases = replica_settings()['ALIASES']
+            if aliases:
+                return random.choice(aliases)
+        # None — решает Django: основная БД или БД, из которой загружен связанный объект
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии основной БД, связи между объектами из разных алиасов допустимы
+        databases = {'default', *replica_settings()['ALIASES']}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема реплик приходит репликацией из основной БД
+        if db in replica_settings()['ALIASES']:
+            return False
+        return None
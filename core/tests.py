@@ -1,3 +1,333 @@
-from django.test import TestCase
+import datetime
+import decimal
+import gzip
+import json
+import marshal
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from unittest import mock
 
-# Create your tests here.
+import brotli
+
+from django.conf import settings
+from django.contrib.auth.models import Permission
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.translation import gettext_lazy
+from prometheus_client import REGISTRY
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APITestCase
+from rooms.models import Choice, Question, Room, RoomBan
+from users.models import User
+
+from . import timing
+from .middleware import RequestTimingMiddleware
+from .renderers import ORJSONRenderer
+from .models import Profile
+
+
+class RequestTimingTests(APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            email='owner@test.com', username='owner', password='password', display_name='Owner'
+        )
+        self.room = Room.objects.create(title="Room", slug="room", creator="Owner")
+        for index in range(3):
+            question = Question.objects.create(room=self.room, text=f"Q{index}")
+            Choice.objects.create(question=question, text="A")
+        self.url = f'/api/rooms/{self.room.slug}/'
+
+    @override_settings(REQUEST_TIMING={'SERVER_TIMING': True})
+    def test_server_timing_header(self):
+        """Тест 1: Server-Timing несет число и время SQL, сериализацию и общее время"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        header = response['Server-Timing']
+        self.assertRegex(header, r'db;dur=[\d.]+;desc="SQL x\d+"')
+        self.assertIn('serialize;dur=', header)
+        self.assertRegex(header, r'total;dur=[\d.]+$')
+
+        token = self.client.post(
+            '/api/auth/jwt/create/', {'email': 'owner@test.com', 'password': 'password'}, format='json'
+        ).data['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertIn('auth;dur=', self.client.get('/api/rooms/')['Server-Timing'])
+
+    @override_settings(REQUEST_TIMING={'SLOW_MS': 0, 'N_PLUS_ONE': 3})
+    def test_slow_request_log_flags_repeated_statements(self):
+        """Тест 2: Медленный запрос пишется JSON-строкой с частыми SQL-шаблонами и пометкой N+1"""
+        with self.assertLogs('core.slow_requests', 'WARNING') as logs:
+            self.client.get(self.url)
+
+        # Варианты каждого вопроса читаются отдельным запросом — классический N+1
+        timings = timing.RequestTimings()
+        token = timing.activate(timings)
+        try:
+            for question in Question.objects.filter(room=self.room):
+                list(Choice.objects.filter(question=question))
+        finally:
+            timing.deactivate(token)
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual((record['event'], record['path'], record['status']), ('slow_request', self.url, 200))
+        self.assertEqual(record['queries'], sum(statement['count'] for statement in record['top_statements']))
+        # Детальная страница грузит дерево фиксированным числом запросов
+        self.assertEqual(record['n_plus_one'], [])
+
+        self.assertEqual(timings.queries, 4)
+        middleware = RequestTimingMiddleware(lambda request: HttpResponse())
+        record = middleware.slow_record(RequestFactory().get('/'), HttpResponse(), timings, 0.1)
+        self.assertEqual(len(record['n_plus_one']), 1)
+        self.assertIn('"rooms_choice"', record['n_plus_one'][0])
+
+    @override_settings(REQUEST_TIMING={'SAMPLE_RATE': 1.0, 'SERVER_TIMING': False})
+    def test_header_only_for_staff_outside_debug(self):
+        """Тест 4: Без SERVER_TIMING заголовок получает только сотрудник с X-Server-Timing, вне выборки тоже"""
+        self.assertNotIn('Server-Timing', self.client.get(self.url))
+        self.assertNotIn('Server-Timing', self.client.get(self.url, HTTP_X_SERVER_TIMING='1'))
+
+        User.objects.filter(email='owner@test.com').update(is_staff=True)
+        token = self.client.post(
+            '/api/auth/jwt/create/', {'email': 'owner@test.com', 'password': 'password'}, format='json'
+        ).data['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertNotIn('Server-Timing', self.client.get(self.url))
+        # Настройки middleware читаются при первом запросе клиента — нужен новый клиент
+        with self.settings(REQUEST_TIMING={'SAMPLE_RATE': 0.0, 'SERVER_TIMING': False}):
+            client = APIClient(HTTP_AUTHORIZATION=f"Bearer {token}")
+            self.assertIn('db;dur=', client.get(self.url, HTTP_X_SERVER_TIMING='1')['Server-Timing'])
+
+    @override_settings(REQUEST_TIMING={'SAMPLE_RATE': 0.0})
+    def test_unsampled_requests_are_not_instrumented(self):
+        """Тест 3: Вне выборки нет заголовка и не ведется учет SQL"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Server-Timing', response)
+        self.assertIsNone(timing.current())
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+class MetricsTests(APITestCase):
+    def setUp(self):
+        self.room = Room.objects.create(title="Room", slug="metrics-room", creator="Owner")
+        question = Question.objects.create(room=self.room, text="Q")
+        self.choice = Choice.objects.create(question=question, text="A")
+        RoomBan.objects.create(room=self.room, banned_identifier="Troll")
+
+    def vote(self, nickname):
+        return self.client.post('/api/votes/', {'choice': self.choice.pk, 'guest_nickname': nickname}, format='json')
+
+    def test_request_and_vote_metrics(self):
+        """Тест 1: Гистограммы по view/action, голоса по причинам отказа, попадания в кэш"""
+        before = {
+            outcome: sample('rooms_votes_total', outcome=outcome)
+            for outcome in ('accepted', 'duplicate', 'banned', 'invalid', 'error')
+        }
+        retrieves = sample('http_request_duration_seconds_count', view='RoomViewSet.retrieve')
+
+        self.assertEqual(self.vote("Guest").status_code, 201)
+        self.assertEqual(self.vote("Guest").status_code, 400)
+        self.assertEqual(self.vote("Troll").status_code, 403)
+        # Без варианта — ошибка валидации без причины; отказ аутентификации — не бан
+        self.assertEqual(self.client.post('/api/votes/', {'guest_nickname': "Other"}, format='json').status_code, 400)
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer broken')
+        self.assertEqual(self.vote("Other").status_code, 401)
+        self.client.credentials()
+        self.client.get(f'/api/rooms/{self.room.slug}/')
+        self.client.get(f'/api/rooms/{self.room.slug}/')
+
+        for outcome in before:
+            self.assertEqual(sample('rooms_votes_total', outcome=outcome), before[outcome] + 1)
+        self.assertEqual(sample('http_request_duration_seconds_count', view='RoomViewSet.retrieve'), retrieves + 2)
+        self.assertGreater(sample('http_request_db_queries_count', view='VoteCreateView.post'), 0)
+
+        body = self.client.get('/metrics').content.decode()
+        self.assertIn('http_request_duration_seconds_bucket{le="0.005",view="RoomViewSet.retrieve"}', body)
+        self.assertIn('rooms_votes_total{outcome="duplicate"}', body)
+        self.assertRegex(body, r'rooms_cache_hit_ratio\{cache="room_payload"\} [\d.]+')
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token_protects_endpoint(self):
+        """Тест 2: С METRICS_TOKEN метрики отдаются только с нужным заголовком"""
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+
+    def test_multiprocess_aggregation(self):
+        """Тест 3: Под gunicorn значения всех воркеров суммируются из PROMETHEUS_MULTIPROC_DIR"""
+        script = (
+            "from core.metrics import CACHE_REQUESTS, VOTES\n"
+            "VOTES.labels('accepted').inc(2)\n"
+            "CACHE_REQUESTS.labels('ban_set', 'hit').inc(3)\n"
+            "CACHE_REQUESTS.labels('ban_set', 'miss').inc()\n"
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            for _ in range(2):
+                subprocess.run(
+                    [sys.executable, '-c', script], cwd=settings.BASE_DIR, check=True,
+                    env={**os.environ, 'PROMETHEUS_MULTIPROC_DIR': directory},
+                )
+            with mock.patch.dict(os.environ, {'PROMETHEUS_MULTIPROC_DIR': directory}):
+                body = self.client.get('/metrics').content.decode()
+
+        self.assertIn('rooms_votes_total{outcome="accepted"} 4.0', body)
+        self.assertIn('rooms_cache_hit_ratio{cache="ban_set"} 0.75', body)
+
+
+class ProfilingTests(APITestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(
+            email='staff@test.com', username='staff', password='password', display_name='Staff', is_staff=True,
+        )
+        User.objects.create_user(email='member@test.com', username='member', password='password', display_name='M')
+        self.room = Room.objects.create(title="Room", slug="profiled", creator="Owner")
+        self.url = f'/api/rooms/{self.room.slug}/'
+
+    def login(self, email):
+        token = self.client.post(
+            '/api/auth/jwt/create/', {'email': email, 'password': 'password'}, format='json'
+        ).data['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def test_staff_profiles_single_request(self):
+        """Тест 1: Сотрудник снимает профиль заголовком X-Profile, остальные — нет"""
+        self.login('member@test.com')
+        response = self.client.get(self.url, HTTP_X_PROFILE='1')
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertFalse(Profile.objects.exists())
+
+        self.login('staff@test.com')
+        response = self.client.get(self.url, {'_profile': '1'})
+        self.assertEqual(response.status_code, 200)
+        profile = Profile.objects.get(pk=response['X-Profile-Id'])
+        self.assertEqual((profile.trigger, profile.user, profile.view), ('staff', self.staff, 'RoomViewSet.retrieve'))
+        self.assertGreater(profile.queries, 0)
+        self.assertIn('cumulative', profile.summary)
+        # Артефакт — обычный pstats-дамп
+        stats = marshal.loads(bytes(profile.stats))
+        self.assertTrue(any(name == 'retrieve' for _, _, name in stats))
+
+        self.staff.user_permissions.add(Permission.objects.get(codename='view_profile'))
+        self.client.force_login(self.staff)
+        download = self.client.get(f'/admin/core/profile/{profile.pk}/download/')
+        self.assertEqual(download.content, bytes(profile.stats))
+        self.assertEqual(self.client.get('/admin/core/profile/').status_code, 200)
+
+    @override_settings(PROFILING={'SAMPLE_RATE': 1.0, 'MIN_INTERVAL': 3600, 'KEEP': 1})
+    def test_random_sampling_is_rate_limited(self):
+        """Тест 2: Выборка профилирует только RoomViewSet/VoteCreateView и не чаще MIN_INTERVAL"""
+        self.client.post('/api/auth/jwt/create/', {'email': 'staff@test.com', 'password': 'password'}, format='json')
+        self.assertFalse(Profile.objects.exists())
+
+        self.client.get(self.url)
+        self.client.get(self.url)
+        self.assertEqual(list(Profile.objects.values_list('trigger', 'view')), [('sampled', 'RoomViewSet.retrieve')])
+        self.assertNotIn('X-Profile-Id', self.client.get(self.url))
+
+
+@override_settings(READ_REPLICAS={'ALIASES': ['replica'], 'PIN_SECONDS': 30, 'COOKIE_NAME': 'primary_pin'})
+class ReadReplicaTests(TransactionTestCase):
+    # 'replica' в тестах — зеркало 'default': отдельное соединение к той же БД
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.room = Room.objects.create(title="Room", slug="replicated", creator="Owner")
+        question = Question.objects.create(room=self.room, text="Q")
+        self.choice = Choice.objects.create(question=question, text="A")
+        self.client = APIClient()
+        self.url = f'/api/rooms/{self.room.slug}/'
+
+    def request(self, method, *args, **kwargs):
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = getattr(self.client, method)(*args, **kwargs)
+        return response, len(primary.captured_queries), len(replica.captured_queries)
+
+    def test_reads_use_replica_until_client_writes(self):
+        """Тест 1: Чтения идут на реплику, запись и чтения сразу после нее — в основную БД"""
+        response, primary, replica = self.request('get', self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+        response, primary, replica = self.request(
+            'post', '/api/votes/', {'choice': self.choice.pk, 'guest_nickname': "Guest"}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(replica, 0)
+        self.assertIn('primary_pin', response.cookies)
+
+        response, primary, replica = self.request('get', self.url)
+        self.assertEqual((replica, response.data['questions'][0]['choices'][0]['votes_count']), (0, 1))
+        self.assertGreater(primary, 0)
+
+        # Привязка истекла — снова реплика
+        self.client.cookies['primary_pin'] = str(int(time.time()) - 1)
+        response, primary, replica = self.request('get', self.url)
+        self.assertEqual(primary, 0)
+
+    def test_rejected_writes_and_background_code_use_primary(self):
+        """Тест 2: Отклоненная запись не привязывает клиента; вне запросов чтения идут в основную БД"""
+        response, primary, replica = self.request('post', '/api/votes/', {'choice': self.choice.pk}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('primary_pin', response.cookies)
+        self.assertEqual(Room.objects.all().db, 'default')
+
+
+class RendererAndCompressionTests(APITestCase):
+    def setUp(self):
+        self.room = Room.objects.create(title="Комната", slug="room", creator="Owner")
+        for index in range(30):
+            question = Question.objects.create(room=self.room, text=f"Вопрос номер {index}", show_results=True)
+            Choice.objects.create(question=question, text="Да")
+            Choice.objects.create(question=question, text="Нет")
+        self.room_url = '/api/rooms/room/'
+
+    def test_orjson_output_matches_drf_renderer(self):
+        """Тест 1: Даты, Decimal, кириллица, U+2028, числовые ключи и ленивые строки — байт в байт как у DRF"""
+        data = {
+            'created_at': datetime.datetime(2026, 10, 1, 10, 0, 0, 123456, tzinfo=datetime.timezone.utc),
+            'day': datetime.date(2026, 10, 1),
+            'price': decimal.Decimal('1.50'),
+            'text': "Привет\u2028мир",
+            'by_id': {1: [1.5, None, True]},
+            'lazy': gettext_lazy("Hello"),
+            'big': 2 ** 70,
+        }
+        for media_type in (None, 'application/json; indent=2'):
+            self.assertEqual(ORJSONRenderer().render(data, media_type), JSONRenderer().render(data, media_type))
+        self.assertIn('"2026-10-01T10:00:00.123456Z"', ORJSONRenderer().render(data).decode())
+
+    def test_negotiated_compression(self):
+        """Тест 2: br или gzip по Accept-Encoding с q; маленькие ответы и /api/auth/ не сжимаются"""
+        plain = self.client.get(self.room_url)
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        compressed = self.client.get(self.room_url, HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+        self.assertEqual(compressed['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(compressed.content), plain.content)
+        self.assertEqual(compressed['ETag'], plain['ETag'])
+        self.assertLessEqual({'Accept', 'Authorization', 'Accept-Encoding'}, set(compressed['Vary'].split(', ')))
+
+        gzipped = self.client.get(self.room_url, HTTP_ACCEPT_ENCODING='br;q=0, gzip')
+        self.assertEqual(gzipped['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(gzipped.content), plain.content)
+
+        small = self.client.get('/api/rooms/missing/', HTTP_ACCEPT_ENCODING='br')
+        self.assertFalse(small.has_header('Content-Encoding'))
+        User.objects.create_user(email='user@test.com', username='user', password='password', display_name='User')
+        with override_settings(RESPONSE_COMPRESSION={'MIN_SIZE': 0}):
+            tokens = self.client.post(
+                '/api/auth/jwt/create/', {'email': 'user@test.com', 'password': 'password'},
+                format='json', HTTP_ACCEPT_ENCODING='br',
+            )
+        self.assertEqual(tokens.status_code, 200)
+        self.assertFalse(tokens.has_header('Content-Encoding'))
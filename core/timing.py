@@ -0,0 +1,84 @@
+"""
+Замеры времени запроса по частям: SQL, сериализация, аутентификация (см. core/middleware.py).
+
+Запись текущего запроса (RequestTimings) лежит в ContextVar, поэтому доступна и из потоков
+sync_to_async под ASGI. Обертка execute_wrapper ставится на каждое соединение с БД один раз
+(сигнал connection_created) и, если запрос не попал в выборку, ограничивается чтением ContextVar.
+
+span(name) отмечает участок кода; SQL, выполненный внутри участка, из его длительности
+вычитается — он уже учтен в 'db'. Поэтому "serialize" — это чистое время Python-сериализации.
+"""
+import collections
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_current = ContextVar('request_timings', default=None)
+
+# "IN (%s, %s, %s)" разной длины — один и тот же запрос
+_PLACEHOLDER_RUN = re.compile(r'%s(?:\s*,\s*%s)+')
+
+
+class RequestTimings:
+    def __init__(self):
+        self.db_time = 0.0
+        self.queries = 0
+        self.spans = collections.defaultdict(float)
+        self.statements = collections.defaultdict(lambda: [0, 0.0])
+
+    def record_query(self, sql, duration):
+        self.queries += 1
+        self.db_time += duration
+        entry = self.statements[_PLACEHOLDER_RUN.sub('%s...', sql)]
+        entry[0] += 1
+        entry[1] += duration
+
+    def top_statements(self, limit):
+        """Самые частые SQL-шаблоны: [(sql, раз, секунд)] по убыванию числа выполнений."""
+        ranked = sorted(self.statements.items(), key=lambda item: (-item[1][0], -item[1][1]))
+        return [(sql, count, duration) for sql, (count, duration) in ranked[:limit]]
+
+
+def current():
+    """Запись текущего запроса или None, если запрос не замеряется."""
+    return _current.get()
+
+
+def activate(timings):
+    return _current.set(timings)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+@contextmanager
+def span(name):
+    """with span('serialize'): ... — время участка без SQL; вне замеряемого запроса ничего не делает."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started, db_before = time.perf_counter(), timings.db_time
+    try:
+        yield
+    finally:
+        timings.spans[name] += time.perf_counter() - started - (timings.db_time - db_before)
+
+
+def record_sql(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.record_query(sql, time.perf_counter() - started)
+
+
+def install_sql_recorder(sender, connection, **kwargs):
+    """Обработчик connection_created: обертка живет на объекте соединения, ставим ее один раз."""
+    if record_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_sql)
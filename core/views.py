@@ -1,4 +1,15 @@
 # Файл: core/views.py
-from django.shortcuts import render
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from prometheus_client import CONTENT_TYPE_LATEST
 
-# Create your views here.
\ No newline at end of file
+from . import metrics
+
+
+def metrics_view(request):
+    """GET /metrics — метрики Prometheus (при METRICS_TOKEN — только с Authorization: Bearer <токен>)."""
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token and not constant_time_compare(request.headers.get('Authorization', ''), f"Bearer {token}"):
+        return HttpResponse(status=403)
+    return HttpResponse(metrics.exposition(), content_type=CONTENT_TYPE_LATEST)
@@ -13,6 +13,7 @@ import styles from './App.module.css';
 const MainLayout = () => {
     let { user, logoutUser } = useContext(AuthContext);
     const [rooms, setRooms] = useState([]);
+    const [nextPage, setNextPage] = useState(null);
     const [newTitle, setNewTitle] = useState("");
     const [realUser, setRealUser] = useState(null);
     const [loading, setLoading] = useState(false);
@@ -24,7 +25,16 @@ const MainLayout = () => {
         }
     }, [user]);
 
-    const fetchRooms = () => api.get('/api/rooms/').then(r => setRooms(r.data));
+    // Список комнат приходит страницами (cursor-пагинация): { next, previous, results }
+    const fetchRooms = () => api.get('/api/rooms/').then(r => {
+        setRooms(r.data.results);
+        setNextPage(r.data.next);
+    });
+
+    const fetchMoreRooms = () => api.get(nextPage).then(r => {
+        setRooms(prev => [...prev, ...r.data.results]);
+        setNextPage(r.data.next);
+    });
 
     const deleteRoom = async (e, slug) => {
         e.preventDefault(); e.stopPropagation();
@@ -93,7 +103,9 @@ const MainLayout = () => {
                         <div className={styles.roomItem}>
                             <div>
                                 <span className={styles.roomTitle}>{room.title}</span>
-                                <span className={styles.roomMeta}>Автор: {room.creator}</span>
+                                <span className={styles.roomMeta}>
+                                    Автор: {room.creator} · Вопросов: {room.question_count} · Голосов: {room.total_votes}
+                                </span>
                             </div>
                             {realUser && (realUser.display_name === room.creator || realUser.email === room.creator) && (
                                 <button
@@ -108,6 +120,11 @@ const MainLayout = () => {
                     </Link>
                 ))}
             </div>
+            {nextPage && (
+                <button onClick={fetchMoreRooms} className="global-btn btn-ghost" style={{width: '100%', marginTop: '15px'}}>
+                    Показать ещё
+                </button>
+            )}
         </div>
     );
 };
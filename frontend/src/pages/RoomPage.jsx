@@ -4,6 +4,75 @@ import api from '../api/client';
 import AuthContext from '../context/AuthContext';
 import styles from './RoomPage.module.css';
 
+// Голосующие варианта — отдельным запросом, постранично и только по раскрытию
+// (в детальной странице комнаты их нет). Новые голоса список не перечитывают: свернуть/раскрыть — обновить.
+const VotersList = ({ choiceId, votesCount }) => {
+    const [open, setOpen] = useState(false);
+    const [voters, setVoters] = useState([]);
+    const [next, setNext] = useState(null);
+
+    const load = async (url, append) => {
+        const r = await api.get(url);
+        setVoters(prev => append ? [...prev, ...r.data.results] : r.data.results);
+        setNext(r.data.next);
+    };
+
+    const toggle = () => {
+        if (!open) load(`/api/choices/${choiceId}/voters/`, false).catch(() => setVoters([]));
+        setOpen(!open);
+    };
+
+    if (!votesCount) return null;
+    return (
+        <div style={{fontSize: '0.85em', color: '#6b7280', marginTop: '5px'}}>
+            <button onClick={toggle}>👤 {open ? 'Скрыть' : 'Кто голосовал'}</button>
+            {open && voters.length > 0 && <span style={{marginLeft: '8px'}}>{voters.map(v => v.name).join(', ')}</span>}
+            {open && next && <button onClick={() => load(next, true)} style={{marginLeft: '8px'}}>Ещё</button>}
+        </div>
+    );
+};
+
+// Компонент отрисовки результатов
+const ResultsBlock = ({ question, isPrivateForAdmin }) => {
+    const totalVotes = question.choices.reduce((sum, c) => sum + c.votes_count, 0);
+    const maxVotes = Math.max(...question.choices.map(c => c.votes_count));
+
+    const style = isPrivateForAdmin ? {
+        border: '2px dashed #6366f1',
+        background: '#eef2ff',
+        padding: '15px',
+        borderRadius: '10px',
+        marginTop: '15px'
+    } : {};
+
+    return (
+        <div style={style}>
+            {isPrivateForAdmin && (
+                <div style={{color: '#4f46e5', fontWeight: 'bold', marginBottom: '10px', fontSize: '0.9em'}}>
+                    🔒 ВЫ ХОСТ (ВИДИТЕ ВСЁ)
+                </div>
+            )}
+            {question.choices.map(c => {
+                const percent = totalVotes === 0 ? 0 : Math.round((c.votes_count / totalVotes) * 100);
+                const isWinner = totalVotes > 0 && c.votes_count === maxVotes;
+                return (
+                    <div key={c.id} className={`${styles.resultItem} ${isWinner ? styles.winner : ''}`}>
+                        <div className={styles.resultHeader}>
+                            <span>{c.text}</span>
+                            <span>{percent}% ({c.votes_count})</span>
+                        </div>
+                        <div className={styles.resultTrack}>
+                            <div className={styles.resultFill} style={{width: `${percent}%`}}></div>
+                        </div>
+                        {/* СПИСОК ИМЕН */}
+                        <VotersList choiceId={c.id} votesCount={c.votes_count} />
+                    </div>
+                );
+            })}
+        </div>
+    );
+};
+
 const RoomPage = () => {
     const { slug } = useParams();
     const [room, setRoom] = useState(null);
@@ -28,6 +97,49 @@ const RoomPage = () => {
         }
     }, [slug, user]);
 
+    // Подписка на дельты комнаты (SSE). Без ASGI-сервера поток недоступен —
+    // тогда страница обновляется как раньше, после собственных действий.
+    useEffect(() => {
+        let source = null;
+        let cancelled = false;
+        const subscribe = async () => {
+            // EventSource не умеет слать Authorization: пользователь получает короткоживущий
+            // билет по JWT, гость передает ник, как в запросе комнаты. Забаненному поток не отдается
+            let query = `?guest_name=${encodeURIComponent(guestNick)}`;
+            if (user) {
+                try {
+                    const r = await api.post(`/api/rooms/${slug}/events-ticket/`);
+                    query = `?ticket=${encodeURIComponent(r.data.ticket)}`;
+                } catch (e) { return; }
+            }
+            if (cancelled) return;
+            source = new EventSource(`/api/rooms/${slug}/events/${query}`);
+            source.addEventListener('vote', (e) => applyVote(JSON.parse(e.data)));
+            ['question', 'question_created', 'choice_created', 'ban', 'resync'].forEach(type =>
+                source.addEventListener(type, () => fetchRoomData())
+            );
+            source.onerror = () => source.close();
+        };
+        subscribe();
+        return () => {
+            cancelled = true;
+            if (source) source.close();
+        };
+    }, [slug, user, guestNick]);
+
+    const applyVote = (event) => {
+        setRoom(prev => prev && ({
+            ...prev,
+            questions: prev.questions.map(q => q.id !== event.question ? q : {
+                ...q,
+                choices: q.choices.map(c => c.id !== event.choice ? c : {
+                    ...c,
+                    votes_count: event.votes_count,
+                }),
+            }),
+        }));
+    };
+
     const fetchRoomData = async () => {
         try {
             const endpoint = user ? `/api/rooms/${slug}/` : `/api/rooms/${slug}/?guest_name=${guestNick}`;
@@ -102,51 +214,6 @@ const RoomPage = () => {
         catch(e) { alert("Ошибка бана"); }
     };
 
-    // Компонент отрисовки результатов
-    const ResultsBlock = ({ question, isPrivateForAdmin }) => {
-        const totalVotes = question.choices.reduce((sum, c) => sum + c.votes_count, 0);
-        const maxVotes = Math.max(...question.choices.map(c => c.votes_count));
-
-        const style = isPrivateForAdmin ? {
-            border: '2px dashed #6366f1',
-            background: '#eef2ff',
-            padding: '15px',
-            borderRadius: '10px',
-            marginTop: '15px'
-        } : {};
-
-        return (
-            <div style={style}>
-                {isPrivateForAdmin && (
-                    <div style={{color: '#4f46e5', fontWeight: 'bold', marginBottom: '10px', fontSize: '0.9em'}}>
-                        🔒 ВЫ ХОСТ (ВИДИТЕ ВСЁ)
-                    </div>
-                )}
-                {question.choices.map(c => {
-                    const percent = totalVotes === 0 ? 0 : Math.round((c.votes_count / totalVotes) * 100);
-                    const isWinner = totalVotes > 0 && c.votes_count === maxVotes;
-                    return (
-                        <div key={c.id} className={`${styles.resultItem} ${isWinner ? styles.winner : ''}`}>
-                            <div className={styles.resultHeader}>
-                                <span>{c.text}</span>
-                                <span>{percent}% ({c.votes_count})</span>
-                            </div>
-                            <div className={styles.resultTrack}>
-                                <div className={styles.resultFill} style={{width: `${percent}%`}}></div>
-                            </div>
-                            {/* СПИСОК ИМЕН */}
-                            {c.voters && c.voters.length > 0 && (
-                                <div style={{fontSize: '0.85em', color: '#6b7280', marginTop: '5px'}}>
-                                    👤 {c.voters.map(v => v.name).join(', ')}
-                                </div>
-                            )}
-                        </div>
-                    );
-                })}
-            </div>
-        );
-    };
-
     if (loading) return <div className={styles.roomContainer}><p>Загрузка...</p></div>;
     if (!room) return <div className={styles.roomContainer}><h3>Комната не найдена.</h3><Link to="/" className="global-btn btn-primary">На главную</Link></div>;
 
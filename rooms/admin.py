@@ -1,5 +1,7 @@
 from django.contrib import admin
+from django.db import transaction
 from .models import Room, Question, Choice, Vote, RoomBan
+from .signals import discard_votes
 
 class ChoiceInline(admin.TabularInline):
     model = Choice
@@ -28,6 +30,16 @@ class RoomAdmin(admin.ModelAdmin):
 class VoteAdmin(admin.ModelAdmin):
     list_display = ['choice', 'voter_name', 'user', 'created_at']
 
+    # Удаление через counters.delete_votes: счетчики и минутные агрегаты не расходятся с Vote,
+    # а буфер приема (rooms/ingest.py) перестает считать этих людей проголосовавшими
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            discard_votes(Vote.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            discard_votes(queryset)
+
 admin.site.register(Room, RoomAdmin)
 admin.site.register(Question, QuestionAdmin)
 admin.site.register(Choice)
@@ -0,0 +1,153 @@
+"""
+Async-версии горячих чтений для ASGI-сервера (uvicorn/daphne):
+
+    GET /api/async/rooms/<slug>/          — то же, что GET /api/rooms/<slug>/
+    GET /api/async/rooms/<slug>/results/  — то же, что GET /api/rooms/<slug>/results/
+
+Под ASGI синхронный RoomViewSet выполняется в пуле потоков и держит поток все время запроса.
+Здесь аутентификация (claims из JWT), кэши комнаты и банов и запросы к БД выполняются через
+async API Django (aget, async-итерация QuerySet, cache.aget). Async ORM Django выполняет каждый
+запрос через sync_to_async(thread_sensitive=True), т.е. SQL одного запроса по-прежнему идет
+последовательно в одном потоке: выигрыш — в том, что event loop не ждет БД, а не в параллельном SQL.
+Одновременно с поиском голоса зрителя идут только обращения к кэшу (множество банов). При попадании
+в кэш дерева запрос не занимает поток вовсе; при промахе дерево сериализуется синхронно
+(sync_to_async) и кладется в кэш.
+
+Ответы, ETag и коды ошибок совпадают с синхронными view. Принимаются только GET и HEAD
+(require_safe): на остальные методы — 405, как у read-only действий DRF.
+Под WSGI эти view тоже работают, но без выигрыша.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.views.decorators.http import require_safe
+from rest_framework.exceptions import AuthenticationFailed, NotFound
+from core.compression import compress, compression_settings, encoded_response, negotiate
+from core.renderers import render_json
+from users.authentication import ClaimsJWTAuthentication
+
+from .cache import ban_cache, room_cache, with_viewer_overlay
+from .models import Room
+from .results import DEFAULT_INTERVAL, INTERVALS, aroom_results
+from .projection import needs_voters, select_fields
+from .serializers import FieldSelection, is_room_creator
+from .views import (
+    ban_detail, ban_name, conditional_headers, etag_matches, room_variant, serialize_room_tree, viewer_etag,
+    viewer_votes,
+)
+
+# Формат ETag совпадает с JSON-ответами DRF: клиент может чередовать оба адреса
+RENDERER = 'json'
+
+
+def json_response(data, status=200):
+    # Тот же рендерер, что у DRF-view (core/renderers.py)
+    return HttpResponse(render_json(data), status=status, content_type='application/json')
+
+
+class Rejected(Exception):
+    """Готовый ответ с ошибкой (401/404) — как его вернул бы DRF."""
+
+    def __init__(self, response):
+        super().__init__(response.status_code)
+        self.response = response
+
+
+async def load_viewer_and_room(request, slug):
+    authenticator = ClaimsJWTAuthentication()
+    try:
+        authenticated = await authenticator.aauthenticate(request)
+    except AuthenticationFailed as exc:
+        response = json_response(exc.detail, status=exc.status_code)
+        response['WWW-Authenticate'] = authenticator.authenticate_header(request)
+        raise Rejected(response)
+    try:
+        room = await Room.objects.aget(slug=slug)
+    except Room.DoesNotExist:
+        # DRF отдает Http404 из get_object_or_404 как NotFound
+        raise Rejected(json_response({"detail": str(NotFound.default_detail)}, status=404))
+    return (authenticated[0] if authenticated else AnonymousUser()), room
+
+
+async def voted_choices(room, user, guest_name):
+    votes = viewer_votes(room, user, guest_name)
+    if votes is None:
+        return {}
+    return {question_id: choice_id async for question_id, choice_id in votes.values_list('question_id', 'choice_id')}
+
+
+@require_safe
+async def room_detail(request, slug):
+    try:
+        user, room = await load_viewer_and_room(request, slug)
+    except Rejected as rejected:
+        return rejected.response
+
+    guest_name = request.GET.get('guest_name', '')
+    # С SELECT голоса перекрывается только чтение кэша банов: SQL (промах кэша банов и голос)
+    # выполняется последовательно в одном потоке async ORM
+    banned, voted = await asyncio.gather(is_banned(user, room, guest_name), voted_choices(room, user, guest_name))
+    if banned:
+        return json_response({"detail": ban_detail(user)}, status=403)
+
+    selection = FieldSelection.from_request(request)
+    etag = viewer_etag(user, guest_name, RENDERER, room, f"room-{room.pk}", selection)
+    if etag_matches(request, etag):
+        return conditional_headers(HttpResponse(status=304), etag)
+
+    is_creator = is_room_creator(user, room)
+    voters = needs_voters(selection)
+    variant = room_variant(is_creator, voters)
+    encoding = negotiate(request.headers.get('Accept-Encoding'))
+    if encoding and not voted and selection.tree is None:
+        # Как в RoomViewSet: зрителю без голосов — готовое сжатое тело общей части
+        body = await room_cache.aget(room, variant, encoding)
+        if body is None:
+            payload = render_json(await room_payload(room, variant, is_creator, voters))
+            body = compress(payload, encoding, compression_settings())
+            await room_cache.aset(room, variant, body, encoding)
+        return conditional_headers(encoded_response(body[1], body[0]), etag)
+    payload = await room_payload(room, variant, is_creator, voters)
+    return conditional_headers(json_response(select_fields(with_viewer_overlay(payload, voted), selection)), etag)
+
+
+async def is_banned(user, room, guest_name):
+    return await ban_cache.ais_banned(room, ban_name(user, guest_name))
+
+
+async def room_payload(room, variant, is_creator, voters):
+    payload = await room_cache.aget(room, variant)
+    if payload is None:
+        payload = await sync_to_async(serialize_room_tree)(room, is_creator, voters)
+        await room_cache.aset(room, variant, payload)
+    return payload
+
+
+@require_safe
+async def room_results(request, slug):
+    interval = request.GET.get('interval', DEFAULT_INTERVAL)
+    if interval not in INTERVALS:
+        return json_response({"interval": [f"Допустимые значения: {', '.join(INTERVALS)}"]}, status=400)
+    try:
+        user, room = await load_viewer_and_room(request, slug)
+    except Rejected as rejected:
+        return rejected.response
+
+    guest_name = request.GET.get('guest_name', '')
+    # Та же проверка банов, что у room_detail и RoomViewSet.results
+    if await is_banned(user, room, guest_name):
+        return json_response({"detail": ban_detail(user)}, status=403)
+
+    etag = viewer_etag(
+        user, guest_name, RENDERER, room, f"results-{room.pk}-{interval}",
+        FieldSelection.from_request(request),
+    )
+    if etag_matches(request, etag):
+        return conditional_headers(HttpResponse(status=304), etag)
+
+    questions = [question async for question in room.questions.order_by('id')]
+    is_creator = is_room_creator(user, room)
+    visible = {question.pk for question in questions if is_creator or question.show_results}
+    return conditional_headers(json_response(await aroom_results(room, questions, visible, interval)), etag)
@@ -0,0 +1,54 @@
+"""
+Применение банов комнаты одной set-based операцией.
+
+Для любого числа ников:
+  * RoomBan — один INSERT (bulk_create, уже существующие баны пропускаются);
+  * голоса забаненных (по нику гостя, display_name или email пользователя) — один GROUP BY
+    для дельт счетчиков и один DELETE;
+  * счетчики вариантов и вопросов — по одному UPDATE ... CASE на таблицу;
+всё в одной транзакции, затем одно увеличение Room.version/bans_version и одно событие подписчикам.
+Проверка "забанен ли" идет через cache.ban_cache и не обращается к БД.
+"""
+from django.db import transaction
+from django.db.models import Q
+
+from . import counters, ingest, realtime
+from .models import Choice, Room, RoomBan, Vote
+
+
+def banned_votes(room, identifiers):
+    """Голоса забаненных в комнате: по нику гостя, display_name или email пользователя."""
+    return Vote.objects.filter(question__room=room).filter(
+        Q(guest_nickname__in=identifiers)
+        | Q(user__display_name__in=identifiers)
+        | Q(user__email__in=identifiers)
+    )
+
+
+def apply_bans(room, identifiers):
+    """Банит ники в комнате и удаляет их голоса. Возвращает число удаленных голосов."""
+    identifiers = sorted(set(identifiers))
+    with transaction.atomic():
+        # bulk_create не шлет сигналов, поэтому version увеличивается ниже явно
+        RoomBan.objects.bulk_create(
+            [RoomBan(room=room, banned_identifier=identifier) for identifier in identifiers],
+            ignore_conflicts=True,
+        )
+
+        deleted = counters.delete_votes(banned_votes(room, identifiers))
+        Room.bump_version(room.pk, bans=True)
+
+        # Новые значения счетчиков затронутых вариантов уходят подписчикам комнаты
+        new_counts = (
+            list(Choice.objects.filter(pk__in=deleted).values_list('pk', 'votes_count', 'question_id'))
+            if deleted else []
+        )
+        realtime.publish(room.slug, {
+            "type": "ban",
+            "nicknames": identifiers,
+            "choices": {str(pk): count for pk, count, _ in new_counts},
+        })
+        # Буфер приема голосов этого процесса не должен считать удаленные голоса
+        question_ids = {question_id for _, _, question_id in new_counts}
+        transaction.on_commit(lambda: ingest.forget_voters(question_ids))
+    return sum(deleted.values())
@@ -0,0 +1,226 @@
+"""
+Кэш сериализованного дерева комнаты (RoomSerializer) поверх django.core.cache.
+
+Ответ детальной страницы делится на:
+  * общую часть — вопросы, варианты, счетчики (и списки голосующих по ?include=voters). Она одинакова
+    для всех зрителей одного вида: 'public' (обычные участники) и 'creator' (Хост видит все списки),
+    вариант со списками голосующих хранится отдельно ('public+voters', 'creator+voters');
+  * персональную надбавку — user_voted_choice, считается на каждый запрос одним запросом.
+
+Зрителю без голосов надбавка не нужна, и его ответ целиком совпадает с общей частью. Поэтому
+рядом хранится готовое тело такого ответа, уже отрендеренное и сжатое под кодировку
+(encoding='br'/'gzip'): горячая комната не рендерится и не сжимается на каждый запрос.
+
+Бэкенд задается алиасом из CACHES (ROOMS_PAYLOAD_CACHE): LocMemCache на одном узле
+(TTL = TIMEOUT, LRU-вытеснение по MAX_ENTRIES) или RedisCache для кластера.
+Запись хранит Room.version, поэтому устаревшая запись никогда не отдается, даже если
+явная инвалидация из write-пути не дошла (например, упала после коммита).
+
+Там же живет кэш множества банов комнаты (BanSetCache) — см. его описание.
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from core.compression import ENCODINGS
+from core.metrics import CACHE_REQUESTS
+
+# '+voters' — со списками голосующих (?include=voters)
+VARIANTS = ('public', 'creator', 'public+voters', 'creator+voters')
+
+
+class RoomPayloadCache:
+    def __init__(self, alias=None):
+        self.alias = alias
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def cache(self):
+        return caches[self.alias or getattr(settings, 'ROOMS_PAYLOAD_CACHE', 'default')]
+
+    @staticmethod
+    def key(room_id, variant, encoding=None):
+        if encoding is None:
+            return f"rooms:payload:{room_id}:{variant}"
+        return f"rooms:payload:{room_id}:{variant}:{encoding}"
+
+    def _count(self, hit):
+        CACHE_REQUESTS.labels('room_payload', 'hit' if hit else 'miss').inc()
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, room, variant, encoding=None):
+        """Общая часть или, с encoding, готовое тело ответа: (примененная кодировка или None, байты)."""
+        return self._payload(room, self.cache.get(self.key(room.pk, variant, encoding)), encoding)
+
+    async def aget(self, room, variant, encoding=None):
+        return self._payload(room, await self.cache.aget(self.key(room.pk, variant, encoding)), encoding)
+
+    def _payload(self, room, entry, encoding):
+        # created_at защищает от переиспользования pk после удаления комнаты
+        hit = entry is not None and entry[:2] == (room.version, room.created_at)
+        if encoding is None:
+            self._count(hit)
+        else:
+            CACHE_REQUESTS.labels('room_encoded', 'hit' if hit else 'miss').inc()
+        return entry[2] if hit else None
+
+    def set(self, room, variant, payload, encoding=None):
+        self.cache.set(self.key(room.pk, variant, encoding), (room.version, room.created_at, payload))
+
+    async def aset(self, room, variant, payload, encoding=None):
+        await self.cache.aset(self.key(room.pk, variant, encoding), (room.version, room.created_at, payload))
+
+    def invalidate(self, room_id):
+        """Удаляет все варианты комнаты (и их сжатые тела) после коммита текущей транзакции."""
+        keys = [self.key(room_id, variant, encoding) for variant in VARIANTS for encoding in (None, *ENCODINGS)]
+        transaction.on_commit(lambda: self.cache.delete_many(keys))
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0.0,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = 0
+
+
+room_cache = RoomPayloadCache()
+
+
+class BanSetCache:
+    """
+    Множество забаненных идентификаторов комнаты для проверки "забанен ли" без запроса к БД.
+
+    Почти всегда ответ "нет", а комната к моменту проверки уже загружена (get_object во view,
+    select_related в VoteSerializer). Поэтому запись ключуется по Room.bans_version — счетчику,
+    который растет при любом изменении банов (ban_user/ban_users, админка, удаление RoomBan).
+    Бан, сделанный любым процессом, меняет bans_version в БД, и уже следующий запрос в любом
+    воркере видит новую версию и перечитывает множество — явной рассылки инвалидаций не нужно.
+
+    Два уровня: словарь в памяти процесса (ноль обращений куда-либо) и общий кэш из
+    ROOMS_PAYLOAD_CACHE, чтобы после рестарта или в новом воркере множество бралось из кэша,
+    а не из БД. Из БД множество читается один раз на версию банов комнаты.
+    """
+
+    def __init__(self, alias=None, max_rooms=1000):
+        self.alias = alias
+        self.max_rooms = max_rooms
+        self._lock = threading.Lock()
+        self._local = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def cache(self):
+        return caches[self.alias or getattr(settings, 'ROOMS_PAYLOAD_CACHE', 'default')]
+
+    @staticmethod
+    def key(room_id, bans_version):
+        return f"rooms:bans:{room_id}:{bans_version}"
+
+    def get(self, room):
+        banned = self._local_get(room)
+        if banned is not None:
+            return banned
+
+        key = self.key(room.pk, room.bans_version)
+        shared = self.cache.get(key)
+        if shared is not None and shared[0] == room.created_at:
+            banned = shared[1]
+        else:
+            from .models import RoomBan
+
+            banned = frozenset(RoomBan.objects.filter(room_id=room.pk).values_list('banned_identifier', flat=True))
+            self.cache.set(key, (room.created_at, banned))
+        return self._local_set(room, banned)
+
+    async def aget(self, room):
+        """То же для async-view: общий кэш и БД читаются без блокировки event loop."""
+        banned = self._local_get(room)
+        if banned is not None:
+            return banned
+
+        key = self.key(room.pk, room.bans_version)
+        shared = await self.cache.aget(key)
+        if shared is not None and shared[0] == room.created_at:
+            banned = shared[1]
+        else:
+            from .models import RoomBan
+
+            banned = frozenset([
+                name async for name in
+                RoomBan.objects.filter(room_id=room.pk).values_list('banned_identifier', flat=True)
+            ])
+            await self.cache.aset(key, (room.created_at, banned))
+        return self._local_set(room, banned)
+
+    def _local_get(self, room):
+        # created_at защищает от переиспользования pk после удаления комнаты
+        stamp = (room.bans_version, room.created_at)
+        with self._lock:
+            entry = self._local.get(room.pk)
+            if entry is not None and entry[0] == stamp:
+                self.hits += 1
+                CACHE_REQUESTS.labels('ban_set', 'hit').inc()
+                return entry[1]
+            self.misses += 1
+        CACHE_REQUESTS.labels('ban_set', 'miss').inc()
+        return None
+
+    def _local_set(self, room, banned):
+        with self._lock:
+            if room.pk not in self._local and len(self._local) >= self.max_rooms:
+                # Вытесняем самую давно добавленную комнату
+                self._local.pop(next(iter(self._local)))
+            self._local[room.pk] = ((room.bans_version, room.created_at), banned)
+        return banned
+
+    def is_banned(self, room, name):
+        return bool(name) and name in self.get(room)
+
+    async def ais_banned(self, room, name):
+        return bool(name) and name in await self.aget(room)
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0.0,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = 0
+
+
+ban_cache = BanSetCache()
+
+
+def with_viewer_overlay(payload, voted_choices):
+    """Накладывает персональные user_voted_choice на общую часть, не меняя закэшированный объект."""
+    return {
+        **payload,
+        'questions': [
+            {**question, 'user_voted_choice': voted_choices.get(question['id'])}
+            for question in payload['questions']
+        ],
+    }
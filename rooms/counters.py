@@ -0,0 +1,197 @@
+"""
+Денормализованные счетчики голосов (Choice.votes_count и Question.votes_count).
+
+Счетчики меняются только через F()-выражения внутри транзакции, в которой
+вставляются или удаляются голоса, поэтому параллельные запросы не теряют обновления.
+Полный пересчет из таблицы Vote: manage.py rebuild_vote_counters.
+
+Там же поддерживаются минутные агрегаты VoteRollup (голоса варианта за минуту) — из них
+строится временной ряд результатов (rooms/results.py).
+"""
+import datetime
+
+from django.db import connections, router
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, TruncMinute
+
+from .models import Choice, Question, Room, Vote, VoteRollup
+
+ROLLUP_UPSERT_CHUNK = 200
+
+
+def rollup_bucket(moment):
+    """Ключ VoteRollup: начало минуты в UTC."""
+    return moment.astimezone(datetime.timezone.utc).replace(second=0, microsecond=0)
+
+
+def _minute():
+    return TruncMinute('created_at', tzinfo=datetime.timezone.utc)
+
+
+def _upsert_rollups(rows, replace=False):
+    """
+    rows — {(question_id, choice_id, bucket): count}. Один INSERT ... ON CONFLICT (choice_id, bucket)
+    DO UPDATE на пачку строк (PostgreSQL и SQLite >= 3.24). replace=False прибавляет count
+    к существующей строке, replace=True заменяет его (точный пересчет).
+    """
+    if not rows:
+        return
+    connection = connections[router.db_for_write(VoteRollup)]
+    qn = connection.ops.quote_name
+    table = qn(VoteRollup._meta.db_table)
+    count = qn('count')
+    new_value = f"excluded.{count}" if replace else f"{table}.{count} + excluded.{count}"
+    items = list(rows.items())
+    for start in range(0, len(items), ROLLUP_UPSERT_CHUNK):
+        chunk = items[start:start + ROLLUP_UPSERT_CHUNK]
+        params = []
+        for (question_id, choice_id, bucket), value in chunk:
+            params += [question_id, choice_id, connection.ops.adapt_datetimefield_value(bucket), value]
+        sql = (
+            f"INSERT INTO {table} ({qn('question_id')}, {qn('choice_id')}, {qn('bucket')}, {count}) "
+            f"VALUES {', '.join(['(%s, %s, %s, %s)'] * len(chunk))} "
+            f"ON CONFLICT ({qn('choice_id')}, {qn('bucket')}) DO UPDATE SET {count} = {new_value}"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+
+def record_vote(vote):
+    """
+    +1 к варианту, вопросу и минутному агрегату. Вызывать в той же транзакции, что и vote.save().
+    Возвращает новое значение Choice.votes_count (строка уже заблокирована нашим UPDATE).
+    """
+    Choice.objects.filter(pk=vote.choice_id).update(votes_count=F('votes_count') + 1)
+    Question.objects.filter(pk=vote.question_id).update(votes_count=F('votes_count') + 1)
+    _upsert_rollups({(vote.question_id, vote.choice_id, rollup_bucket(vote.created_at)): 1})
+    return Choice.objects.values_list('votes_count', flat=True).get(pk=vote.choice_id)
+
+
+def _decrement(model, deltas):
+    """UPDATE ... SET votes_count = votes_count - CASE id WHEN ... END одним запросом."""
+    if not deltas:
+        return
+    delta = Case(
+        *[When(pk=pk, then=Value(count)) for pk, count in deltas.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    model.objects.filter(pk__in=deltas).update(votes_count=F('votes_count') - delta)
+
+
+def _decrement_rollups(deltas):
+    """То же для VoteRollup: deltas — {(question_id, choice_id, bucket): count}."""
+    if not deltas:
+        return
+    matches = Q()
+    cases = []
+    for (question_id, choice_id, bucket), count in deltas.items():
+        matches |= Q(choice_id=choice_id, bucket=bucket)
+        cases.append(When(choice_id=choice_id, bucket=bucket, then=Value(count)))
+    delta = Case(*cases, default=Value(0), output_field=IntegerField())
+    VoteRollup.objects.filter(matches).update(count=F('count') - delta)
+
+
+def delete_votes(votes):
+    """
+    Удаляет голоса из queryset и вычитает их из счетчиков.
+    Возвращает {choice_id: сколько голосов удалено}. Вызывать внутри transaction.atomic().
+    """
+    votes = votes.order_by()
+    # Один GROUP BY (choice, question, минута) дает все три набора дельт
+    per_choice, per_question = {}, {}
+    per_bucket = _grouped_rollups(votes)
+    for (question_id, choice_id, minute), count in per_bucket.items():
+        per_choice[choice_id] = per_choice.get(choice_id, 0) + count
+        per_question[question_id] = per_question.get(question_id, 0) + count
+    if not per_choice:
+        return {}
+
+    # У Vote нет зависимых моделей и receiver-ов, поэтому Django удаляет одним DELETE,
+    # не загружая строки в Python
+    votes.delete()
+    _decrement(Choice, per_choice)
+    _decrement(Question, per_question)
+    _decrement_rollups(per_bucket)
+    return per_choice
+
+
+def _choice_counts():
+    counted = (
+        Vote.objects.filter(choice=OuterRef('pk'))
+        .order_by().values('choice').annotate(count=Count('pk')).values('count')
+    )
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+
+def _question_counts():
+    counted = (
+        Vote.objects.filter(question=OuterRef('pk'))
+        .order_by().values('question').annotate(count=Count('pk')).values('count')
+    )
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+
+def find_drift():
+    """Списки (pk, сохранено, фактически) для вариантов и вопросов, где счетчик разошелся с Vote."""
+    choices = (
+        Choice.objects.annotate(actual=_choice_counts())
+        .exclude(votes_count=F('actual'))
+        .values_list('pk', 'votes_count', 'actual')
+    )
+    questions = (
+        Question.objects.annotate(actual=_question_counts())
+        .exclude(votes_count=F('actual'))
+        .values_list('pk', 'votes_count', 'actual')
+    )
+    return list(choices), list(questions)
+
+
+def recount(choice_ids, question_ids):
+    """
+    Точный пересчет счетчиков только у перечисленных вариантов и вопросов
+    (после bulk_create, где число реально вставленных строк неизвестно).
+    Возвращает {choice_id: новый votes_count}. Вызывать внутри transaction.atomic().
+    """
+    Choice.objects.filter(pk__in=choice_ids).update(votes_count=_choice_counts())
+    Question.objects.filter(pk__in=question_ids).update(votes_count=_question_counts())
+    return dict(Choice.objects.filter(pk__in=choice_ids).values_list('pk', 'votes_count'))
+
+
+def vote_buckets(votes):
+    """GROUP BY (вопрос, вариант, минута) по голосам queryset — источник всех дельт счетчиков."""
+    return (
+        votes.order_by().annotate(minute=_minute())
+        .values_list('question', 'choice', 'minute').annotate(count=Count('pk'))
+    )
+
+
+def _grouped_rollups(votes):
+    return {(question_id, choice_id, minute): count for question_id, choice_id, minute, count in vote_buckets(votes)}
+
+
+def recount_rollups(choice_ids, since):
+    """
+    Точный пересчет минутных агрегатов вариантов начиная с минуты since
+    (после bulk_create с ignore_conflicts). Вызывать внутри transaction.atomic().
+    """
+    since = rollup_bucket(since)
+    _upsert_rollups(_grouped_rollups(Vote.objects.filter(choice_id__in=choice_ids, created_at__gte=since)), replace=True)
+
+
+def rebuild_rollups():
+    """Пересобирает все VoteRollup из таблицы Vote. Возвращает число строк."""
+    VoteRollup.objects.all().delete()
+    rows = _grouped_rollups(Vote.objects.all())
+    _upsert_rollups(rows)
+    return len(rows)
+
+
+def rebuild_counters():
+    """Пересчитывает все счетчики из таблицы Vote (по одному UPDATE на таблицу) и минутные агрегаты."""
+    choices = Choice.objects.update(votes_count=_choice_counts())
+    questions = Question.objects.update(votes_count=_question_counts())
+    rebuild_rollups()
+    # Закэшированные деревья и ETag-и комнат могли содержать старые счетчики
+    Room.objects.update(version=F('version') + 1)
+    return choices, questions
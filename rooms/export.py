@@ -0,0 +1,102 @@
+"""
+Потоковая выгрузка голосов комнаты (GET /api/rooms/<slug>/export/) в CSV или NDJSON.
+
+Строки читаются серверным курсором (iterator(chunk_size=...)) и сразу отдаются клиенту,
+поэтому память не зависит от числа голосов. Голоса идут по вариантам в порядке времени —
+это обход индекса (choice, created_at) без сортировки, и первый байт уходит до того,
+как БД прочитала всю комнату.
+
+В CSV ячейки, которые Excel/LibreOffice приняли бы за формулу (начинаются с = + - @,
+табуляции или перевода строки), экранируются апострофом: ники и тексты вариантов вводят
+участники комнаты (CSV injection). NDJSON отдается как есть.
+
+Под ASGI синхронный итератор StreamingHttpResponse Django сначала вычитал бы целиком,
+поэтому там строки отдаются асинхронным генератором, который забирает их пачками
+в основном sync-потоке (там же, где открыт курсор).
+"""
+import csv
+import itertools
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+from .models import Choice, Vote
+from .projection import voter_name
+
+CHUNK_SIZE = 2000
+COLUMNS = ['question_id', 'question', 'choice_id', 'choice', 'voter', 'is_guest', 'created_at']
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+
+def vote_rows(room):
+    """Словари по COLUMNS для всех голосов комнаты, без загрузки комнаты в память."""
+    choices = (
+        Choice.objects.filter(question__room=room)
+        .order_by('question_id', 'id').values_list('pk', 'text', 'question_id', 'question__text')
+    )
+    for choice_id, choice_text, question_id, question_text in choices:
+        votes = (
+            Vote.objects.filter(choice_id=choice_id).order_by('created_at')
+            .values_list('user_id', 'user__display_name', 'user__email', 'guest_nickname', 'voter_name', 'created_at')
+        )
+        for user_id, display_name, email, nickname, name, created_at in votes.iterator(chunk_size=CHUNK_SIZE):
+            yield {
+                'question_id': question_id,
+                'question': question_text,
+                'choice_id': choice_id,
+                'choice': choice_text,
+                'voter': voter_name(user_id, display_name, email, nickname, name),
+                'is_guest': user_id is None,
+                'created_at': created_at.isoformat(),
+            }
+
+
+class _Echo:
+    """Файлоподобный объект для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def csv_cell(value):
+    """Текст, похожий на формулу, выводится как текст: '=1+1 вместо =1+1."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(COLUMNS)
+    for row in rows:
+        yield writer.writerow([csv_cell(row[column]) for column in COLUMNS])
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + "\n"
+
+
+async def _async_chunks(lines, size=500):
+    iterator = iter(lines)
+    # thread_sensitive: курсор принадлежит соединению основного sync-потока
+    next_chunk = sync_to_async(lambda: "".join(itertools.islice(iterator, size)), thread_sensitive=True)
+    while chunk := await next_chunk():
+        yield chunk
+
+
+def export_response(request, room, export_format):
+    lines = csv_lines(vote_rows(room)) if export_format == 'csv' else ndjson_lines(vote_rows(room))
+    if isinstance(request, ASGIRequest):
+        lines = _async_chunks(lines)
+    response = StreamingHttpResponse(lines, content_type=FORMATS[export_format])
+    response['Content-Disposition'] = f'attachment; filename="{room.slug}-votes.{export_format}"'
+    response['Cache-Control'] = 'no-store'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,421 @@
+"""
+Буферизованный прием голосов для "флешмоб"-опросов (ROOMS_VOTE_INGESTION['MODE'] = 'buffered').
+
+В обычном режиме ('sync') каждый POST /api/votes/ — это валидация с SELECT-ами и INSERT
+в своей транзакции. В буферизованном режиме:
+
+  1. Голос проверяется по состоянию в памяти процесса: вариант/вопрос/комната и список банов
+     кэшируются на STATE_TTL секунд, множество уже проголосовавших по вопросу загружается
+     из БД без блокировки приема (плюс голоса в очереди и в пачке, которая пишется, но еще
+     не закоммичена) и дополняется принятыми голосами, перечитывается
+     раз в VOTED_TTL секунд и сразу после удаления голосов вопроса (баны, админка). Каждый кэш
+     хранит не больше STATE_MAX_ENTRIES ключей (LRU), истекшие записи удаляются.
+  2. Принятый голос попадает в ограниченную очередь, клиент сразу получает 202 Accepted.
+     Если в очереди MAX_PENDING голосов, новые получают 503 + Retry-After (backpressure).
+  3. Фоновый поток сбрасывает очередь пачками bulk_create по BATCH_SIZE голосов или раз
+     в FLUSH_INTERVAL секунд. Перед вставкой пачка перепроверяется по таблице банов,
+     после вставки счетчики и минутные агрегаты затронутых вариантов пересчитываются точно,
+     version комнат увеличивается, подписчики получают новые счетчики.
+
+Гарантии надежности (важно понимать, включая этот режим):
+  * 202 означает "принят процессом", а не "записан в БД". Голоса, ожидающие сброса, живут
+    в памяти процесса: при аварийном завершении (SIGKILL, OOM) теряется не больше
+    FLUSH_INTERVAL секунд / MAX_PENDING голосов. При штатной остановке очередь сбрасывается
+    через atexit.
+  * Временная ошибка БД при сбросе не теряет пачку: она возвращается в начало очереди и повторяется.
+    Голоса за удаленные к моменту сброса варианты отбрасываются; если пачка все равно нарушает
+    ограничение целостности, она делится пополам до отдельных голосов, и нарушающие отбрасываются
+    (с записью в лог) — один плохой голос не блокирует очередь.
+  * Закрытие вопроса и баны вступают в силу для приема с задержкой до STATE_TTL; голос
+    забаненного, ожидающий в очереди, отбрасывается при сбросе.
+  * Повторный голос отсекается в памяти процесса; между процессами окончательно решают
+    уникальные ограничения Vote (bulk_create ignore_conflicts), поэтому дубликат, принятый
+    другим воркером, молча отбрасывается при сбросе.
+"""
+import atexit
+import collections
+import itertools
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, IntegrityError, close_old_connections, transaction
+from rest_framework import status
+from rest_framework.relations import PrimaryKeyRelatedField
+from users.models import normalize_display_name
+
+from . import counters, realtime
+from .models import Choice, Room, RoomBan, Vote
+from .serializers import ALREADY_VOTED, GUEST_NAME_REQUIRED, NAME_TAKEN, QUESTION_INACTIVE
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+DEFAULTS = {
+    'MODE': 'sync',
+    'BATCH_SIZE': 500,
+    'FLUSH_INTERVAL': 0.2,
+    'MAX_PENDING': 10000,
+    'STATE_TTL': 2.0,
+    'VOTED_TTL': 300.0,
+    'STATE_MAX_ENTRIES': 10000,
+}
+
+
+def ingestion_settings():
+    return {**DEFAULTS, **getattr(settings, 'ROOMS_VOTE_INGESTION', {})}
+
+
+class VoteRejected(Exception):
+    """
+    Голос не принят: data/status_code совпадают с ответами синхронного режима,
+    reason — причина для метрики rooms_votes_total (как VoteSerializer.rejection_reason).
+    """
+
+    def __init__(self, data, reason, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(data)
+        self.data = data
+        self.reason = reason
+        self.status_code = status_code
+
+
+class Backpressure(Exception):
+    """Очередь заполнена — клиенту нужно повторить позже."""
+
+
+ChoiceState = collections.namedtuple('ChoiceState', 'question_id room_id slug is_active show_results text')
+PendingVote = collections.namedtuple('PendingVote', 'vote room_id slug ban_name voter')
+
+
+def _identity(vote):
+    return ('u', vote.user_id) if vote.user_id else ('g', vote.guest_nickname)
+
+
+_MISSING = object()
+
+
+class _TTLCache:
+    """Не больше max_size ключей (вытесняются давно не читанные), запись живет ttl секунд."""
+
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._next_sweep = 0.0
+
+    def get(self, key, load):
+        value = self.peek(key, _MISSING)
+        if value is _MISSING:
+            # load() читает БД — не под блокировкой кэша (None тоже кэшируется: "варианта нет")
+            value = load()
+            self.put(key, value)
+        return value
+
+    def peek(self, key, default=None):
+        """Значение, если оно есть и не истекло, иначе default."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] >= now:
+                self._data.move_to_end(key)
+                return entry[1]
+        return default
+
+    def put(self, key, value):
+        now = time.monotonic()
+        with self._lock:
+            self._data[key] = (now + self.ttl, value)
+            self._data.move_to_end(key)
+            if now >= self._next_sweep:
+                # Раз в ttl — удаление истекших записей, которые больше не читаются
+                for stale in [stale for stale, (expires, _) in self._data.items() if expires < now]:
+                    del self._data[stale]
+                self._next_sweep = now + self.ttl
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class VoteBuffer:
+    def __init__(self, batch_size=500, flush_interval=0.2, max_pending=10000, state_ttl=2.0,
+                 voted_ttl=300.0, max_entries=10000):
+        """flush_interval=None — без фонового потока, сброс только явным flush() (тесты, бенчмарк)."""
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self._lock = threading.Lock()
+        self._pending = collections.deque()
+        # Пачки, извлеченные flush() из очереди, но еще не закоммиченные
+        self._in_flight = []
+        # Увеличивается при forget_voters: множество, загруженное до удаления голосов, не кэшируется
+        self._voted_generation = 0
+        self._voted = _TTLCache(voted_ttl, max_entries)
+        self._choices = _TTLCache(state_ttl, max_entries)
+        self._bans = _TTLCache(state_ttl, max_entries)
+        self._taken_names = _TTLCache(state_ttl, max_entries)
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    # --- Прием ---
+
+    def _choice_state(self, choice_id):
+        def load():
+            choice = Choice.objects.select_related('question__room').filter(pk=choice_id).first()
+            if choice is None:
+                return None
+            question = choice.question
+            return ChoiceState(
+                question.pk, question.room_id, question.room.slug,
+                question.is_active, question.show_results, choice.text,
+            )
+        return self._choices.get(choice_id, load)
+
+    def _banned(self, room_id):
+        return self._bans.get(room_id, lambda: frozenset(
+            RoomBan.objects.filter(room_id=room_id).values_list('banned_identifier', flat=True)
+        ))
+
+    def _name_taken(self, nickname):
+        return self._taken_names.get(normalize_display_name(nickname), lambda: User.objects.display_name_taken(nickname))
+
+    def _queued_identities(self, question_id):
+        """Под self._lock: проголосовавшие в очереди и в пачке, которая пишется прямо сейчас."""
+        queued = itertools.chain(self._pending, itertools.chain.from_iterable(self._in_flight))
+        return {_identity(item.vote) for item in queued if item.vote.question_id == question_id}
+
+    def _voted_set(self, question_id):
+        """
+        Множество ('u', id) / ('g', ник) проголосовавших. Вызывается без self._lock: БД читается
+        вне блокировки, а менять и проверять множество можно только под ней.
+        """
+        voted = self._voted.peek(question_id)
+        if voted is not None:
+            return voted
+        # Очередь запоминается до чтения БД: голос, закоммиченный между этими шагами, виден в SELECT
+        with self._lock:
+            generation = self._voted_generation
+            queued = self._queued_identities(question_id)
+        voted = {
+            ('u', user_id) if user_id else ('g', nickname)
+            for user_id, nickname in Vote.objects.filter(question_id=question_id).values_list('user_id', 'guest_nickname')
+        }
+        voted |= queued
+        with self._lock:
+            current = self._voted.peek(question_id)
+            if current is not None:
+                # Другой поток успел опубликовать множество — в нем и его принятые голоса
+                return current
+            voted |= self._queued_identities(question_id)
+            if generation == self._voted_generation:
+                self._voted.put(question_id, voted)
+        return voted
+
+    def forget_voters(self, question_ids):
+        """Голоса вопросов удалены в БД: множества проголосовавших перечитаются при следующем голосе."""
+        with self._lock:
+            self._voted_generation += 1
+            for question_id in question_ids:
+                self._voted.pop(question_id)
+
+    def submit(self, user, choice_id, nickname):
+        """Проверяет голос по состоянию в памяти и ставит в очередь. Возвращает несохраненный Vote."""
+        try:
+            choice_id = int(choice_id)
+        except (TypeError, ValueError):
+            raise VoteRejected({'choice': ["Укажите вариант ответа."]}, 'invalid')
+        state = self._choice_state(choice_id)
+        if state is None:
+            message = PrimaryKeyRelatedField.default_error_messages['does_not_exist']
+            raise VoteRejected({'choice': [message.format(pk_value=choice_id)]}, 'invalid')
+
+        ban_name = user.display_name if user.is_authenticated else nickname
+        if ban_name and ban_name in self._banned(state.room_id):
+            raise VoteRejected({'detail': "Вы забанены!"}, 'banned', status.HTTP_403_FORBIDDEN)
+        if not state.is_active:
+            raise VoteRejected({'non_field_errors': [QUESTION_INACTIVE]}, 'inactive_question')
+        if not user.is_authenticated:
+            if not nickname:
+                raise VoteRejected({'non_field_errors': [GUEST_NAME_REQUIRED]}, 'name_required')
+            if self._name_taken(nickname):
+                raise VoteRejected({'non_field_errors': [NAME_TAKEN]}, 'name_taken')
+
+        # created_at (default=timezone.now) — момент принятия голоса, а не сброса очереди
+        if user.is_authenticated:
+            vote = Vote(choice_id=choice_id, question_id=state.question_id, user_id=user.pk, guest_nickname=nickname)
+            voter = {"name": user.display_name or user.email, "choice": state.text, "is_guest": False}
+        else:
+            vote = Vote(choice_id=choice_id, question_id=state.question_id, guest_nickname=nickname)
+            voter = {"name": nickname, "choice": state.text, "is_guest": True}
+
+        voted = self._voted_set(state.question_id)
+        with self._lock:
+            identity = _identity(vote)
+            if identity in voted:
+                raise VoteRejected({'non_field_errors': [ALREADY_VOTED]}, 'duplicate')
+            if len(self._pending) >= self.max_pending:
+                raise Backpressure()
+            voted.add(identity)
+            self._pending.append(PendingVote(
+                vote, state.room_id, state.slug, ban_name, voter if state.show_results else None,
+            ))
+            full = len(self._pending) >= self.batch_size
+
+        self.start()
+        if full:
+            self._wakeup.set()
+        return vote
+
+    @property
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    # --- Сброс в БД ---
+
+    def flush(self):
+        """Записывает все ожидающие голоса пачками. Возвращает число обработанных голосов."""
+        processed = 0
+        while True:
+            with self._lock:
+                batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+                if not batch:
+                    return processed
+                # До коммита голоса пачки остаются видны _voted_set (в т.ч. при перечитывании из БД)
+                self._in_flight.append(batch)
+            retry = False
+            try:
+                self._write_or_split(batch)
+            except DatabaseError:
+                # Временная ошибка: пачка возвращается в начало очереди и будет повторена при следующем сбросе
+                retry = True
+                raise
+            finally:
+                with self._lock:
+                    self._in_flight.remove(batch)
+                    if retry:
+                        self._pending.extendleft(reversed(batch))
+            processed += len(batch)
+
+    def _write_or_split(self, batch):
+        """Пишет пачку; при нарушении целостности делит ее и отбрасывает только нарушающие голоса."""
+        try:
+            self._write(batch)
+        except IntegrityError:
+            if len(batch) == 1:
+                vote = batch[0].vote
+                logger.warning(
+                    "Голос отброшен при сбросе буфера (choice=%s, question=%s)", vote.choice_id, vote.question_id,
+                    exc_info=True,
+                )
+                return
+            middle = len(batch) // 2
+            self._write_or_split(batch[:middle])
+            self._write_or_split(batch[middle:])
+
+    def _write(self, batch):
+        # Вариант (а с ним вопрос или комната) мог быть удален, пока голос ждал в очереди
+        existing = set(Choice.objects.filter(pk__in={item.vote.choice_id for item in batch}).values_list('pk', flat=True))
+        room_ids = {item.room_id for item in batch if item.vote.choice_id in existing}
+        banned = set(RoomBan.objects.filter(room_id__in=room_ids).values_list('room_id', 'banned_identifier'))
+        batch = [
+            item for item in batch
+            if item.vote.choice_id in existing and (item.room_id, item.ban_name) not in banned
+        ]
+        if not batch:
+            return
+
+        choice_ids = {item.vote.choice_id for item in batch}
+        question_ids = {item.vote.question_id for item in batch}
+        with transaction.atomic():
+            Vote.objects.bulk_create([item.vote for item in batch], ignore_conflicts=True)
+            new_counts = counters.recount(choice_ids, question_ids)
+            counters.recount_rollups(choice_ids, min(item.vote.created_at for item in batch))
+            for room_id in room_ids:
+                Room.bump_version(room_id)
+
+            # Одно событие на вариант с итоговым счетчиком пачки (+ имена, если результаты открыты)
+            events = {}
+            for item in batch:
+                event = events.setdefault(item.vote.choice_id, (item.slug, {
+                    "type": "vote",
+                    "question": item.vote.question_id,
+                    "choice": item.vote.choice_id,
+                    "votes_count": new_counts.get(item.vote.choice_id, 0),
+                }))[1]
+                if item.voter:
+                    event.setdefault("voters", []).append(item.voter)
+            for slug, event in events.values():
+                realtime.publish(slug, event)
+
+    # --- Фоновый поток ---
+
+    def start(self):
+        if self.flush_interval is None or self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='vote-buffer', daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Не удалось сбросить буфер голосов, повтор через %s с", self.flush_interval)
+                self._stopped.wait(self.flush_interval)
+
+    def stop(self):
+        """Останавливает поток и сбрасывает остаток очереди (штатное завершение процесса)."""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+        self.flush()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_vote_buffer():
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                config = ingestion_settings()
+                _buffer = VoteBuffer(
+                    batch_size=config['BATCH_SIZE'],
+                    flush_interval=config['FLUSH_INTERVAL'],
+                    max_pending=config['MAX_PENDING'],
+                    state_ttl=config['STATE_TTL'],
+                    voted_ttl=config['VOTED_TTL'],
+                    max_entries=config['STATE_MAX_ENTRIES'],
+                )
+    return _buffer
+
+
+def forget_voters(question_ids):
+    """Вызывать после удаления голосов вопросов (баны, админка); без буфера в процессе ничего не делает."""
+    if _buffer is not None and question_ids:
+        _buffer.forget_voters(question_ids)
@@ -0,0 +1,103 @@
+import asyncio
+import threading
+import time
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from core.bench import asgi_get, stopwatch, summarize, write_report
+from rooms.models import Room
+
+ENDPOINTS = {
+    'detail': ('/api/rooms/{slug}/', '/api/async/rooms/{slug}/'),
+    'results': ('/api/rooms/{slug}/results/', '/api/async/rooms/{slug}/results/'),
+}
+ROOM_SAMPLE = 100
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает синхронный RoomViewSet и async-view (rooms/async_views.py) под ASGI: запросы идут "
+        "в настоящее ASGI-приложение из одного event loop, как у uvicorn, с заданным числом "
+        "одновременных клиентов. --db-latency-ms добавляет задержку к каждому SQL-запросу "
+        "(удаленная БД, долгий хвост). Нужен набор seed_rooms с тем же --prefix."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', default='seed', help="Префикс набора seed_rooms.")
+        parser.add_argument('--requests', type=int, default=500, help="Запросов на каждый замер.")
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 20, 100])
+        parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=list(ENDPOINTS))
+        parser.add_argument('--db-latency-ms', type=float, default=0.0, help="Задержка каждого SQL-запроса.")
+        parser.add_argument('--json', action='store_true', help="Вывести результат в JSON.")
+
+    def handle(self, *args, **options):
+        slugs = list(
+            Room.objects.filter(slug__startswith=f"{options['prefix']}-room-")
+            .order_by('pk').values_list('slug', flat=True)[:ROOM_SAMPLE]
+        )
+        if not slugs:
+            raise CommandError(f"Набор '{options['prefix']}' не найден: python manage.py seed_rooms")
+
+        latency = options['db_latency_ms'] / 1000
+
+        def slow_database(execute, sql, params, many, context):
+            time.sleep(latency)
+            return execute(sql, params, many, context)
+
+        def install(sender, connection, **kwargs):
+            connection.execute_wrappers.append(slow_database)
+
+        if latency:
+            # Соединения потоков создаются заново и получают задержку через сигнал
+            connections.close_all()
+            connection_created.connect(install, dispatch_uid='bench_async_rooms')
+        try:
+            results = asyncio.run(self.run(slugs, options))
+        finally:
+            connection_created.disconnect(dispatch_uid='bench_async_rooms')
+        write_report(self.stdout, results, options['json'])
+
+    async def run(self, slugs, options):
+        application = get_asgi_application()
+        results = {}
+        for endpoint in options['endpoints']:
+            sync_path, async_path = ENDPOINTS[endpoint]
+            # Прогрев: кэши комнат общие для обоих вариантов
+            await self.measure(application, sync_path, slugs, len(slugs), 1)
+            for concurrency in options['concurrency']:
+                rows = {}
+                for mode, path in (('sync', sync_path), ('async', async_path)):
+                    rows[mode] = await self.measure(application, path, slugs, options['requests'], concurrency)
+                    results[f"{endpoint} c={concurrency} {mode}"] = rows[mode]
+                results[f"{endpoint} c={concurrency} speedup"] = {
+                    'throughput_x': round(rows['async']['throughput_per_s'] / rows['sync']['throughput_per_s'], 2),
+                    'p99_x': round(rows['sync']['p99_ms'] / rows['async']['p99_ms'], 2) if rows['async']['p99_ms'] else 0.0,
+                }
+        return results
+
+    async def measure(self, application, path, slugs, total, concurrency):
+        samples = []
+        issued = 0
+        threads_peak = threading.active_count()
+
+        async def client(worker):
+            nonlocal issued, threads_peak
+            while issued < total:
+                index = issued
+                issued += 1
+                slug = slugs[index % len(slugs)]
+                started = time.perf_counter()
+                status, body = await asgi_get(
+                    application, path.format(slug=slug), f"guest_name=bench-guest-{worker}",
+                )
+                samples.append(time.perf_counter() - started)
+                threads_peak = max(threads_peak, threading.active_count())
+                if status != 200:
+                    raise CommandError(f"{path.format(slug=slug)}: {status} {body[:200]}")
+
+        with stopwatch() as elapsed:
+            await asyncio.gather(*(client(worker) for worker in range(concurrency)))
+        return {**summarize(samples, elapsed()), 'threads_peak': threads_peak}
@@ -0,0 +1,70 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.bench import stopwatch, write_report
+from rooms import counters
+from rooms.bans import apply_bans
+from rooms.models import Choice, Question, Room, Vote
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет время бана в зависимости от числа голосов в комнате: один ник и пачка ников. "
+        "Создает временные комнаты в текущей БД и удаляет их после замера."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+            help="Число голосов в комнате для каждого замера.",
+        )
+        parser.add_argument('--bulk', type=int, default=100, help="Ников в массовом бане.")
+        parser.add_argument('--json', action='store_true', help="Вывести результат в JSON.")
+
+    def handle(self, *args, **options):
+        results = {}
+        for size in options['sizes']:
+            results[f"votes={size}"] = self.run(size, options['bulk'])
+        write_report(self.stdout, results, options['json'])
+
+    def seed(self, size, spammers):
+        room = Room.objects.create(title="Benchmark", slug=f"bench-ban-{time.time_ns()}", creator="bench")
+        questions = Question.objects.bulk_create(Question(room=room, text=f"Q{index}") for index in range(10))
+        choices = Choice.objects.bulk_create(
+            Choice(question=question, text=f"C{index}") for question in questions for index in range(4)
+        )
+        per_question = size // len(questions)
+        Vote.objects.bulk_create(
+            (
+                Vote(
+                    choice=choices[q_index * 4 + v_index % 4],
+                    question=question,
+                    # Первые spammers ников в каждом вопросе — будущие забаненные
+                    guest_nickname=f"spam-{v_index}" if v_index < spammers else f"guest-{v_index}",
+                )
+                for q_index, question in enumerate(questions)
+                for v_index in range(per_question)
+            ),
+            batch_size=5000,
+        )
+        # bulk_create минует счетчики — выставляем их, иначе бан уведет их в минус
+        counters.recount([choice.pk for choice in choices], [question.pk for question in questions])
+        return room
+
+    def run(self, size, bulk):
+        room = self.seed(size, spammers=bulk + 1)
+        try:
+            with stopwatch() as single:
+                single_deleted = apply_bans(room, ["spam-0"])
+            with stopwatch() as many:
+                bulk_deleted = apply_bans(room, [f"spam-{index}" for index in range(1, bulk + 1)])
+        finally:
+            room.delete()
+        return {
+            'single_ms': round(single() * 1000, 2),
+            'single_votes_deleted': single_deleted,
+            'bulk_ms': round(many() * 1000, 2),
+            'bulk_nicknames': bulk,
+            'bulk_votes_deleted': bulk_deleted,
+        }
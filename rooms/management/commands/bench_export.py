@@ -0,0 +1,75 @@
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIClient
+
+from core.bench import write_report
+from rooms.models import Choice, Question, Room, Vote
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет GET /api/rooms/<slug>/export/: время до первого байта, общее время и пик памяти "
+        "Python на комнате с --votes голосами (по умолчанию 1M). Комната удаляется после замера."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--votes', type=int, default=1000000, help="Голосов в комнате.")
+        parser.add_argument('--json', action='store_true', help="Вывести результат в JSON.")
+
+    def handle(self, *args, **options):
+        stamp = time.time_ns()
+        owner = User.objects.create_user(
+            email=f"bench-{stamp}@bench.local", username=f"bench-{stamp}", password=None,
+            display_name=f"bench-{stamp}",
+        )
+        room = Room.objects.create(title="Benchmark", slug=f"bench-export-{stamp}", creator=owner.display_name)
+        try:
+            self.seed(room, options['votes'])
+            client = APIClient(SERVER_NAME='localhost')
+            client.force_authenticate(user=owner)
+            results = {
+                fmt: self.measure(client, room, fmt) for fmt in ('csv', 'ndjson')
+            }
+        finally:
+            room.delete()
+            owner.delete()
+        write_report(self.stdout, results, options['json'])
+
+    def seed(self, room, total, batch_size=10000):
+        questions = Question.objects.bulk_create(Question(room=room, text=f"Q{index}") for index in range(5))
+        choices = Choice.objects.bulk_create(
+            Choice(question=question, text=f"C{index}") for question in questions for index in range(4)
+        )
+        for start in range(0, total, batch_size):
+            Vote.objects.bulk_create(
+                Vote(
+                    choice=choices[index % len(choices)], question_id=choices[index % len(choices)].question_id,
+                    guest_nickname=f"guest-{index}",
+                )
+                for index in range(start, min(start + batch_size, total))
+            )
+
+    def measure(self, client, room, export_format):
+        tracemalloc.start()
+        started = time.perf_counter()
+        response = client.get(f'/api/rooms/{room.slug}/export/', {'export_format': export_format})
+        assert response.status_code == 200, response.content
+        stream = iter(response.streaming_content)
+        size = len(next(stream))
+        first_byte = time.perf_counter() - started
+        for chunk in stream:
+            size += len(chunk)
+        total = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return {
+            'first_byte_ms': round(first_byte * 1000, 1),
+            'total_s': round(total, 2),
+            'size_mb': round(size / 2 ** 20, 1),
+            'peak_python_mb': round(peak / 2 ** 20, 1),
+        }
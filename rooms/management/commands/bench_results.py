@@ -0,0 +1,59 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.bench import summarize, write_report
+from rooms import counters
+from rooms.models import Choice, Question, Room, Vote
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет GET /api/questions/<id>/results/ на вопросе с --votes голосами (по умолчанию 1M), "
+        "распределенными по последним суткам. Создает временную комнату и удаляет ее после замера."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--votes', type=int, default=1000000, help="Голосов в вопросе.")
+        parser.add_argument('--requests', type=int, default=200, help="Запросов на каждый интервал.")
+        parser.add_argument('--json', action='store_true', help="Вывести результат в JSON.")
+
+    def handle(self, *args, **options):
+        room = Room.objects.create(title="Benchmark", slug=f"bench-results-{time.time_ns()}", creator="bench")
+        try:
+            question = self.seed(room, options['votes'])
+            client = APIClient(SERVER_NAME='localhost')
+            results = {}
+            for interval in ('minute', 'hour', 'day'):
+                samples = []
+                for _ in range(options['requests']):
+                    started = time.perf_counter()
+                    response = client.get(f'/api/questions/{question.pk}/results/', {'interval': interval})
+                    samples.append(time.perf_counter() - started)
+                    assert response.status_code == 200, response.content
+                results[interval] = summarize(samples)
+        finally:
+            room.delete()
+        write_report(self.stdout, results, options['json'])
+
+    def seed(self, room, total, batch_size=10000):
+        question = Question.objects.create(room=room, text="Q", show_results=True)
+        choices = Choice.objects.bulk_create(Choice(question=question, text=f"C{index}") for index in range(4))
+        day_ago = timezone.now() - datetime.timedelta(days=1)
+        step = datetime.timedelta(days=1) / max(total, 1)
+        for start in range(0, total, batch_size):
+            votes = Vote.objects.bulk_create(
+                Vote(choice=choices[index % 4], question=question, guest_nickname=f"guest-{index}")
+                for index in range(start, min(start + batch_size, total))
+            )
+            # auto_now_add не дает задать время при вставке — растягиваем голоса по суткам
+            for offset, vote in enumerate(votes, start):
+                vote.created_at = day_ago + step * offset
+            Vote.objects.bulk_update(votes, ['created_at'])
+        # bulk_create минует счетчики и агрегаты
+        counters.recount([choice.pk for choice in choices], [question.pk])
+        counters.recount_rollups([choice.pk for choice in choices], day_ago)
+        return question
@@ -0,0 +1,69 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from core.bench import summarize, write_report
+from rooms import counters
+from rooms.models import Choice, Question, Room, Vote
+from rooms.projection import project_room
+from rooms.views import drf_room_tree
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает сборку детальной страницы комнаты через RoomSerializer и rooms/projection.py "
+        "на временной комнате с --choices вариантами и --votes голосами (дерево Хоста с ?include=voters). "
+        "Время включает запросы к БД; per_10k_ms — медиана в пересчете на 10k вариантов+голосов."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--questions', type=int, default=20)
+        parser.add_argument('--choices', type=int, default=10000, help="Вариантов во всей комнате.")
+        parser.add_argument('--votes', type=int, default=10000, help="Голосов во всей комнате.")
+        parser.add_argument('--repeat', type=int, default=10, help="Повторов на каждый способ.")
+        parser.add_argument('--json', action='store_true', help="Вывести результат в JSON.")
+
+    def handle(self, *args, **options):
+        if options['choices'] < options['questions']:
+            raise CommandError("--choices должно быть не меньше --questions")
+        room = Room.objects.create(title="Benchmark", slug=f"bench-serialize-{time.time_ns()}", creator="bench")
+        try:
+            self.seed(room, options['questions'], options['choices'], options['votes'])
+            renderer = JSONRenderer()
+            rows = options['choices'] + options['votes']
+            results, rendered = {}, {}
+            for name, build in (('serializer', drf_room_tree), ('projection', project_room)):
+                samples = []
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    payload = build(room, True, voters=True)
+                    samples.append(time.perf_counter() - started)
+                rendered[name] = renderer.render(payload)
+                summary = summarize(samples)
+                results[name] = {**summary, 'per_10k_ms': round(summary['p50_ms'] * 10000 / rows, 3)}
+            if rendered['serializer'] != rendered['projection']:
+                raise CommandError("JSON проекции отличается от RoomSerializer")
+            results['speedup'] = {'p50_x': round(results['serializer']['p50_ms'] / results['projection']['p50_ms'], 2)}
+        finally:
+            room.delete()
+        write_report(self.stdout, results, options['json'])
+
+    def seed(self, room, questions, choices, votes):
+        created = Question.objects.bulk_create(
+            Question(room=room, text=f"Q{index}", show_results=index % 2 == 0) for index in range(questions)
+        )
+        options = Choice.objects.bulk_create(
+            Choice(question=created[index % questions], text=f"Вариант {index}") for index in range(choices)
+        )
+        # Уникальный ник на голос — ограничение "один голос на вопрос" не мешает
+        Vote.objects.bulk_create(
+            (
+                Vote(choice=options[index % choices], question=options[index % choices].question,
+                     guest_nickname=f"гость-{index}")
+                for index in range(votes)
+            ),
+            batch_size=5000,
+        )
+        # bulk_create минует счетчики
+        counters.recount([choice.pk for choice in options], [question.pk for question in created])
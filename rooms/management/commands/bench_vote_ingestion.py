@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from core.bench import stopwatch, summarize, write_report
+from rooms import ingest
+from rooms.models import Choice, Question, Room
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает пропускную способность POST /api/votes/ в синхронном и буферизованном режиме. "
+        "Создает временную комнату в текущей БД и удаляет ее после замера."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--votes', type=int, default=2000, help="Голосов на каждый режим.")
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--json', action='store_true', help="Вывести результат в JSON.")
+
+    def handle(self, *args, **options):
+        results = {
+            'sync': self.run('sync', options),
+            'buffered': self.run('buffered', options),
+        }
+        results['speedup'] = {
+            'throughput_x': round(results['buffered']['throughput_per_s'] / results['sync']['throughput_per_s'], 2),
+        }
+        write_report(self.stdout, results, options['json'])
+
+    def run(self, mode, options):
+        room = Room.objects.create(title="Benchmark", slug=f"bench-ingest-{mode}-{time.time_ns()}", creator="bench")
+        question = Question.objects.create(room=room, text="Q")
+        choices = [Choice.objects.create(question=question, text=f"C{index}") for index in range(4)]
+
+        buffer = ingest.VoteBuffer(batch_size=options['batch_size'], flush_interval=None)
+        previous, ingest._buffer = ingest._buffer, buffer
+        client = APIClient(SERVER_NAME='localhost')
+        samples = []
+        try:
+            with override_settings(ROOMS_VOTE_INGESTION={'MODE': mode}), stopwatch() as elapsed:
+                for index in range(options['votes']):
+                    data = {'choice': choices[index % len(choices)].id, 'guest_nickname': f"bench-{index}"}
+                    started = time.perf_counter()
+                    response = client.post('/api/votes/', data, format='json')
+                    samples.append(time.perf_counter() - started)
+                    assert response.status_code in (201, 202), response.content
+                # Время сброса очереди входит в общий замер буферизованного режима
+                buffer.flush()
+            stored = question.votes.count()
+        finally:
+            ingest._buffer = previous
+            room.delete()
+
+        summary = summarize(samples, elapsed())
+        summary['stored_votes'] = stored
+        return summary
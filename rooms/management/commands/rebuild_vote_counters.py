@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from rooms.counters import find_drift, rebuild_counters
+
+
+class Command(BaseCommand):
+    help = "Сверяет и пересчитывает денормализованные счетчики голосов из таблицы Vote."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help="Только проверить: вывести расхождения и завершиться с ошибкой, ничего не меняя.",
+        )
+
+    def handle(self, *args, **options):
+        choices, questions = find_drift()
+        for pk, stored, actual in choices:
+            self.stdout.write(f"Choice #{pk}: сохранено {stored}, по голосам {actual}")
+        for pk, stored, actual in questions:
+            self.stdout.write(f"Question #{pk}: сохранено {stored}, по голосам {actual}")
+
+        if options['check']:
+            if choices or questions:
+                raise CommandError(
+                    f"Счетчики расходятся: вариантов {len(choices)}, вопросов {len(questions)}."
+                )
+            self.stdout.write(self.style.SUCCESS("Счетчики совпадают с таблицей Vote."))
+            return
+
+        with transaction.atomic():
+            rebuilt_choices, rebuilt_questions = rebuild_counters()
+        self.stdout.write(self.style.SUCCESS(
+            f"Пересчитано: вариантов {rebuilt_choices}, вопросов {rebuilt_questions}."
+        ))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.bench import stopwatch
+from rooms.seeding import clear_dataset, seed_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполняет текущую БД синтетическим набором для нагрузочных замеров (bench_api): комнаты, "
+        "вопросы, варианты, пользователи, гости, голоса и баны — bulk-вставками. "
+        "Объекты помечаются --prefix; --clear удаляет прежний набор с тем же префиксом."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', default='seed', help="Префикс slug комнат и имен пользователей.")
+        parser.add_argument('--rooms', type=int, default=100)
+        parser.add_argument('--questions', type=int, default=5, help="Вопросов в комнате.")
+        parser.add_argument('--choices', type=int, default=4, help="Вариантов в вопросе.")
+        parser.add_argument('--users', type=int, default=1000, help="Зарегистрированных пользователей.")
+        parser.add_argument('--guests', type=int, default=5000, help="Размер пула ников гостей.")
+        parser.add_argument('--voters', type=int, default=200, help="Голосов на вопрос.")
+        parser.add_argument('--registered-share', type=float, default=0.3, help="Доля голосов пользователей.")
+        parser.add_argument('--bans', type=int, default=10, help="Банов в комнате.")
+        parser.add_argument('--seed', type=int, default=0, help="Seed генератора (воспроизводимость).")
+        parser.add_argument('--clear', action='store_true', help="Удалить прежний набор с этим префиксом.")
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['choices'] < 1:
+            raise CommandError("Нужны хотя бы один пользователь (создатель комнат) и один вариант.")
+        if options['clear']:
+            deleted = clear_dataset(options['prefix'])
+            self.stdout.write(f"Удален прежний набор '{options['prefix']}': {deleted} строк.")
+
+        with stopwatch() as elapsed:
+            totals = seed_dataset(
+                prefix=options['prefix'], rooms=options['rooms'], questions=options['questions'],
+                choices=options['choices'], users=options['users'], guests=options['guests'],
+                voters=options['voters'], bans=options['bans'],
+                registered_share=options['registered_share'], seed=options['seed'],
+            )
+        details = ", ".join(f"{key}={count}" for key, count in totals.items())
+        self.stdout.write(self.style.SUCCESS(f"Набор '{options['prefix']}' создан за {elapsed():.1f} с: {details}"))
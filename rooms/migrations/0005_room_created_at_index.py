@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-18 16:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0004_remove_room_banned_users_roomban'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='room',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.0.1 on 2026-10-18 16:04
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    """Заполняет новые счетчики по существующим голосам."""
+    Choice = apps.get_model('rooms', 'Choice')
+    Question = apps.get_model('rooms', 'Question')
+    Vote = apps.get_model('rooms', 'Vote')
+
+    per_choice = (
+        Vote.objects.filter(choice=OuterRef('pk'))
+        .order_by().values('choice').annotate(count=Count('pk')).values('count')
+    )
+    per_question = (
+        Vote.objects.filter(choice__question=OuterRef('pk'))
+        .order_by().values('choice__question').annotate(count=Count('pk')).values('count')
+    )
+    Choice.objects.update(votes_count=Coalesce(Subquery(per_choice, output_field=IntegerField()), 0))
+    Question.objects.update(votes_count=Coalesce(Subquery(per_question, output_field=IntegerField()), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0005_room_created_at_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='choice',
+            name='votes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='votes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_question(apps, schema_editor):
+    """Заполняет Vote.question из варианта и убирает повторные голоса перед уникальными ограничениями."""
+    Choice = apps.get_model('rooms', 'Choice')
+    Question = apps.get_model('rooms', 'Question')
+    Vote = apps.get_model('rooms', 'Vote')
+
+    Vote.objects.update(
+        question=Subquery(Choice.objects.filter(pk=OuterRef('choice')).values('question')[:1])
+    )
+
+    # Дубликаты могли появиться из-за гонки старой проверки has_voted: оставляем самый ранний голос
+    duplicates = [
+        Vote.objects.filter(user__isnull=False).values('question', 'user'),
+        Vote.objects.filter(user__isnull=True, guest_nickname__isnull=False).values('question', 'guest_nickname'),
+    ]
+    removed = 0
+    for grouped in duplicates:
+        for group in grouped.annotate(first=Min('pk'), count=Count('pk')).filter(count__gt=1):
+            first = group.pop('first')
+            group.pop('count')
+            removed += Vote.objects.filter(**group).exclude(pk=first).delete()[0]
+
+    if removed:
+        per_choice = (
+            Vote.objects.filter(choice=OuterRef('pk'))
+            .order_by().values('choice').annotate(count=Count('pk')).values('count')
+        )
+        per_question = (
+            Vote.objects.filter(question=OuterRef('pk'))
+            .order_by().values('question').annotate(count=Count('pk')).values('count')
+        )
+        Choice.objects.update(votes_count=Coalesce(Subquery(per_choice, output_field=IntegerField()), 0))
+        Question.objects.update(votes_count=Coalesce(Subquery(per_question, output_field=IntegerField()), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0007_room_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vote',
+            name='question',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='votes', to='rooms.question'),
+        ),
+        migrations.RunPython(backfill_question, migrations.RunPython.noop),
+    ]
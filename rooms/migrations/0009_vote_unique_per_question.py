@@ -0,0 +1,27 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Отдельная миграция: в PostgreSQL ALTER TABLE после массового UPDATE в той же транзакции
+    # падает с "pending trigger events" из-за отложенной проверки FK
+
+    dependencies = [
+        ('rooms', '0008_vote_question'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='vote',
+            name='question',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='votes', to='rooms.question'),
+        ),
+        migrations.AddConstraint(
+            model_name='vote',
+            constraint=models.UniqueConstraint(condition=models.Q(('user__isnull', False)), fields=('question', 'user'), name='unique_user_vote_per_question'),
+        ),
+        migrations.AddConstraint(
+            model_name='vote',
+            constraint=models.UniqueConstraint(condition=models.Q(('guest_nickname__isnull', False), ('user__isnull', True)), fields=('question', 'guest_nickname'), name='unique_guest_vote_per_question'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.1 on 2026-10-18 16:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0009_vote_unique_per_question'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(fields=['guest_nickname', 'question'], name='vote_guest_question_idx'),
+        ),
+    ]
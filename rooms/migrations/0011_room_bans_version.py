@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-18 19:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0010_vote_guest_question_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='bans_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.0.1 on 2026-10-18 16:32
+
+import datetime
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncMinute
+
+
+def backfill_rollups(apps, schema_editor):
+    """Минутные агрегаты по существующим голосам: один GROUP BY, вставка пачками."""
+    Vote = apps.get_model('rooms', 'Vote')
+    VoteRollup = apps.get_model('rooms', 'VoteRollup')
+
+    rows = (
+        Vote.objects.order_by()
+        .annotate(minute=TruncMinute('created_at', tzinfo=datetime.timezone.utc))
+        .values_list('question', 'choice', 'minute')
+        .annotate(count=Count('pk'))
+    )
+    batch = []
+    for question_id, choice_id, minute, count in rows.iterator(chunk_size=2000):
+        batch.append(VoteRollup(question_id=question_id, choice_id=choice_id, bucket=minute, count=count))
+        if len(batch) >= 2000:
+            VoteRollup.objects.bulk_create(batch)
+            batch = []
+    VoteRollup.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0011_room_bans_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VoteRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(fields=['choice', 'created_at'], name='vote_choice_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='voterollup',
+            name='choice',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='rooms.choice'),
+        ),
+        migrations.AddField(
+            model_name='voterollup',
+            name='question',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='rooms.question'),
+        ),
+        migrations.AddIndex(
+            model_name='voterollup',
+            index=models.Index(fields=['question', 'bucket'], name='rollup_question_bucket_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='voterollup',
+            constraint=models.UniqueConstraint(fields=('choice', 'bucket'), name='unique_rollup_per_choice_bucket'),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
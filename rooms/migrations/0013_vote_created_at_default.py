@@ -0,0 +1,19 @@
+# Generated by Django 5.0.1 on 2026-10-18 18:12
+
+import rooms.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0012_vote_rollup'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='vote',
+            name='created_at',
+            field=models.DateTimeField(default=rooms.models.vote_timestamp, editable=False),
+        ),
+    ]
@@ -1,5 +1,9 @@
 from django.db import models
+from django.db.models import F
 from django.conf import settings
+from django.utils import timezone
+
+from .cache import room_cache
 
 
 class Room(models.Model):
@@ -8,11 +12,39 @@ class Room(models.Model):
     slug = models.SlugField(unique=True)
     creator = models.CharField(max_length=100)
     # Поле banned_users удалено, теперь используется отдельная модель RoomBan
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Индекс нужен курсорной пагинации списка комнат (ORDER BY created_at DESC)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    # Версия содержимого комнаты: растет при любом изменении голосов, вопросов, вариантов и банов.
+    # На ней строится ETag детальной страницы (304 без сериализации дерева).
+    version = models.PositiveIntegerField(default=0)
+    # Версия списка банов: растет только при изменении RoomBan, на ней держится кэш банов
+    bans_version = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        # Обычное сохранение не должно перезаписывать версии устаревшими значениями из памяти
+        if not self._state.adding and 'update_fields' not in kwargs:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in ('version', 'bans_version')
+            ]
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def bump_version(cls, room_id, bans=False):
+        """
+        Атомарно увеличивает version (UPDATE ... SET version = version + 1)
+        и сбрасывает закэшированное дерево комнаты после коммита.
+        bans=True — изменился список банов: тем же UPDATE увеличивается bans_version.
+        """
+        changes = {'version': F('version') + 1}
+        if bans:
+            changes['bans_version'] = F('bans_version') + 1
+        cls.objects.filter(pk=room_id).update(**changes)
+        room_cache.invalidate(room_id)
+
 
 class RoomBan(models.Model):
     """
@@ -38,6 +70,8 @@ class Question(models.Model):
 
     is_active = models.BooleanField(default=True)
     show_results = models.BooleanField(default=False)
+    # Денормализованный итог по вопросу (сумма Choice.votes_count), см. rooms/counters.py
+    votes_count = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return self.text
@@ -46,22 +80,99 @@ class Question(models.Model):
 class Choice(models.Model):
     question = models.ForeignKey(Question, related_name='choices', on_delete=models.CASCADE)
     text = models.CharField(max_length=200)
-
-    @property
-    def votes_count(self):
-        return self.votes.count()
+    # Денормализованный счетчик голосов: меняется через F() в той же транзакции,
+    # что и вставка/удаление Vote (rooms/counters.py). Сверка: manage.py rebuild_vote_counters
+    votes_count = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return self.text
 
 
+def vote_timestamp():
+    # timezone.now ищется при вызове, а не при объявлении поля
+    return timezone.now()
+
+
 class Vote(models.Model):
     choice = models.ForeignKey(Choice, related_name='votes', on_delete=models.CASCADE)
+    # Дублирует choice.question: нужен для уникальных ограничений "один голос на вопрос"
+    # и для фильтров по вопросу/комнате без JOIN через Choice. Заполняется в save().
+    question = models.ForeignKey(Question, related_name='votes', on_delete=models.CASCADE, editable=False)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True)
     voter_name = models.CharField(max_length=100, blank=True, null=True)
     guest_nickname = models.CharField(max_length=100, blank=True, null=True)
 
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Не auto_now_add: буферизованный прием (rooms/ingest.py) ставит время принятия голоса,
+    # а auto_now_add перезаписал бы его временем сброса в bulk_create
+    created_at = models.DateTimeField(default=vote_timestamp, editable=False)
+
+    class Meta:
+        indexes = [
+            # Голос гостя по нику: user_voted_choice, повторный голос и удаление голосов при бане
+            models.Index(fields=['guest_nickname', 'question'], name='vote_guest_question_idx'),
+            # Точный пересчет минутных агрегатов варианта после пакетной вставки (rooms/ingest.py)
+            models.Index(fields=['choice', 'created_at'], name='vote_choice_created_idx'),
+        ]
+        constraints = [
+            # Один голос на вопрос: гонку двух параллельных запросов решает БД, а не SELECT перед INSERT
+            models.UniqueConstraint(
+                fields=['question', 'user'],
+                condition=models.Q(user__isnull=False),
+                name='unique_user_vote_per_question',
+            ),
+            models.UniqueConstraint(
+                fields=['question', 'guest_nickname'],
+                condition=models.Q(user__isnull=True, guest_nickname__isnull=False),
+                name='unique_guest_vote_per_question',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Vote for {self.choice}"
+
+    def save(self, *args, **kwargs):
+        if self.question_id is None:
+            self.question_id = self.choice.question_id
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def is_duplicate_vote_error(cls, error):
+        """
+        IntegrityError нарушает "один голос на вопрос", а не другое ограничение (например, FK
+        варианта, удаленного во время запроса). PostgreSQL сообщает имя ограничения в диагностике,
+        SQLite — столбцы нарушенного уникального индекса.
+        """
+        constraints = [constraint for constraint in cls._meta.constraints if constraint.name.startswith('unique_')]
+        diag = getattr(error.__cause__, 'diag', None)
+        if diag is not None:
+            return diag.constraint_name in {constraint.name for constraint in constraints}
+        table = cls._meta.db_table
+        columns = {
+            ', '.join(f"{table}.{cls._meta.get_field(field).column}" for field in constraint.fields)
+            for constraint in constraints
+        }
+        message = str(error)
+        return message.startswith('UNIQUE constraint failed: ') and message.split(': ', 1)[1] in columns
+
+
+class VoteRollup(models.Model):
+    """
+    Число голосов за вариант за одну минуту (bucket — начало минуты, UTC).
+    Поддерживается инкрементально вместе со счетчиками (rooms/counters.py); из него строится
+    временной ряд результатов без сканирования таблицы Vote.
+    """
+    question = models.ForeignKey(Question, related_name='rollups', on_delete=models.CASCADE)
+    choice = models.ForeignKey(Choice, related_name='rollups', on_delete=models.CASCADE)
+    bucket = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['question', 'bucket'], name='rollup_question_bucket_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['choice', 'bucket'], name='unique_rollup_per_choice_bucket'),
+        ]
 
     def __str__(self):
-        return f"Vote for {self.choice}"
\ No newline at end of file
+        return f"{self.choice} @ {self.bucket:%Y-%m-%d %H:%M}: {self.count}"
@@ -0,0 +1,21 @@
+from rest_framework.pagination import CursorPagination
+
+
+class RoomCursorPagination(CursorPagination):
+    """
+    Keyset-пагинация лобби: WHERE created_at < <курсор> ORDER BY created_at DESC LIMIT N.
+    В отличие от OFFSET стоимость страницы не растет вместе с таблицей комнат.
+    """
+    ordering = '-created_at'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+
+class VoterCursorPagination(CursorPagination):
+    """Голосующие за вариант (GET /api/choices/{id}/voters/) в порядке голосования."""
+    ordering = 'id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
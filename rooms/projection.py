@@ -0,0 +1,113 @@
+"""
+Сборка детальной страницы комнаты без DRF-сериализаторов.
+
+RoomSerializer -> QuestionSerializer -> ChoiceSerializer на большой комнате — это тысячи вызовов
+полей и SerializerMethodField. Здесь дерево собирается за один проход по строкам .values_list()
+запросами вопросов и вариантов (и голосов, если нужны списки голосующих), как и prefetch. Результат
+после рендеринга байт в байт совпадает с RoomSerializer(room, context={'is_creator': ..., 'voted_choices': {},
+'selection': ...}).data — это проверяет контрактный тест RoomProjectionTests. Новое поле в этих
+сериализаторах нужно добавить и сюда.
+
+?fields= к готовому дереву применяет select_fields — так же, как SparseFieldsMixin у сериализаторов.
+"""
+from rest_framework import serializers
+
+from .models import Choice, Question, Vote
+
+# Формат даты как у ModelSerializer (DATETIME_FORMAT, часовой пояс проекта)
+_datetime = serializers.DateTimeField()
+
+ANONYMOUS = "Аноним"
+
+# Meta.optional_fields сериализаторов дерева комнаты: отдаются только по ?include=
+OPTIONAL_FIELDS = frozenset({'voters'})
+
+
+def voter_name(user_id, display_name, email, guest_nickname, name):
+    """Имя в списке голосующих — как в ChoiceSerializer.get_voters."""
+    if user_id is None:
+        return guest_nickname or name or ANONYMOUS
+    return display_name or email
+
+
+def project_room(room, is_creator, voters=False):
+    """
+    Общая часть детальной страницы (без user_voted_choice) для зрителя вида is_creator.
+    voters=True — со списками голосующих (?include=voters); они загружаются только для вопросов,
+    где их видно: Хосту или при show_results. Без voters голоса не читаются вовсе.
+    """
+    questions = list(
+        Question.objects.filter(room=room).order_by('id').values_list('id', 'text', 'is_active', 'show_results')
+    )
+    choices_by_question = {question_id: [] for question_id, *_ in questions}
+    choices = {}
+    if questions:
+        rows = (
+            Choice.objects.filter(question_id__in=choices_by_question).order_by('id')
+            .values_list('id', 'question_id', 'text', 'votes_count')
+        )
+        for choice_id, question_id, text, votes_count in rows:
+            choice = {'id': choice_id, 'text': text, 'votes_count': votes_count}
+            if voters:
+                choice['voters'] = []
+            choices_by_question[question_id].append(choice)
+            choices[choice_id] = choice
+
+    with_voters = [question_id for question_id, _, _, show_results in questions if is_creator or show_results]
+    if voters and with_voters and choices:
+        rows = (
+            Vote.objects.filter(question_id__in=with_voters).order_by('id')
+            .values_list('choice_id', 'user_id', 'user__display_name', 'user__email', 'guest_nickname', 'voter_name')
+        )
+        for choice_id, user_id, display_name, email, guest_nickname, name in rows:
+            choice = choices[choice_id]
+            choice['voters'].append({
+                'name': voter_name(user_id, display_name, email, guest_nickname, name),
+                'choice': choice['text'],
+                'is_guest': user_id is None,
+            })
+
+    return {
+        'id': room.pk,
+        'title': room.title,
+        'description': room.description,
+        'slug': room.slug,
+        'creator': room.creator,
+        'questions': [
+            {
+                'id': question_id,
+                'room': room.pk,
+                'text': text,
+                'choices': choices_by_question[question_id],
+                'is_active': is_active,
+                'show_results': show_results,
+                'user_voted_choice': None,
+            }
+            for question_id, text, is_active, show_results in questions
+        ],
+        'created_at': _datetime.to_representation(room.created_at),
+    }
+
+
+def needs_voters(selection, path=('questions', 'choices')):
+    """Нужны ли при этом выборе полей списки голосующих (path — вложенность до вариантов)."""
+    for name in path:
+        if not selection.wants(name):
+            return False
+        selection = selection.nested(name)
+    return selection.wants('voters', optional=True)
+
+
+def select_fields(data, selection):
+    """Оставляет в готовом дереве только поля из ?fields= (FieldSelection из rooms/serializers.py)."""
+    if selection.tree is None:
+        return data
+    selected = {}
+    for name, value in data.items():
+        if not selection.wants(name, optional=name in OPTIONAL_FIELDS):
+            continue
+        if isinstance(value, list) and value and isinstance(value[0], dict):
+            nested = selection.nested(name)
+            value = [select_fields(item, nested) for item in value]
+        selected[name] = value
+    return selected
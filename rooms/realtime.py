@@ -0,0 +1,316 @@
+"""
+Real-time рассылка изменений комнаты (голоса, вопросы, баны) через SSE и WebSocket.
+
+Вместо того чтобы каждый участник перезапрашивал всю комнату, сервер публикует
+маленькие дельты в канал комнаты (по slug):
+
+    {"type": "vote", "question": 1, "choice": 3, "votes_count": 42}
+    {"type": "question", "question": 1, "is_active": false, "show_results": true}
+    {"type": "question_created", "question": 2}
+    {"type": "choice_created", "question": 2, "choice": 7}
+    {"type": "ban", "nicknames": ["Troll"], "choices": {"3": 41}}
+    {"type": "resync"}  — подписчик не успевал читать, нужно перезагрузить комнату
+
+Брокер выбирается настройкой ROOMS_REALTIME['BACKEND']:
+  * InMemoryBroker — внутри одного процесса (тесты, один uvicorn/daphne-воркер);
+  * RedisBroker — Redis Pub/Sub для нескольких процессов/серверов (нужен пакет redis).
+
+SSE-поток (GET /api/rooms/<slug>/events/) и WebSocket (/ws/rooms/<slug>/) требуют ASGI-сервер.
+Подписка проверяет бан так же, как детальная страница комнаты. Зритель определяется так:
+  * ?ticket= — билет подписки из POST /api/rooms/<slug>/events-ticket/ (issue_ticket). Браузерный
+    EventSource и WebSocket не умеют слать заголовок Authorization, поэтому вошедший пользователь
+    сначала получает по JWT билет: подписанное (SECRET_KEY) имя зрителя и комната, живет
+    ROOMS_REALTIME['TICKET_TTL'] секунд и нужен только в момент подключения;
+  * заголовок Authorization с JWT — для клиентов, которые умеют его передать;
+  * иначе гость из ?guest_name=.
+Битый или истекший билет/токен — 401 (WebSocket — 4401). Забаненный получает 403 (WebSocket —
+закрытие с кодом 4403), а бан во время подписки завершает поток после события "ban".
+"""
+import asyncio
+import json
+import re
+import threading
+from types import SimpleNamespace
+from urllib.parse import parse_qs
+
+from django.conf import settings
+from django.core import signing
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.module_loading import import_string
+from rest_framework.exceptions import AuthenticationFailed
+from users.authentication import ClaimsJWTAuthentication
+
+from .cache import ban_cache
+from .models import Room
+from .serializers import get_viewer_name
+
+HEARTBEAT_SECONDS = 15
+TICKET_SALT = 'rooms.realtime.ticket'
+DEFAULT_TICKET_TTL = 60
+
+
+class BaseBroker:
+    """Интерфейс брокера: publish() вызывается из синхронных view, subscribe() — из async-кода."""
+
+    def publish(self, slug, event):
+        raise NotImplementedError
+
+    def subscribe(self, slug):
+        """Асинхронный контекст-менеджер, отдающий asyncio.Queue с событиями комнаты."""
+        raise NotImplementedError
+
+
+class _Subscription:
+    def __init__(self, broker, slug, max_queue):
+        self.broker = broker
+        self.slug = slug
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.loop = None
+
+    async def __aenter__(self):
+        self.loop = asyncio.get_running_loop()
+        self.broker._add(self)
+        return self.queue
+
+    async def __aexit__(self, *exc_info):
+        self.broker._remove(self)
+
+    def deliver(self, event):
+        """Выполняется в event loop подписчика."""
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Медленный клиент: выбрасываем накопленное и просим перезагрузить комнату целиком
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": "resync"})
+
+
+class InMemoryBroker(BaseBroker):
+    """Брокер в памяти процесса. Потокобезопасен: publish можно звать из потоков WSGI/threadpool."""
+
+    def __init__(self, max_queue=100):
+        self.max_queue = max_queue
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+
+    def _add(self, subscription):
+        with self._lock:
+            self._subscriptions.setdefault(subscription.slug, set()).add(subscription)
+
+    def _remove(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.slug, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self._subscriptions.pop(subscription.slug, None)
+
+    def subscriber_count(self, slug):
+        with self._lock:
+            return len(self._subscriptions.get(slug, ()))
+
+    def publish(self, slug, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(slug, ()))
+        for subscription in subscriptions:
+            if subscription.loop.is_closed():
+                continue
+            subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+
+    def subscribe(self, slug):
+        return _Subscription(self, slug, self.max_queue)
+
+
+class RedisBroker(InMemoryBroker):
+    """
+    Redis Pub/Sub для нескольких процессов: publish уходит в Redis, а каждый процесс
+    держит одно соединение-слушатель на комнату и раздает события локальным подписчикам.
+    """
+
+    def __init__(self, url='redis://127.0.0.1:6379/0', channel_prefix='rooms:', max_queue=100):
+        super().__init__(max_queue=max_queue)
+        import redis  # опциональная зависимость, нужна только для этого бэкенда
+
+        self.url = url
+        self.channel_prefix = channel_prefix
+        self._redis = redis.Redis.from_url(url)
+        self._listeners = {}
+
+    def publish(self, slug, event):
+        self._redis.publish(self.channel_prefix + slug, json.dumps(event))
+
+    def _add(self, subscription):
+        super()._add(subscription)
+        if subscription.slug not in self._listeners:
+            self._listeners[subscription.slug] = asyncio.ensure_future(self._listen(subscription.slug))
+
+    def _remove(self, subscription):
+        super()._remove(subscription)
+        if not self.subscriber_count(subscription.slug):
+            listener = self._listeners.pop(subscription.slug, None)
+            if listener:
+                listener.cancel()
+
+    async def _listen(self, slug):
+        import redis.asyncio
+
+        client = redis.asyncio.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(self.channel_prefix + slug)
+        try:
+            async for message in pubsub.listen():
+                if message['type'] == 'message':
+                    super().publish(slug, json.loads(message['data']))
+        finally:
+            await pubsub.unsubscribe()
+            await client.aclose()
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        config = getattr(settings, 'ROOMS_REALTIME', {})
+        backend = import_string(config.get('BACKEND', 'rooms.realtime.InMemoryBroker'))
+        _broker = backend(**config.get('OPTIONS', {}))
+    return _broker
+
+
+def publish(slug, event):
+    """Публикует событие после коммита текущей транзакции (откаченные изменения не рассылаются)."""
+    transaction.on_commit(lambda: get_broker().publish(slug, event))
+
+
+# --- Транспорты ---
+
+async def _get_room(slug):
+    return await Room.objects.filter(slug=slug).afirst()
+
+
+def ticket_ttl():
+    return getattr(settings, 'ROOMS_REALTIME', {}).get('TICKET_TTL', DEFAULT_TICKET_TTL)
+
+
+def issue_ticket(room, user):
+    """Билет подписки на комнату для вошедшего пользователя (вместо заголовка Authorization)."""
+    return signing.dumps({'room': room.pk, 'name': get_viewer_name(user)}, salt=TICKET_SALT)
+
+
+def _ticket_name(room, ticket):
+    try:
+        payload = signing.loads(ticket, salt=TICKET_SALT, max_age=ticket_ttl())
+    except signing.BadSignature:  # в т.ч. SignatureExpired
+        raise AuthenticationFailed("Билет подписки недействителен или истек.")
+    if payload.get('room') != room.pk:
+        raise AuthenticationFailed("Билет подписки выдан для другой комнаты.")
+    return payload['name']
+
+
+async def _viewer_name(request, room, guest_name, ticket=''):
+    """
+    Имя зрителя для проверки бана — как в детальной странице комнаты: из билета подписки,
+    из JWT (request нужен только с META: Authorization) или гостевое. Битый билет или токен —
+    AuthenticationFailed.
+    """
+    if ticket:
+        return _ticket_name(room, ticket)
+    authenticated = await ClaimsJWTAuthentication().aauthenticate(request)
+    if authenticated is not None:
+        return get_viewer_name(authenticated[0])
+    return guest_name
+
+
+def _ends_subscription(event, name):
+    """Зритель забанен во время подписки: после события бана поток закрывается."""
+    return event['type'] == 'ban' and bool(name) and name in event['nicknames']
+
+
+async def _sse_stream(slug, name=None):
+    async with get_broker().subscribe(slug) as queue:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                # Комментарий-пинг, чтобы прокси не закрывали "молчащее" соединение
+                yield ": ping\n\n"
+                continue
+            yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+            if _ends_subscription(event, name):
+                return
+
+
+async def room_events(request, slug):
+    """GET /api/rooms/<slug>/events/ — Server-Sent Events с дельтами комнаты."""
+    if not isinstance(request, ASGIRequest):
+        # Под WSGI (manage.py runserver) бесконечный поток занял бы поток сервера навсегда
+        return HttpResponse("Поток событий доступен только под ASGI-сервером.", status=501)
+    room = await _get_room(slug)
+    if room is None:
+        raise Http404
+    try:
+        name = await _viewer_name(request, room, request.GET.get('guest_name', ''), request.GET.get('ticket', ''))
+    except AuthenticationFailed as exc:
+        return HttpResponse(str(exc.detail), status=exc.status_code)
+    if await ban_cache.ais_banned(room, name):
+        return HttpResponse("Вы забанены в этой комнате.", status=403)
+    response = StreamingHttpResponse(_sse_stream(slug, name), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx не должен буферизовать поток
+    return response
+
+
+WEBSOCKET_PATH = re.compile(r'^/ws/rooms/(?P<slug>[-\w]+)/$')
+
+
+async def websocket_application(scope, receive, send):
+    """ASGI-приложение для ws://.../ws/rooms/<slug>/ (подключается в config/asgi.py)."""
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+
+    match = WEBSOCKET_PATH.match(scope['path'])
+    room = await _get_room(match['slug']) if match else None
+    if room is None:
+        await send({'type': 'websocket.close', 'code': 4404})
+        return
+
+    headers = dict(scope.get('headers', []))
+    query = parse_qs(scope.get('query_string', b'').decode())
+    guest_name = query.get('guest_name', [''])[0]
+    # aauthenticate читает только META: заголовок Authorization из scope
+    meta = {'HTTP_AUTHORIZATION': headers[b'authorization'].decode('latin-1')} if b'authorization' in headers else {}
+    try:
+        name = await _viewer_name(SimpleNamespace(META=meta), room, guest_name, query.get('ticket', [''])[0])
+    except AuthenticationFailed:
+        await send({'type': 'websocket.close', 'code': 4401})
+        return
+    if await ban_cache.ais_banned(room, name):
+        await send({'type': 'websocket.close', 'code': 4403})
+        return
+
+    await send({'type': 'websocket.accept'})
+    async with get_broker().subscribe(match['slug']) as queue:
+        disconnect = asyncio.ensure_future(receive())
+        try:
+            while True:
+                next_event = asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait({disconnect, next_event}, return_when=asyncio.FIRST_COMPLETED)
+                if disconnect in done:
+                    next_event.cancel()
+                    if disconnect.result()['type'] == 'websocket.disconnect':
+                        return
+                    # Сообщения от клиента не ожидаются — просто слушаем дальше
+                    disconnect = asyncio.ensure_future(receive())
+                if next_event in done:
+                    event = next_event.result()
+                    await send({'type': 'websocket.send', 'text': json.dumps(event, ensure_ascii=False)})
+                    if _ends_subscription(event, name):
+                        await send({'type': 'websocket.close', 'code': 4403})
+                        return
+        finally:
+            disconnect.cancel()
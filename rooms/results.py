@@ -0,0 +1,117 @@
+"""
+Агрегированные результаты: счетчики и проценты по вариантам и временной ряд голосов,
+без вложенных списков голосующих.
+
+  * Счетчики — из денормализованного Choice.votes_count: один запрос на вопрос или комнату.
+  * Временной ряд — из минутных агрегатов VoteRollup: GROUP BY (вопрос, минута) в БД,
+    укрупнение до часа/дня — в Python (не больше 1440 строк на вопрос за сутки). Таблица Vote
+    не читается, поэтому вопрос с миллионом голосов отвечает так же быстро, как пустой.
+
+Видимость — как на странице комнаты: результаты вопроса видны всем, если show_results,
+иначе только создателю комнаты.
+"""
+import asyncio
+import datetime
+
+from django.db.models import Sum
+
+from .models import Choice, VoteRollup
+
+# Усечение начала минуты (UTC) до начала интервала
+INTERVALS = {
+    'minute': lambda bucket: bucket,
+    'hour': lambda bucket: bucket.replace(minute=0),
+    'day': lambda bucket: bucket.replace(hour=0, minute=0),
+}
+DEFAULT_INTERVAL = 'hour'
+
+
+def _grouped_rollups(rollups):
+    return (
+        rollups.order_by().values_list('question', 'bucket').annotate(votes=Sum('count'))
+        .order_by('question', 'bucket')
+    )
+
+
+def _timelines(rollups, interval):
+    """{question_id: [{"start": ..., "votes": ...}]} по одному GROUP BY (вопрос, минута)."""
+    return _timeline_points(_grouped_rollups(rollups), interval)
+
+
+def _timeline_points(grouped, interval):
+    truncate = INTERVALS[interval]
+    points = {}
+    for question_id, bucket, votes in grouped:
+        if votes:
+            start = truncate(bucket.astimezone(datetime.timezone.utc))
+            series = points.setdefault(question_id, {})
+            series[start] = series.get(start, 0) + votes
+    return {
+        question_id: [{"start": start, "votes": votes} for start, votes in series.items()]
+        for question_id, series in points.items()
+    }
+
+
+def _question_payload(question, choices, timeline):
+    total = sum(choice['votes_count'] for choice in choices)
+    return {
+        "question": question.pk,
+        "text": question.text,
+        "show_results": question.show_results,
+        "total_votes": total,
+        "choices": [
+            {**choice, "percent": round(choice['votes_count'] * 100 / total, 1) if total else 0.0}
+            for choice in choices
+        ],
+        "timeline": timeline,
+    }
+
+
+def question_results(question, interval=DEFAULT_INTERVAL):
+    choices = list(Choice.objects.filter(question=question).order_by('id').values('id', 'text', 'votes_count'))
+    timeline = _timelines(VoteRollup.objects.filter(question=question), interval).get(question.pk, [])
+    return {"interval": interval, **_question_payload(question, choices, timeline)}
+
+
+def _room_choices(visible_ids):
+    return Choice.objects.filter(question_id__in=visible_ids).order_by('id').values('id', 'question', 'text', 'votes_count')
+
+
+def room_results(room, questions, visible_ids, interval=DEFAULT_INTERVAL):
+    """
+    Результаты всех вопросов комнаты тремя запросами (вопросы передаются уже загруженными).
+    Вопросы вне visible_ids отдаются без счетчиков, с results_hidden.
+    """
+    rows = _room_choices(visible_ids)
+    timelines = _timelines(VoteRollup.objects.filter(question_id__in=visible_ids), interval) if visible_ids else {}
+    return _room_payload(room, questions, visible_ids, interval, rows, timelines)
+
+
+async def aroom_results(room, questions, visible_ids, interval=DEFAULT_INTERVAL):
+    """room_results() для async-view: счетчики и временной ряд читаются одновременно."""
+    async def collect(queryset):
+        return [row async for row in queryset]
+
+    if visible_ids:
+        rows, grouped = await asyncio.gather(
+            collect(_room_choices(visible_ids)),
+            collect(_grouped_rollups(VoteRollup.objects.filter(question_id__in=visible_ids))),
+        )
+    else:
+        rows, grouped = [], []
+    return _room_payload(room, questions, visible_ids, interval, rows, _timeline_points(grouped, interval))
+
+
+def _room_payload(room, questions, visible_ids, interval, rows, timelines):
+    choices = {}
+    for row in rows:
+        question_id = row.pop('question')
+        choices.setdefault(question_id, []).append(row)
+
+    payload = []
+    for question in questions:
+        if question.pk in visible_ids:
+            payload.append(_question_payload(question, choices.get(question.pk, []), timelines.get(question.pk, [])))
+        else:
+            payload.append({"question": question.pk, "text": question.text, "results_hidden": True})
+    return {"room": room.slug, "interval": interval, "questions": payload}
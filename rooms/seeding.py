@@ -0,0 +1,131 @@
+"""
+Синтетический набор данных для нагрузочных замеров (manage.py seed_rooms, manage.py bench_api).
+
+Все объекты помечаются префиксом, по которому их находит бенчмарк и удаляет clear_dataset:
+  * пользователи — username/display_name "<prefix>-user-N", email "<prefix>-user-N@seed.local",
+    пароль SEED_PASSWORD (хэшируется один раз на весь набор);
+  * комнаты — slug "<prefix>-room-N", создатель — пользователь N % users;
+  * гости — ники "<prefix>-guest-N", забаненные — "<prefix>-banned-N" (в голосах не участвуют).
+
+Вставка идет bulk_create пачками комнат, каждая пачка — одна транзакция; счетчики и минутные
+агрегаты пачки пересчитываются точно (rooms/counters.py), как после буферизованного приема.
+Одинаковые параметры и seed дают одинаковый набор (кроме pk и времени создания).
+"""
+import random
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+from users.models import normalize_display_name
+
+from . import counters
+from .models import Choice, Question, Room, RoomBan, Vote
+
+User = get_user_model()
+
+SEED_PASSWORD = 'SeedPassword123!'
+ROOMS_PER_BATCH = 50
+
+
+def user_name(prefix, index):
+    return f"{prefix}-user-{index}"
+
+
+def room_slug(prefix, index):
+    return f"{prefix}-room-{index}"
+
+
+def seed_dataset(prefix='seed', rooms=100, questions=5, choices=4, users=1000, guests=5000,
+                 voters=200, bans=10, registered_share=0.3, seed=0):
+    """
+    Создает набор данных; voters — голосов на вопрос (не больше числа участников),
+    registered_share — доля голосов зарегистрированных пользователей. Возвращает число созданных строк.
+    """
+    rng = random.Random(seed)
+    password = make_password(SEED_PASSWORD)
+    names = [user_name(prefix, index) for index in range(users)]
+    created_users = User.objects.bulk_create(
+        (
+            User(
+                username=name, email=f"{name}@seed.local", password=password,
+                display_name=name, display_name_normalized=normalize_display_name(name),
+            )
+            for name in names
+        ),
+        batch_size=5000,
+    )
+    user_ids = [user.pk for user in created_users]
+    guest_names = [f"{prefix}-guest-{index}" for index in range(guests)]
+    registered_votes = min(int(voters * registered_share), len(user_ids))
+    guest_votes = min(voters - registered_votes, len(guest_names))
+
+    def pick_voters():
+        return (
+            [('u', user_id) for user_id in rng.sample(user_ids, registered_votes)]
+            + [('g', name) for name in rng.sample(guest_names, guest_votes)]
+        )
+
+    totals = {'users': len(user_ids), 'rooms': 0, 'questions': 0, 'choices': 0, 'votes': 0, 'bans': 0}
+    for start in range(0, rooms, ROOMS_PER_BATCH):
+        indexes = range(start, min(start + ROOMS_PER_BATCH, rooms))
+        with transaction.atomic():
+            batch = _seed_rooms(prefix, indexes, names, rng, questions, choices, bans, pick_voters)
+        for key, count in batch.items():
+            totals[key] += count
+    return totals
+
+
+def _seed_rooms(prefix, indexes, names, rng, questions, choices, bans, pick_voters):
+    started = timezone.now()
+    created_rooms = Room.objects.bulk_create(
+        Room(
+            title=f"Комната {index}", description="Сгенерировано seed_rooms",
+            slug=room_slug(prefix, index), creator=names[index % len(names)] if names else prefix,
+        )
+        for index in indexes
+    )
+    created_questions = Question.objects.bulk_create(
+        # Часть вопросов с открытыми результатами: зрителям отдаются списки голосующих
+        Question(room=room, text=f"Вопрос {number}", show_results=rng.random() < 0.5)
+        for room in created_rooms for number in range(questions)
+    )
+    created_choices = Choice.objects.bulk_create(
+        Choice(question=question, text=f"Вариант {number}")
+        for question in created_questions for number in range(choices)
+    )
+    by_question = {}
+    for choice in created_choices:
+        by_question.setdefault(choice.question_id, []).append(choice.pk)
+
+    votes = []
+    for question in created_questions:
+        for kind, voter in pick_voters():
+            choice_id = rng.choice(by_question[question.pk])
+            if kind == 'u':
+                votes.append(Vote(choice_id=choice_id, question=question, user_id=voter))
+            else:
+                votes.append(Vote(choice_id=choice_id, question=question, guest_nickname=voter))
+    Vote.objects.bulk_create(votes, batch_size=5000)
+    RoomBan.objects.bulk_create(
+        RoomBan(room=room, banned_identifier=f"{prefix}-banned-{number}")
+        for room in created_rooms for number in range(bans)
+    )
+
+    choice_ids = [choice.pk for choice in created_choices]
+    counters.recount(choice_ids, [question.pk for question in created_questions])
+    counters.recount_rollups(choice_ids, started)
+    return {
+        'rooms': len(created_rooms),
+        'questions': len(created_questions),
+        'choices': len(created_choices),
+        'votes': len(votes),
+        'bans': len(created_rooms) * bans,
+    }
+
+
+def clear_dataset(prefix='seed'):
+    """Удаляет комнаты и пользователей набора (голоса, баны и токены — каскадом). Возвращает число строк."""
+    rooms, _ = Room.objects.filter(slug__startswith=f"{prefix}-room-").delete()
+    users, _ = User.objects.filter(username__startswith=f"{prefix}-user-").delete()
+    return rooms + users
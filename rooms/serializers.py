@@ -1,54 +1,144 @@
 from rest_framework import serializers
+from rest_framework.exceptions import PermissionDenied
 from django.contrib.auth import get_user_model
+from .cache import ban_cache
 from .models import Room, Question, Choice, Vote
+from .projection import voter_name
 
 User = get_user_model()
 
 
-class ChoiceSerializer(serializers.ModelSerializer):
-    votes_count = serializers.SerializerMethodField()
+def get_viewer_name(user):
+    """Имя, под которым пользователь фигурирует в комнатах (display_name или email)."""
+    if not user or not user.is_authenticated:
+        return None
+    return user.display_name if user.display_name else user.email
+
+
+def is_room_creator(user, room):
+    """Является ли пользователь Хостом комнаты."""
+    if not user or not user.is_authenticated:
+        return False
+    return get_viewer_name(user) == room.creator or user.email == room.creator
+
+
+class FieldSelection:
+    """
+    Выбор полей ответа из query-параметров:
+      * ?fields=id,title,questions.text,questions.choices.votes_count — только перечисленные поля,
+        вложенные через точку; вложенное поле без продолжения отдается со всеми полями по умолчанию;
+      * ?include=voters — добавить опциональные поля (Meta.optional_fields), по умолчанию их нет.
+    Опциональное поле, явно названное в fields, тоже отдается.
+    """
+
+    def __init__(self, tree=None, include=frozenset()):
+        # tree: {имя: поддерево или None} или None — поля по умолчанию
+        self.tree = tree
+        self.include = include
+
+    @classmethod
+    def from_request(cls, request):
+        tree = None
+        for path in filter(None, (item.strip() for item in request.GET.get('fields', '').split(','))):
+            if tree is None:
+                tree = {}
+            node = tree
+            *parents, name = path.split('.')
+            for parent in parents:
+                node[parent] = node.get(parent) or {}
+                node = node[parent]
+            node.setdefault(name, None)
+        include = frozenset(filter(None, (item.strip() for item in request.GET.get('include', '').split(','))))
+        return cls(tree, include)
+
+    @property
+    def is_default(self):
+        return self.tree is None and not self.include
+
+    def wants(self, name, optional=False):
+        if self.tree is not None:
+            return name in self.tree
+        return not optional or name in self.include
+
+    def nested(self, name):
+        return FieldSelection(self.tree.get(name) if self.tree is not None else None, self.include)
+
+    def key(self):
+        """Каноническая запись выбора — для ETag и ключей кэша."""
+        def flatten(tree, prefix=''):
+            for name, subtree in sorted(tree.items()):
+                yield from flatten(subtree, f"{prefix}{name}.") if subtree else [f"{prefix}{name}"]
+        fields = ','.join(flatten(self.tree)) if self.tree is not None else '*'
+        return f"fields={fields};include={','.join(sorted(self.include))}"
+
+
+DEFAULT_SELECTION = FieldSelection()
+
+
+class SparseFieldsMixin:
+    """
+    Применяет FieldSelection из context['selection'] (без него — поля по умолчанию).
+    Невыбранные поля убираются до сериализации: их SerializerMethodField не вызываются.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selection = getattr(self, '_selection', None) or self.context.get('selection', DEFAULT_SELECTION)
+        optional = getattr(self.Meta, 'optional_fields', ())
+        for name in list(fields):
+            if not selection.wants(name, optional=name in optional):
+                del fields[name]
+                continue
+            nested = getattr(fields[name], 'child', fields[name])
+            if isinstance(nested, SparseFieldsMixin):
+                nested._selection = selection.nested(name)
+        return fields
+
+
+def voter_entry(vote, choice_text):
+    """Голосующий в списках: {"name", "choice", "is_guest"}; vote.user должен быть подгружен."""
+    user = vote.user
+    return {
+        "name": voter_name(
+            vote.user_id, user and user.display_name, user and user.email, vote.guest_nickname, vote.voter_name,
+        ),
+        "choice": choice_text,
+        "is_guest": vote.user_id is None,
+    }
+
+
+def can_see_voters(user, question):
+    """Списки голосующих видит Хост или все, если результаты вопроса открыты."""
+    return question.show_results or is_room_creator(user, question.room)
+
+
+class ChoiceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    # Денормализованный счетчик (Choice.votes_count), COUNT по Vote не нужен
+    votes_count = serializers.IntegerField(read_only=True)
+    # Только по ?include=voters; полный список постранично — GET /api/choices/{id}/voters/
     voters = serializers.SerializerMethodField()
 
     class Meta:
         model = Choice
         fields = ['id', 'text', 'votes_count', 'voters']
-
-    def get_votes_count(self, obj):
-        return obj.votes.count()
+        optional_fields = ['voters']
 
     def get_voters(self, obj):
-        request = self.context.get('request')
-        user = request.user if request else None
-
-        # Определяем создателя (Хоста)
-        room_creator = obj.question.room.creator
-        is_creator = False
-        if user and user.is_authenticated:
-            # Сравниваем display_name или email
-            current_name = user.display_name if user.display_name else user.email
-            is_creator = (current_name == room_creator) or (user.email == room_creator)
+        # Определяем создателя (Хоста): RoomViewSet считает это один раз на запрос
+        is_creator = self.context.get('is_creator')
+        if is_creator is None:
+            request = self.context.get('request')
+            user = request.user if request else None
+            is_creator = is_room_creator(user, obj.question.room)
 
         # Показываем список проголосовавших, если это Хост ИЛИ результаты открыты всем
         if is_creator or obj.question.show_results:
-            voters_list = []
-            for vote in obj.votes.all():
-                if vote.user:
-                    name = vote.user.display_name if vote.user.display_name else vote.user.email
-                    is_guest = False
-                else:
-                    name = vote.guest_nickname or vote.voter_name or "Аноним"
-                    is_guest = True
-
-                voters_list.append({
-                    "name": name,
-                    "choice": obj.text,
-                    "is_guest": is_guest
-                })
-            return voters_list
+            # votes + user подгружены через prefetch_related, запросов здесь нет
+            return [voter_entry(vote, obj.text) for vote in obj.votes.all()]
         return []
 
 
-class QuestionSerializer(serializers.ModelSerializer):
+class QuestionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     choices = ChoiceSerializer(many=True, read_only=True)
     room = serializers.PrimaryKeyRelatedField(queryset=Room.objects.all())
     user_voted_choice = serializers.SerializerMethodField()
@@ -58,6 +148,11 @@ class QuestionSerializer(serializers.ModelSerializer):
         fields = ['id', 'room', 'text', 'choices', 'is_active', 'show_results', 'user_voted_choice']
 
     def get_user_voted_choice(self, obj):
+        # Словарь {question_id: choice_id} собирается одним запросом на всю комнату
+        voted_choices = self.context.get('voted_choices')
+        if voted_choices is not None:
+            return voted_choices.get(obj.id)
+
         request = self.context.get('request')
         if not request: return None
 
@@ -66,14 +161,14 @@ class QuestionSerializer(serializers.ModelSerializer):
 
         vote = None
         if user and user.is_authenticated:
-            vote = Vote.objects.filter(choice__question=obj, user=user).first()
+            vote = Vote.objects.filter(question=obj, user=user).first()
         elif guest_name:
-            vote = Vote.objects.filter(choice__question=obj, guest_nickname=guest_name).first()
+            vote = Vote.objects.filter(question=obj, guest_nickname=guest_name).first()
 
-        return vote.choice.id if vote else None
+        return vote.choice_id if vote else None
 
 
-class RoomSerializer(serializers.ModelSerializer):
+class RoomSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     questions = QuestionSerializer(many=True, read_only=True)
     creator = serializers.CharField(read_only=True)
 
@@ -82,46 +177,71 @@ class RoomSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'description', 'slug', 'creator', 'questions', 'created_at']
 
 
+class RoomListSerializer(serializers.ModelSerializer):
+    """
+    Облегченная карточка комнаты для лобби: без вопросов и списков голосующих.
+    question_count и total_votes приходят аннотациями из RoomViewSet.
+    """
+    question_count = serializers.IntegerField(read_only=True)
+    total_votes = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Room
+        fields = ['id', 'title', 'slug', 'creator', 'created_at', 'question_count', 'total_votes']
+
+
+ALREADY_VOTED = "Вы уже голосовали в этом вопросе!"
+QUESTION_INACTIVE = "Голосование остановлено создателем."
+GUEST_NAME_REQUIRED = "Гость должен представиться!"
+NAME_TAKEN = "Это имя занято зарегистрированным пользователем."
+
 class VoteSerializer(serializers.ModelSerializer):
     # ИСПРАВЛЕНИЕ: Добавили allow_null=True
     guest_nickname = serializers.CharField(required=False, allow_blank=True, allow_null=True)
     user = serializers.PrimaryKeyRelatedField(read_only=True)
+    # Вариант, вопрос и комната загружаются одним запросом — дальше валидация их не перечитывает
+    choice = serializers.PrimaryKeyRelatedField(queryset=Choice.objects.select_related('question__room'))
 
     class Meta:
         model = Vote
         fields = ['id', 'choice', 'guest_nickname', 'user']
 
+    # Причина отказа для метрики rooms_votes_total (core/metrics.py): ее читает VoteCreateView
+    rejection_reason = None
+
+    def reject(self, reason, exception):
+        self.rejection_reason = reason
+        raise exception
+
     def validate(self, data):
         user = self.context['request'].user
         nickname = data.get('guest_nickname')
         choice = data['choice']
         question = choice.question
 
+        # Проверка бана (403, как и раньше): ник гостя или display_name пользователя
+        current_name = user.display_name if user.is_authenticated else nickname
+        if ban_cache.is_banned(question.room, current_name):
+            self.reject('banned', PermissionDenied("Вы забанены!"))
+
         if not question.is_active:
-            raise serializers.ValidationError("Голосование остановлено создателем.")
+            self.reject('inactive_question', serializers.ValidationError(QUESTION_INACTIVE))
 
         # Логика проверки имени
         if not user.is_authenticated:
             if not nickname:
-                raise serializers.ValidationError("Гость должен представиться!")
-            if User.objects.filter(display_name__iexact=nickname).exists():
-                raise serializers.ValidationError("Это имя занято зарегистрированным пользователем.")
-
-        # Проверка на повторное голосование
-        if user.is_authenticated:
-            has_voted = Vote.objects.filter(user=user, choice__question=question).exists()
-        else:
-            has_voted = Vote.objects.filter(guest_nickname=nickname, choice__question=question).exists()
-
-        if has_voted:
-            raise serializers.ValidationError({"non_field_errors": ["Вы уже голосовали в этом вопросе!"]})
+                self.reject('name_required', serializers.ValidationError(GUEST_NAME_REQUIRED))
+            if User.objects.display_name_taken(nickname):
+                self.reject('name_taken', serializers.ValidationError(NAME_TAKEN))
 
+        # Повторное голосование отсекают уникальные ограничения Vote в БД (см. VoteCreateView)
         return data
 
     def create(self, validated_data):
         user = self.context['request'].user
         if user.is_authenticated:
             validated_data['user'] = user
+        validated_data['question'] = validated_data['choice'].question
         return super().create(validated_data)
 
 
@@ -0,0 +1,73 @@
+"""
+Сигналы, поддерживающие Room.version при изменении вопросов, вариантов и банов
+(включая правки через админку). Голоса сюда намеренно не подключены: у Vote нет
+receiver-ов, поэтому массовое удаление голосов остается одним DELETE без загрузки строк,
+а version увеличивает тот, кто голоса удаляет: view, apply_bans или discard_votes.
+
+Каскадное удаление голосов (удаление пользователя или варианта) обходит counters.delete_votes,
+поэтому pre_delete у User и Choice сами удаляют голоса через discard_votes — до каскада,
+который затем уже ничего не находит. discard_votes же использует админка голосов; он
+вычитает голоса из счетчиков и увеличивает version затронутых комнат, иначе ETag (304)
+и room_cache продолжали бы отдавать удаленные голоса.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import counters, ingest
+from .models import Choice, Question, Room, RoomBan, Vote
+
+
+def discard_votes(votes):
+    """
+    Удаляет голоса с вычитанием из счетчиков и минутных агрегатов (counters.delete_votes)
+    и увеличивает version затронутых комнат; после коммита буфер приема перечитает
+    проголосовавших. Вызывать внутри transaction.atomic().
+    """
+    touched = set(votes.order_by().values_list('question__room_id', 'question_id').distinct())
+    if not touched:
+        return
+    counters.delete_votes(votes)
+    for room_id in {room_id for room_id, _ in touched}:
+        Room.bump_version(room_id)
+    question_ids = {question_id for _, question_id in touched}
+    transaction.on_commit(lambda: ingest.forget_voters(question_ids))
+
+
+@receiver(post_save, sender=Room)
+def room_saved(sender, instance, created, **kwargs):
+    if not created:
+        Room.bump_version(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Question)
+def room_content_changed(sender, instance, **kwargs):
+    Room.bump_version(instance.room_id)
+
+
+@receiver([post_save, post_delete], sender=RoomBan)
+def room_bans_changed(sender, instance, **kwargs):
+    # Бан из админки (RoomBanInline) или его удаление: кэш банов перечитается по bans_version
+    Room.bump_version(instance.room_id, bans=True)
+
+
+@receiver([post_save, post_delete], sender=Choice)
+def choice_changed(sender, instance, **kwargs):
+    if Choice.question.is_cached(instance):
+        room_id = instance.question.room_id
+    else:
+        room_id = Question.objects.filter(pk=instance.question_id).values_list('room_id', flat=True).first()
+    if room_id:
+        Room.bump_version(room_id)
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def user_votes_deleted(sender, instance, **kwargs):
+    discard_votes(Vote.objects.filter(user=instance))
+
+
+@receiver(pre_delete, sender=Choice)
+def choice_votes_deleted(sender, instance, **kwargs):
+    # Question.votes_count иначе сохранил бы голоса удаленного варианта
+    discard_votes(Vote.objects.filter(choice=instance))
@@ -1,8 +1,39 @@
+import asyncio
+import csv
+import datetime
+import json
+import re
+from io import StringIO
+from unittest import mock
+
+import brotli
+
+from asgiref.sync import async_to_sync
+from django.contrib import admin
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.db.models import QuerySet
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, APITestCase
 from users.models import User
-from .models import Room, Question, Choice, RoomBan, Vote
+from .bans import apply_bans, banned_votes
+from .cache import BanSetCache, ban_cache, room_cache
+from .counters import find_drift, rebuild_counters, rebuild_rollups, rollup_bucket, vote_buckets
+from .export import _async_chunks, csv_lines, vote_rows
+from .ingest import VoteBuffer
+from .models import Room, Question, Choice, RoomBan, Vote, VoteRollup
+from .projection import project_room
+from .realtime import InMemoryBroker, _sse_stream, _viewer_name, get_broker, websocket_application
+from .seeding import clear_dataset
+from .serializers import FieldSelection, RoomSerializer
+from .views import drf_room_tree
 
 
 class RoomTests(APITestCase):
@@ -96,4 +127,1389 @@ class RoomTests(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
         # Голос не должен сохраниться
-        self.assertEqual(Vote.objects.count(), 0)
\ No newline at end of file
+        self.assertEqual(Vote.objects.count(), 0)
+
+class RoomQueryCountTests(APITestCase):
+    """Детальная страница комнаты грузится фиксированным числом SQL-запросов."""
+
+    # Потолок: комната, вопросы, варианты, голоса, голос зрителя (баны — из кэша)
+    MAX_QUERIES = 5
+
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            email='owner@test.com', username='owner',
+            password='password', display_name='Owner'
+        )
+        self.voter = User.objects.create_user(
+            email='voter@test.com', username='voter',
+            password='password', display_name='Voter'
+        )
+        self.room = Room.objects.create(title="Big Room", slug="big-room", creator="Owner")
+        self.room_url = reverse('room-detail', kwargs={'slug': self.room.slug})
+
+    def grow_room(self, questions, choices, guests):
+        """Добавляет вопросы с вариантами и голосами гостей + голос зарегистрированного пользователя."""
+        for q_index in range(questions):
+            question = Question.objects.create(room=self.room, text=f"Q{q_index}", show_results=True)
+            created = Choice.objects.bulk_create(
+                Choice(question=question, text=f"C{c_index}") for c_index in range(choices)
+            )
+            Vote.objects.bulk_create(
+                Vote(choice=created[g_index % choices], question=question, guest_nickname=f"guest-{q_index}-{g_index}")
+                for g_index in range(guests)
+            )
+            Vote.objects.create(choice=created[0], user=self.voter)
+        # bulk_create минует счетчики — пересчитываем их из таблицы Vote
+        rebuild_counters()
+
+    def count_queries(self, user=None, params=None):
+        if user:
+            self.client.force_authenticate(user=user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.room_url, params or {})
+        self.client.force_authenticate(user=None)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(ctx.captured_queries)
+
+    def test_query_count_does_not_grow_with_room(self):
+        """Тест 1: Число запросов не зависит от количества вопросов, вариантов и голосов"""
+        self.grow_room(questions=1, choices=2, guests=2)
+        # Множество банов загружается один раз на комнату и дальше берется из кэша
+        ban_cache.get(self.room)
+        small = [self.count_queries(self.owner), self.count_queries(self.voter),
+                 self.count_queries(params={'guest_name': 'guest-0-0'})]
+
+        self.grow_room(questions=10, choices=4, guests=30)
+        big = [self.count_queries(self.owner), self.count_queries(self.voter),
+               self.count_queries(params={'guest_name': 'guest-0-0'})]
+
+        self.assertEqual(small, big)
+        self.assertLessEqual(max(big), self.MAX_QUERIES)
+
+    def test_prefetched_payload_matches_votes(self):
+        """Тест 2: Счетчики, списки голосующих и выбор зрителя берутся из prefetch корректно"""
+        self.grow_room(questions=2, choices=3, guests=5)
+        self.client.force_authenticate(user=self.voter)
+        response = self.client.get(self.room_url, {'include': 'voters'})
+
+        for question in response.data['questions']:
+            db_question = Question.objects.get(id=question['id'])
+            first_choice = db_question.choices.order_by('id').first()
+            self.assertEqual(question['user_voted_choice'], first_choice.id)
+            for choice in question['choices']:
+                expected = Vote.objects.filter(choice_id=choice['id']).count()
+                self.assertEqual(choice['votes_count'], expected)
+                self.assertEqual(len(choice['voters']), expected)
+
+
+class RoomListTests(APITestCase):
+    """Лобби: облегченные карточки комнат с курсорной пагинацией."""
+
+    def setUp(self):
+        self.list_url = reverse('room-list')
+        for index in range(5):
+            room = Room.objects.create(title=f"Room {index}", slug=f"room-{index}", creator="Owner")
+            question = Question.objects.create(room=room, text="Q")
+            choice = Choice.objects.create(question=question, text="A")
+            Vote.objects.bulk_create(
+                Vote(choice=choice, question=question, guest_nickname=f"guest-{v}") for v in range(index)
+            )
+        rebuild_counters()
+
+    def test_list_returns_summary_without_nested_tree(self):
+        """Тест 1: Список отдает счетчики вместо вложенных вопросов и голосов"""
+        response = self.client.get(self.list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        room = response.data['results'][0]
+        self.assertNotIn('questions', room)
+        self.assertEqual(room['slug'], 'room-4')  # сначала новые
+        self.assertEqual(room['question_count'], 1)
+        self.assertEqual(room['total_votes'], 4)
+
+    def test_cursor_pagination_walks_all_rooms(self):
+        """Тест 2: По ссылкам next можно обойти все комнаты без повторов"""
+        slugs = []
+        url = self.list_url + '?page_size=2'
+        while url:
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url)
+            # Одна выборка страницы, независимо от числа комнат/голосов
+            self.assertEqual(len(ctx.captured_queries), 1)
+            slugs += [room['slug'] for room in response.data['results']]
+            url = response.data['next']
+
+        self.assertEqual(slugs, [f"room-{index}" for index in reversed(range(5))])
+
+
+class VoteCounterTests(APITestCase):
+    """Денормализованные счетчики голосов поддерживаются на записи."""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            email='owner@test.com', username='owner',
+            password='password', display_name='Owner'
+        )
+        self.voter = User.objects.create_user(
+            email='voter@test.com', username='voter',
+            password='password', display_name='Voter'
+        )
+        self.room = Room.objects.create(title="Room", slug="room", creator="Owner")
+        self.question = Question.objects.create(room=self.room, text="Q")
+        self.choice = Choice.objects.create(question=self.question, text="A")
+        self.ban_url = reverse('room-ban-user', kwargs={'slug': self.room.slug})
+
+    def assertCounters(self, expected):
+        self.choice.refresh_from_db()
+        self.question.refresh_from_db()
+        self.assertEqual(self.choice.votes_count, expected)
+        self.assertEqual(self.question.votes_count, expected)
+
+    def test_vote_increments_counters(self):
+        """Тест 1: Голос пользователя и гостя увеличивает счетчики варианта и вопроса"""
+        self.client.force_authenticate(user=self.voter)
+        self.client.post('/api/votes/', {"choice": self.choice.id})
+        self.client.force_authenticate(user=None)
+        self.client.post('/api/votes/', {"choice": self.choice.id, "guest_nickname": "Guest"})
+        self.assertCounters(2)
+
+    def test_ban_decrements_counters(self):
+        """Тест 2: Бан удаляет голоса и вычитает их из счетчиков"""
+        Vote.objects.create(choice=self.choice, user=self.voter)
+        Vote.objects.create(choice=self.choice, guest_nickname="Troll")
+        rebuild_counters()
+
+        self.client.force_authenticate(user=self.owner)
+        self.client.post(self.ban_url, {"nickname": "Troll"})
+        self.assertCounters(1)
+        self.client.post(self.ban_url, {"nickname": "voter@test.com"})
+        self.assertCounters(0)
+
+    def test_rebuild_command_fixes_drift(self):
+        """Тест 3: Команда rebuild_vote_counters находит и исправляет расхождения"""
+        Vote.objects.create(choice=self.choice, guest_nickname="Guest")
+        with self.assertRaises(CommandError):
+            call_command('rebuild_vote_counters', '--check', stdout=StringIO())
+
+        call_command('rebuild_vote_counters', stdout=StringIO())
+        self.assertCounters(1)
+        call_command('rebuild_vote_counters', '--check', stdout=StringIO())
+
+    def assertRollups(self, expected):
+        self.assertEqual(sum(VoteRollup.objects.values_list('count', flat=True)), expected)
+
+    def test_admin_delete_decrements_counters(self):
+        """Тест 4: Удаление голосов в админке (по одному и списком) вычитает их из счетчиков и агрегатов"""
+        vote = Vote.objects.create(choice=self.choice, user=self.voter)
+        Vote.objects.create(choice=self.choice, guest_nickname="A")
+        Vote.objects.create(choice=self.choice, guest_nickname="B")
+        rebuild_counters()
+
+        vote_admin = admin.site._registry[Vote]
+        vote_admin.delete_model(None, vote)
+        self.assertCounters(2)
+        vote_admin.delete_queryset(None, Vote.objects.all())
+        self.assertCounters(0)
+        self.assertRollups(0)
+
+    def test_user_delete_decrements_counters(self):
+        """Тест 5: Каскадное удаление голосов вместе с пользователем не оставляет расхождений"""
+        Vote.objects.create(choice=self.choice, user=self.voter)
+        Vote.objects.create(choice=self.choice, guest_nickname="Guest")
+        rebuild_counters()
+
+        self.voter.delete()
+        self.assertCounters(1)
+        self.assertRollups(1)
+        self.assertEqual(find_drift(), ([], []))
+
+    def test_choice_delete_decrements_question(self):
+        """Тест 6: Удаление варианта вычитает его голоса из счетчика вопроса"""
+        other = Choice.objects.create(question=self.question, text="B")
+        Vote.objects.create(choice=self.choice, user=self.voter)
+        Vote.objects.create(choice=other, guest_nickname="Guest")
+        rebuild_counters()
+
+        other.delete()
+        self.assertCounters(1)
+        self.assertEqual(find_drift(), ([], []))
+
+    def test_vote_deletes_bump_room_version(self):
+        """Тест 7: Удаление голосов в админке и вместе с пользователем увеличивает version комнаты"""
+        vote = Vote.objects.create(choice=self.choice, guest_nickname="Guest")
+        Vote.objects.create(choice=self.choice, user=self.voter)
+        rebuild_counters()
+        versions = []
+        for delete in (lambda: admin.site._registry[Vote].delete_model(None, vote), self.voter.delete):
+            self.room.refresh_from_db()
+            versions.append(self.room.version)
+            delete()
+        self.room.refresh_from_db()
+        versions.append(self.room.version)
+        self.assertEqual(versions, sorted(set(versions)))
+
+
+class RealtimeTests(APITestCase):
+    """Дельты комнаты публикуются в канал по slug после коммита."""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            email='owner@test.com', username='owner',
+            password='password', display_name='Owner'
+        )
+        self.room = Room.objects.create(title="Live Room", slug="live-room", creator="Owner")
+        self.question = Question.objects.create(room=self.room, text="Q")
+        self.choice = Choice.objects.create(question=self.question, text="A")
+
+    def test_in_memory_broker_delivers_to_room_subscribers(self):
+        """Тест 1: Подписчик комнаты получает событие, подписчик другой комнаты — нет"""
+        broker = InMemoryBroker()
+
+        async def listen():
+            async with broker.subscribe('live-room') as queue, broker.subscribe('other') as other:
+                broker.publish('live-room', {"type": "vote", "choice": 1, "votes_count": 5})
+                event = await asyncio.wait_for(queue.get(), timeout=1)
+                return event, other.empty()
+
+        event, other_empty = async_to_sync(listen)()
+        self.assertEqual(event["votes_count"], 5)
+        self.assertTrue(other_empty)
+        self.assertEqual(broker.subscriber_count('live-room'), 0)
+
+    def test_slow_subscriber_gets_resync(self):
+        """Тест 2: Переполненная очередь заменяется одним событием resync"""
+        broker = InMemoryBroker(max_queue=2)
+
+        async def listen():
+            async with broker.subscribe('live-room') as queue:
+                for count in range(5):
+                    broker.publish('live-room', {"type": "vote", "votes_count": count})
+                await asyncio.sleep(0)
+                return [queue.get_nowait() for _ in range(queue.qsize())]
+
+        events = async_to_sync(listen)()
+        self.assertIn({"type": "resync"}, events)
+        self.assertLessEqual(len(events), 2)
+
+    def test_vote_and_toggle_publish_deltas(self):
+        """Тест 3: Голос и переключение show_results отправляют дельты с новыми значениями"""
+        with mock.patch('rooms.realtime.InMemoryBroker.publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post('/api/votes/', {"choice": self.choice.id, "guest_nickname": "Guest"})
+
+            self.client.force_authenticate(user=self.owner)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.patch(f'/api/questions/{self.question.id}/', {"show_results": True})
+
+        vote_event = publish.call_args_list[0].args
+        self.assertEqual(vote_event, ('live-room', {
+            "type": "vote", "question": self.question.id, "choice": self.choice.id, "votes_count": 1,
+        }))
+        toggle_event = publish.call_args_list[1].args[1]
+        self.assertEqual(toggle_event["type"], "question")
+        self.assertTrue(toggle_event["show_results"])
+
+    def test_banned_viewer_cannot_subscribe(self):
+        """Тест 4: SSE и WebSocket не отдают поток забаненному; бан во время подписки закрывает поток"""
+        RoomBan.objects.create(room=self.room, banned_identifier="Troll")
+        ban_cache.clear()
+        events_url = '/api/rooms/live-room/events/'
+        self.assertEqual(async_to_sync(self.async_client.get)(events_url, {'guest_name': "Troll"}).status_code, 403)
+        broken = async_to_sync(self.async_client.get)(events_url, headers={'Authorization': 'Bearer broken'})
+        self.assertEqual(broken.status_code, 401)
+
+        async def connect(query_string):
+            sent = []
+            messages = iter([{'type': 'websocket.connect'}])
+
+            async def receive():
+                return next(messages)
+
+            async def send(message):
+                sent.append(message)
+
+            scope = {'type': 'websocket', 'path': '/ws/rooms/live-room/', 'headers': [], 'query_string': query_string}
+            await websocket_application(scope, receive, send)
+            return sent
+
+        self.assertEqual(async_to_sync(connect)(b'guest_name=Troll'), [{'type': 'websocket.close', 'code': 4403}])
+
+        async def stream_until_banned():
+            chunks = []
+            stream = _sse_stream('live-room', "Guest")
+            chunks.append(await stream.__anext__())
+            get_broker().publish('live-room', {"type": "ban", "nicknames": ["Guest"], "choices": {}})
+            async for chunk in stream:
+                chunks.append(chunk)
+            return chunks
+
+        chunks = async_to_sync(stream_until_banned)()
+        self.assertTrue(chunks[-1].startswith("event: ban\n"))
+
+    def test_logged_in_viewer_subscribes_with_ticket(self):
+        """Тест 5: Вошедший пользователь подписывается по билету из events-ticket: бан и подделка билета отсекаются"""
+        ticket_url = reverse('room-events-ticket', kwargs={'slug': self.room.slug})
+        self.assertEqual(self.client.post(ticket_url).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.force_authenticate(user=self.owner)
+        ticket = self.client.post(ticket_url).data['ticket']
+        self.assertEqual(async_to_sync(_viewer_name)(None, self.room, '', ticket), "Owner")
+
+        other = Room.objects.create(title="Other", slug="other")
+        with self.assertRaises(AuthenticationFailed):
+            async_to_sync(_viewer_name)(None, other, '', ticket)
+        with override_settings(ROOMS_REALTIME={'TICKET_TTL': -1}), self.assertRaises(AuthenticationFailed):
+            async_to_sync(_viewer_name)(None, self.room, '', ticket)
+
+        RoomBan.objects.create(room=self.room, banned_identifier="Owner")
+        events_url = '/api/rooms/live-room/events/'
+        # Билет важнее ?guest_name=: подставить чужой гостевой ник не выйдет
+        banned = async_to_sync(self.async_client.get)(events_url, {'ticket': ticket, 'guest_name': "Someone"})
+        self.assertEqual(banned.status_code, 403)
+        forged = async_to_sync(self.async_client.get)(events_url, {'ticket': ticket + "x"})
+        self.assertEqual(forged.status_code, 401)
+
+
+class ConditionalGetTests(APITestCase):
+    """ETag/304 детальной страницы комнаты на основе Room.version."""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            email='owner@test.com', username='owner',
+            password='password', display_name='Owner'
+        )
+        self.room = Room.objects.create(title="Room", slug="room", creator="Owner")
+        self.question = Question.objects.create(room=self.room, text="Q")
+        self.choice = Choice.objects.create(question=self.question, text="A")
+        self.room_url = reverse('room-detail', kwargs={'slug': self.room.slug})
+
+    def test_not_modified_skips_serialization(self):
+        """Тест 1: Повтор с If-None-Match получает 304 без загрузки дерева комнаты"""
+        etag = self.client.get(self.room_url)['ETag']
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.room_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        # Только сама комната (бан-чек гостю без ника не нужен)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_any_change_invalidates_etag(self):
+        """Тест 2: Голос, новый вариант, бан и правка вопроса меняют ETag"""
+        etag = self.client.get(self.room_url)['ETag']
+        self.client.force_authenticate(user=self.owner)
+        changes = [
+            lambda: self.client.post('/api/votes/', {"choice": self.choice.id}),
+            lambda: Choice.objects.create(question=self.question, text="B"),
+            lambda: self.client.post(reverse('room-ban-user', kwargs={'slug': 'room'}), {"nickname": "Troll"}),
+            lambda: self.client.patch(f'/api/questions/{self.question.id}/', {"show_results": True}),
+        ]
+        for change in changes:
+            change()
+            response = self.client.get(self.room_url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            etag = response['ETag']
+
+    def test_etag_depends_on_viewer(self):
+        """Тест 3: У гостя, другого гостя и Хоста разные ETag — чужой 304 невозможен"""
+        guest_etag = self.client.get(self.room_url, {'guest_name': 'Alice'})['ETag']
+        other_guest = self.client.get(self.room_url, {'guest_name': 'Bob'}, HTTP_IF_NONE_MATCH=guest_etag)
+        self.assertEqual(other_guest.status_code, status.HTTP_200_OK)
+
+        self.client.force_authenticate(user=self.owner)
+        owner = self.client.get(self.room_url, HTTP_IF_NONE_MATCH=guest_etag)
+        self.assertEqual(owner.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(owner['ETag'], guest_etag)
+
+    def test_room_save_keeps_concurrent_version_bumps(self):
+        """Тест 4: Сохранение комнаты из памяти не откатывает version назад"""
+        stale = Room.objects.get(pk=self.room.pk)
+        initial = stale.version
+        Room.bump_version(self.room.pk)
+        Room.bump_version(self.room.pk)
+        stale.title = "Renamed"
+        stale.save()
+
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.title, "Renamed")
+        # +2 от параллельных изменений и +1 от самого сохранения
+        self.assertEqual(self.room.version, initial + 3)
+
+
+class RoomPayloadCacheTests(APITestCase):
+    """Кэш общей части дерева комнаты с персональными надбавками."""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            email='owner@test.com', username='owner',
+            password='password', display_name='Owner'
+        )
+        self.room = Room.objects.create(title="Room", slug="room", creator="Owner")
+        self.question = Question.objects.create(room=self.room, text="Q")
+        self.choice = Choice.objects.create(question=self.question, text="A")
+        self.room_url = reverse('room-detail', kwargs={'slug': self.room.slug})
+        room_cache.cache.clear()
+        room_cache.reset_stats()
+        ban_cache.clear()
+
+    def test_second_viewer_is_served_from_cache(self):
+        """Тест 1: Второй гость получает дерево из кэша, без запросов вопросов/вариантов"""
+        self.client.get(self.room_url, {'guest_name': 'Alice'})
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.room_url, {'guest_name': 'Bob'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Комната и голос гостя: баны и дерево — из кэша
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertEqual(room_cache.stats(), {'hits': 1, 'misses': 1, 'hit_ratio': 0.5})
+
+    def test_overlay_is_personal(self):
+        """Тест 2: user_voted_choice из кэша не протекает к другому зрителю"""
+        self.client.post('/api/votes/', {"choice": self.choice.id, "guest_nickname": "Alice"})
+        alice = self.client.get(self.room_url, {'guest_name': 'Alice'})
+        bob = self.client.get(self.room_url, {'guest_name': 'Bob'})
+
+        self.assertEqual(alice.data['questions'][0]['user_voted_choice'], self.choice.id)
+        self.assertIsNone(bob.data['questions'][0]['user_voted_choice'])
+
+    def test_write_paths_invalidate(self):
+        """Тест 3: Голос и раскрытие результатов сразу видны в следующем ответе"""
+        self.client.get(self.room_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/votes/', {"choice": self.choice.id, "guest_nickname": "Alice"})
+        response = self.client.get(self.room_url, {'include': 'voters'})
+        self.assertEqual(response.data['questions'][0]['choices'][0]['votes_count'], 1)
+        self.assertEqual(response.data['questions'][0]['choices'][0]['voters'], [])
+
+        self.client.force_authenticate(user=self.owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/questions/{self.question.id}/', {"show_results": True})
+        self.client.force_authenticate(user=None)
+        response = self.client.get(self.room_url, {'include': 'voters'})
+        self.assertEqual(response.data['questions'][0]['choices'][0]['voters'][0]['name'], 'Alice')
+
+    def test_creator_variant_is_separate(self):
+        """Тест 4: Хост видит списки голосующих, даже если публичный вариант уже в кэше"""
+        self.client.post('/api/votes/', {"choice": self.choice.id, "guest_nickname": "Alice"})
+        public = self.client.get(self.room_url, {'include': 'voters'})
+        self.client.force_authenticate(user=self.owner)
+        creator = self.client.get(self.room_url, {'include': 'voters'})
+
+        self.assertEqual(public.data['questions'][0]['choices'][0]['voters'], [])
+        self.assertEqual(len(creator.data['questions'][0]['choices'][0]['voters']), 1)
+
+
+    @override_settings(RESPONSE_COMPRESSION={'MIN_SIZE': 0})
+    def test_compressed_body_is_cached_for_viewers_without_votes(self):
+        """Тест 5: Зритель без голосов получает сжатое тело из кэша; голос зрителя и запись его обходят"""
+        first = self.client.get(self.room_url, HTTP_ACCEPT_ENCODING='br')
+        with mock.patch('rooms.views.compress') as compress, mock.patch('rooms.views.render_json') as render:
+            second = self.client.get(self.room_url, {'guest_name': 'Bob'}, HTTP_ACCEPT_ENCODING='br')
+        compress.assert_not_called()
+        render.assert_not_called()
+        self.assertEqual(second['Content-Encoding'], 'br')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(json.loads(brotli.decompress(second.content)), json.loads(self.client.get(self.room_url).content))
+
+        # Голосовавший получает персональную надбавку, сжатую middleware
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/votes/', {"choice": self.choice.id, "guest_nickname": "Alice"})
+        alice = self.client.get(self.room_url, {'guest_name': 'Alice'}, HTTP_ACCEPT_ENCODING='br')
+        self.assertEqual(json.loads(brotli.decompress(alice.content))['questions'][0]['user_voted_choice'], self.choice.id)
+        # Голос сменил версию комнаты — в кэше уже новое тело
+        bob = json.loads(brotli.decompress(self.client.get(self.room_url, HTTP_ACCEPT_ENCODING='br').content))
+        self.assertEqual(bob['questions'][0]['choices'][0]['votes_count'], 1)
+        self.assertIsNone(bob['questions'][0]['user_voted_choice'])
+
+        async_bob = self.client.get(reverse('async-room-detail', kwargs={'slug': 'room'}), HTTP_ACCEPT_ENCODING='br')
+        self.assertEqual(json.loads(brotli.decompress(async_bob.content)), bob)
+
+class VoteWritePathTests(APITestCase):
+    """Голосование: одна транзакция, уникальность голоса на уровне БД."""
+
+    def setUp(self):
+        self.voter = User.objects.create_user(
+            email='voter@test.com', username='voter',
+            password='password', display_name='Voter'
+        )
+        self.room = Room.objects.create(title="Room", slug="room", creator="Owner")
+        self.question = Question.objects.create(room=self.room, text="Q")
+        self.choice_a = Choice.objects.create(question=self.question, text="A")
+        self.choice_b = Choice.objects.create(question=self.question, text="B")
+
+    def test_second_vote_in_question_is_rejected(self):
+        """Тест 1: Повторный голос (даже за другой вариант) получает прежний 400"""
+        self.client.force_authenticate(user=self.voter)
+        self.client.post('/api/votes/', {"choice": self.choice_a.id})
+        response = self.client.post('/api/votes/', {"choice": self.choice_b.id})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['non_field_errors'], ["Вы уже голосовали в этом вопросе!"])
+        self.assertEqual(Vote.objects.count(), 1)
+        self.choice_b.refresh_from_db()
+        self.assertEqual(self.choice_b.votes_count, 0)
+
+    def test_database_enforces_one_vote_per_question(self):
+        """Тест 2: Уникальные ограничения срабатывают и в обход API (гонка двух запросов)"""
+        Vote.objects.create(choice=self.choice_a, user=self.voter)
+        Vote.objects.create(choice=self.choice_a, guest_nickname="Guest")
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Vote.objects.create(choice=self.choice_b, user=self.voter)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Vote.objects.create(choice=self.choice_b, guest_nickname="Guest")
+        # Пустой ник у зарегистрированных пользователей не конфликтует
+        for index in range(2):
+            other = User.objects.create_user(email=f'o{index}@test.com', username=f'o{index}', password='password')
+            Vote.objects.create(choice=self.choice_a, user=other, guest_nickname="")
+
+    def test_vote_query_budget(self):
+        """Тест 3: Голос пользователя укладывается в фиксированный бюджет запросов"""
+        self.client.force_authenticate(user=self.voter)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/votes/', {"choice": self.choice_a.id})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        statements = [q['sql'] for q in ctx.captured_queries if not q['sql'].startswith(('SAVEPOINT', 'RELEASE'))]
+        # вариант+вопрос+комната, бан, INSERT, 2 UPDATE счетчиков, минутный агрегат, новый счетчик, version
+        self.assertEqual(len(statements), 8)
+
+    def test_only_unique_vote_violations_become_already_voted(self):
+        """Тест 4: Прочие нарушения целостности (FK удаленного варианта) не выдаются за повторный голос"""
+        Vote.objects.create(choice=self.choice_a, guest_nickname="Guest")
+        with self.assertRaises(IntegrityError) as duplicate, transaction.atomic():
+            Vote.objects.create(choice=self.choice_b, guest_nickname="Guest")
+        self.assertTrue(Vote.is_duplicate_vote_error(duplicate.exception))
+        self.assertFalse(Vote.is_duplicate_vote_error(IntegrityError("FOREIGN KEY constraint failed")))
+
+        with mock.patch('rooms.views.counters.record_vote', side_effect=IntegrityError("FOREIGN KEY constraint failed")):
+            with self.assertRaises(IntegrityError):
+                self.client.post('/api/votes/', {"choice": self.choice_a.id, "guest_nickname": "Other"})
+
+
+class BufferedIngestionTests(APITestCase):
+    """Буферизованный прием голосов: проверки в памяти, очередь, пакетная запись."""
+
+    def setUp(self):
+        self.room = Room.objects.create(title="Room", slug="room", creator="Owner")
+        self.question = Question.objects.create(room=self.room, text="Q")
+        self.choice = Choice.objects.create(question=self.question, text="A")
+        # Без фонового потока: сбрасываем очередь явно
+        self.buffer = VoteBuffer(batch_size=2, flush_interval=None, max_pending=3)
+        patcher = mock.patch('rooms.ingest._buffer', self.buffer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        settings_override = self.settings(ROOMS_VOTE_INGESTION={'MODE': 'buffered'})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def vote(self, nickname):
+        return self.client.post('/api/votes/', {"choice": self.choice.id, "guest_nickname": nickname})
+
+    def test_votes_are_acknowledged_then_flushed_in_batches(self):
+        """Тест 1: 202 без записи в БД, затем пачки bulk_create с точными счетчиками"""
+        self.assertEqual(self.vote("Alice").status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(self.vote("Bob").status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(self.vote("Carol").status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(Vote.objects.count(), 0)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.buffer.flush(), 3)
+        inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT') and '"rooms_vote"' in q['sql']]
+        self.assertEqual(len(inserts), 2)  # batch_size=2
+        self.choice.refresh_from_db()
+        self.assertEqual(self.choice.votes_count, 3)
+        self.assertEqual(sum(self.choice.rollups.values_list('count', flat=True)), 3)
+
+    def test_in_memory_validation_matches_sync_responses(self):
+        """Тест 2: Повтор, бан и закрытый вопрос отклоняются так же, как в синхронном режиме"""
+        self.vote("Alice")
+        duplicate = self.vote("Alice")
+        self.assertEqual(duplicate.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(duplicate.data['non_field_errors'], ["Вы уже голосовали в этом вопросе!"])
+
+        RoomBan.objects.create(room=self.room, banned_identifier="Troll")
+        Question.objects.filter(pk=self.question.pk).update(is_active=False)
+        self.buffer._bans.clear()
+        self.buffer._choices.clear()
+        self.assertEqual(self.vote("Troll").status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.vote("Bob").data['non_field_errors'], ["Голосование остановлено создателем."])
+
+    def test_backpressure_when_queue_is_full(self):
+        """Тест 3: Сверх MAX_PENDING — 503 с Retry-After, после сброса прием продолжается"""
+        for nickname in ("A", "B", "C"):
+            self.vote(nickname)
+        response = self.vote("D")
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '1')
+
+        self.buffer.flush()
+        self.assertEqual(self.vote("D").status_code, status.HTTP_202_ACCEPTED)
+
+    def test_failed_flush_keeps_votes(self):
+        """Тест 4: Ошибка БД при сбросе возвращает пачку в очередь; бан до сброса отбрасывает голос"""
+        self.vote("Alice")
+        self.vote("Troll")
+        with mock.patch('rooms.ingest.Vote.objects.bulk_create', side_effect=DatabaseError("down")):
+            with self.assertRaises(DatabaseError):
+                self.buffer.flush()
+        self.assertEqual(self.buffer.pending_count, 2)
+
+        RoomBan.objects.create(room=self.room, banned_identifier="Troll")
+        self.buffer.flush()
+        self.assertEqual(list(Vote.objects.values_list('guest_nickname', flat=True)), ["Alice"])
+
+    def test_bad_votes_are_dropped_without_blocking_queue(self):
+        """Тест 5: Голос за удаленный вариант и голос, нарушающий ограничение, отбрасываются, остальные пишутся"""
+        other = Choice.objects.create(question=Question.objects.create(room=self.room, text="Q2"), text="B")
+        self.vote("Alice")
+        self.vote("Bob")
+        self.client.post('/api/votes/', {"choice": other.id, "guest_nickname": "Dave"})
+        other.question.delete()
+
+        bulk_create = Vote.objects.bulk_create
+
+        def failing_for_bob(votes, **kwargs):
+            if any(vote.guest_nickname == "Bob" for vote in votes):
+                raise IntegrityError("fk")
+            return bulk_create(votes, **kwargs)
+
+        with mock.patch('rooms.ingest.Vote.objects.bulk_create', side_effect=failing_for_bob), \
+                self.assertLogs('rooms.ingest', 'WARNING') as logs:
+            self.assertEqual(self.buffer.flush(), 3)
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(self.buffer.pending_count, 0)
+        self.assertEqual(list(Vote.objects.values_list('guest_nickname', flat=True)), ["Alice"])
+        self.choice.refresh_from_db()
+        self.assertEqual(self.choice.votes_count, 1)
+
+    def test_state_is_bounded_and_forgets_deleted_votes(self):
+        """Тест 6: Кэши состояния ограничены по размеру; после бана с удалением голосов ник снова может голосовать"""
+        buffer = VoteBuffer(flush_interval=None, max_entries=2)
+        choices = [Choice.objects.create(question=self.question, text=text) for text in "BCD"]
+        for choice in choices:
+            buffer._choice_state(choice.pk)
+        self.assertEqual(len(buffer._choices), 2)
+
+        self.vote("Alice")
+        self.buffer.flush()
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_bans(self.room, ["Alice"])
+        RoomBan.objects.filter(room=self.room).delete()
+        self.buffer._bans.clear()
+        self.assertEqual(self.vote("Alice").status_code, status.HTTP_202_ACCEPTED)
+
+    def test_voted_set_sees_uncommitted_batch_and_loads_without_lock(self):
+        """Тест 7: Пока пачка пишется, повтор отклоняется даже после сброса множества; БД читается без блокировки"""
+        self.vote("Alice")
+        write = self.buffer._write_or_split
+        during_write = []
+
+        def write_with_reload(batch):
+            self.buffer.forget_voters({self.question.pk})
+            real_filter = Vote.objects.filter
+
+            def filter_without_lock(*args, **kwargs):
+                during_write.append(self.buffer._lock.locked())
+                return real_filter(*args, **kwargs)
+
+            with mock.patch('rooms.ingest.Vote.objects.filter', side_effect=filter_without_lock):
+                during_write.append(self.vote("Alice").status_code)
+            write(batch)
+
+        with mock.patch.object(self.buffer, '_write_or_split', side_effect=write_with_reload):
+            self.buffer.flush()
+        self.assertEqual(during_write, [False, status.HTTP_400_BAD_REQUEST])
+        self.assertEqual(Vote.objects.count(), 1)
+
+    def test_created_at_is_acceptance_time(self):
+        """Тест 8: created_at голоса — момент приема, а не сброса очереди"""
+        self.vote("Alice")
+        accepted_by = timezone.now()
+        # Сброс "через 5 минут": время сброса не должно попасть ни в голос, ни в минутный агрегат
+        with mock.patch('django.utils.timezone.now', return_value=accepted_by + datetime.timedelta(minutes=5)):
+            self.buffer.flush()
+        created_at = Vote.objects.get().created_at
+        self.assertLessEqual(created_at, accepted_by)
+        self.assertEqual(self.choice.rollups.get().bucket, rollup_bucket(created_at))
+
+
+class QueryPlanTests(TransactionTestCase):
+    """
+    Горячие запросы голосования и банов идут по индексам, а не полным сканированием.
+    PostgreSQL: EXPLAIN при enable_seqscan = off (Seq Scan остается, только если индекса нет).
+    SQLite: EXPLAIN QUERY PLAN не должен содержать "SCAN <таблица>" без индекса.
+    """
+
+    HOT_TABLES = ('rooms_vote', 'rooms_roomban', 'users_user')
+
+    @classmethod
+    def seed(cls):
+        users = User.objects.bulk_create(
+            User(
+                email=f'u{index}@test.com', username=f'u{index}',
+                display_name=f'User{index}', display_name_normalized=f'user{index}',
+            )
+            for index in range(200)
+        )
+        for room_index in range(20):
+            room = Room.objects.create(title="R", slug=f"plan-{room_index}", creator="Owner")
+            RoomBan.objects.bulk_create(
+                RoomBan(room=room, banned_identifier=f"troll-{ban}") for ban in range(10)
+            )
+            for question_index in range(5):
+                question = Question.objects.create(room=room, text="Q")
+                choices = Choice.objects.bulk_create(Choice(question=question, text=f"C{c}") for c in range(4))
+                votes = [
+                    Vote(choice=choices[g % 4], question=question, guest_nickname=f"guest-{g}")
+                    for g in range(60)
+                ] + [
+                    Vote(choice=choices[u % 4], question=question, user=users[u], guest_nickname="")
+                    for u in range(room_index, 200, 7)
+                ]
+                Vote.objects.bulk_create(votes)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        return users[3], room, question
+
+    def assertUsesIndexes(self, queryset):
+        if connection.vendor == 'postgresql':
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+                plan = queryset.explain()
+            scans = re.findall(r'Seq Scan on (\w+)', plan)
+        elif connection.vendor == 'sqlite':
+            plan = queryset.explain()
+            scans = re.findall(r'SCAN (\w+)$', plan, re.MULTILINE)
+        else:
+            self.skipTest(f"EXPLAIN-проверка не реализована для {connection.vendor}")
+        full_scans = [table for table in scans if table in self.HOT_TABLES]
+        self.assertEqual(full_scans, [], f"Полное сканирование:\n{queryset.query}\n{plan}")
+
+    def test_hot_queries_use_indexes(self):
+        """Тест 1: Повторный голос, выбор зрителя, бан-чек, удаление голосов и проверка ника"""
+        user, room, question = self.seed()
+        hot_queries = [
+            Vote.objects.filter(user=user, question=question),
+            Vote.objects.filter(guest_nickname="guest-1", question=question),
+            Vote.objects.filter(question__room=room, user=user).values_list('question_id', 'choice_id'),
+            Vote.objects.filter(question__room=room, guest_nickname="guest-1").values_list('question_id', 'choice_id'),
+            RoomBan.objects.filter(room=room, banned_identifier="troll-1"),
+            # Тот же OR-запрос, что удаляет apply_bans, и GROUP BY дельт счетчиков из counters.delete_votes
+            banned_votes(room, ["guest-1", "User3", "u4@test.com"]),
+            vote_buckets(banned_votes(room, ["guest-1", "User3", "u4@test.com"])),
+            User.objects.filter(display_name_normalized="user3"),
+        ]
+        for queryset in hot_queries:
+            with self.subTest(query=str(queryset.query)):
+                self.assertUsesIndexes(queryset)
+
+
+class BanEnforcementTests(APITestCase):
+    """Баны применяются одной set-based операцией, в том числе массово."""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            email='owner@test.com', username='owner',
+            password='password', display_name='Owner'
+        )
+        self.member = User.objects.create_user(
+            email='member@test.com', username='member',
+            password='password', display_name='Member'
+        )
+        self.room = Room.objects.create(title="Room", slug="room", creator="Owner")
+        self.other_room = Room.objects.create(title="Other", slug="other", creator="Owner")
+        self.choices = []
+        for room in (self.room, self.other_room):
+            for index in range(2):
+                question = Question.objects.create(room=room, text=f"Q{index}")
+                choice = Choice.objects.create(question=question, text="A")
+                self.choices.append(choice)
+                for nickname in ("Spam1", "Spam2", "Fine"):
+                    Vote.objects.create(choice=choice, guest_nickname=nickname)
+                Vote.objects.create(choice=choice, user=self.member, guest_nickname="")
+        rebuild_counters()
+        self.bulk_url = reverse('room-ban-users', kwargs={'slug': self.room.slug})
+        self.client.force_authenticate(user=self.owner)
+
+    def test_bulk_ban_removes_votes_with_single_delete(self):
+        """Тест 1: Список ников банится одним DELETE, счетчики уменьшаются, чужая комната не затронута"""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(
+                self.bulk_url, {"nicknames": ["Spam1", "Spam2", "member@test.com"]}, format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['votes_deleted'], 6)
+        deletes = [q for q in ctx.captured_queries if q['sql'].startswith('DELETE')]
+        self.assertEqual(len(deletes), 1)
+
+        self.assertEqual(RoomBan.objects.filter(room=self.room).count(), 3)
+        self.assertEqual(Vote.objects.filter(question__room=self.room).count(), 2)
+        self.assertEqual(Vote.objects.filter(question__room=self.other_room).count(), 8)
+        for choice in self.choices[:2]:
+            choice.refresh_from_db()
+            self.assertEqual(choice.votes_count, 1)
+        call_command('rebuild_vote_counters', '--check', stdout=StringIO())
+
+    def test_bulk_ban_validation_and_permissions(self):
+        """Тест 2: Нужен непустой список строк и права создателя; повторный бан не дублирует запись"""
+        self.assertEqual(
+            self.client.post(self.bulk_url, {"nicknames": []}, format='json').status_code,
+            status.HTTP_400_BAD_REQUEST,
+        )
+        self.client.post(self.bulk_url, {"nicknames": ["Spam1"]}, format='json')
+        self.client.post(self.bulk_url, {"nicknames": ["Spam1", "Spam1"]}, format='json')
+        self.assertEqual(RoomBan.objects.filter(room=self.room, banned_identifier="Spam1").count(), 1)
+
+        self.client.force_authenticate(user=self.member)
+        response = self.client.post(self.bulk_url, {"nicknames": ["Fine"]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_banned_viewer_cannot_read_results(self):
+        """Тест 3: Результаты комнаты и вопроса (sync и async) закрыты для забаненных, как и сама комната"""
+        apply_bans(self.room, ["Spam1", "Member"])
+        question = self.choices[0].question
+        Question.objects.filter(room=self.room).update(show_results=True)
+        urls = [
+            reverse('room-results', kwargs={'slug': self.room.slug}),
+            reverse('question-results', kwargs={'pk': question.pk}),
+            reverse('async-room-results', kwargs={'slug': self.room.slug}),
+        ]
+        self.client.force_authenticate(user=None)
+        for url in urls:
+            self.assertEqual(self.client.get(url, {"guest_name": "Spam1"}).status_code, status.HTTP_403_FORBIDDEN)
+            self.assertEqual(self.client.get(url, {"guest_name": "Fine"}).status_code, status.HTTP_200_OK)
+
+        token = self.client.post(
+            '/api/auth/jwt/create/', {'email': 'member@test.com', 'password': 'password'}, format='json'
+        ).data['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        for url in urls:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+            self.assertEqual(response.json()["detail"], "Бан")
+
+
+class BanSetCacheTests(APITestCase):
+    """Проверка банов по кэшу множества банов комнаты, без запросов к БД."""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            email='owner@test.com', username='owner',
+            password='password', display_name='Owner'
+        )
+        self.room = Room.objects.create(title="Room", slug="room", creator="Owner")
+        self.question = Question.objects.create(room=self.room, text="Q")
+        self.choice = Choice.objects.create(question=self.question, text="A")
+        self.room_url = reverse('room-detail', kwargs={'slug': self.room.slug})
+        room_cache.cache.clear()
+        ban_cache.clear()
+        ban_cache.reset_stats()
+
+    def as_worker(self, cache):
+        """Запросы внутри контекста обслуживает "другой процесс" со своим кэшем в памяти."""
+        patcher_views = mock.patch('rooms.views.ban_cache', cache)
+        patcher_serializers = mock.patch('rooms.serializers.ban_cache', cache)
+        patcher_views.start()
+        patcher_serializers.start()
+        self.addCleanup(patcher_views.stop)
+        self.addCleanup(patcher_serializers.stop)
+
+    def ban_queries(self, ctx):
+        return [q['sql'] for q in ctx.captured_queries if 'rooms_roomban' in q['sql']]
+
+    def test_common_case_costs_no_queries(self):
+        """Тест 1: После первой загрузки просмотр и голос не обращаются к таблице банов"""
+        self.client.get(self.room_url, {'guest_name': 'Alice'})
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.room_url, {'guest_name': 'Bob'})
+            response = self.client.post('/api/votes/', {"choice": self.choice.id, "guest_nickname": "Bob"})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.ban_queries(ctx), [])
+        self.assertEqual(ban_cache.stats()['misses'], 1)
+
+    def test_ban_applies_on_next_request_in_other_worker(self):
+        """Тест 2: Бан, сделанный одним процессом, действует в другом уже на следующем запросе"""
+        worker_a, worker_b = BanSetCache(), BanSetCache()
+        self.as_worker(worker_a)
+        self.assertEqual(self.client.get(self.room_url, {'guest_name': 'Troll'}).status_code, status.HTTP_200_OK)
+
+        # Бан приходит через другой воркер: кэш в памяти worker_a об этом не знает
+        with mock.patch('rooms.views.ban_cache', worker_b):
+            self.client.force_authenticate(user=self.owner)
+            self.client.post(reverse('room-ban-user', kwargs={'slug': self.room.slug}), {"nickname": "Troll"})
+            self.client.force_authenticate(user=None)
+
+        self.assertEqual(self.client.get(self.room_url, {'guest_name': 'Troll'}).status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.post('/api/votes/', {"choice": self.choice.id, "guest_nickname": "Troll"})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_admin_edits_invalidate(self):
+        """Тест 3: Бан и разбан напрямую через модель (админка, RoomBanInline) сразу учитываются"""
+        self.client.get(self.room_url, {'guest_name': 'Troll'})
+        ban = RoomBan.objects.create(room=self.room, banned_identifier="Troll")
+        self.assertEqual(self.client.get(self.room_url, {'guest_name': 'Troll'}).status_code, status.HTTP_403_FORBIDDEN)
+
+        ban.delete()
+        self.assertEqual(self.client.get(self.room_url, {'guest_name': 'Troll'}).status_code, status.HTTP_200_OK)
+
+
+class ResultsTests(APITestCase):
+    """Агрегированные результаты и временной ряд из минутных агрегатов VoteRollup."""
+
+    START = datetime.datetime(2026, 10, 1, 10, 0, tzinfo=datetime.timezone.utc)
+
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            email='owner@test.com', username='owner',
+            password='password', display_name='Owner'
+        )
+        self.room = Room.objects.create(title="Room", slug="room", creator="Owner")
+        self.question = Question.objects.create(room=self.room, text="Q", show_results=True)
+        self.choice_a = Choice.objects.create(question=self.question, text="A")
+        self.choice_b = Choice.objects.create(question=self.question, text="B")
+        self.hidden = Question.objects.create(room=self.room, text="Hidden")
+        Choice.objects.create(question=self.hidden, text="X")
+        self.results_url = reverse('question-results', kwargs={'pk': self.question.pk})
+        self.room_results_url = reverse('room-results', kwargs={'slug': self.room.slug})
+
+    def vote_at(self, minutes, choice, nickname):
+        moment = self.START + datetime.timedelta(minutes=minutes)
+        with mock.patch('django.utils.timezone.now', return_value=moment):
+            response = self.client.post('/api/votes/', {"choice": choice.id, "guest_nickname": nickname})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_counts_percentages_and_timeline(self):
+        """Тест 1: Проценты по вариантам и ряд по часам/минутам из агрегатов"""
+        self.vote_at(0, self.choice_a, "g1")
+        self.vote_at(0, self.choice_b, "g2")
+        self.vote_at(30, self.choice_a, "g3")
+        self.vote_at(65, self.choice_a, "g4")
+
+        data = self.client.get(self.results_url).data
+        self.assertEqual(data['total_votes'], 4)
+        self.assertEqual(
+            [(choice['text'], choice['votes_count'], choice['percent']) for choice in data['choices']],
+            [("A", 3, 75.0), ("B", 1, 25.0)],
+        )
+        self.assertEqual(
+            [(point['start'], point['votes']) for point in data['timeline']],
+            [(self.START, 3), (self.START + datetime.timedelta(hours=1), 1)],
+        )
+
+        minutes = self.client.get(self.results_url, {'interval': 'minute'}).data['timeline']
+        self.assertEqual([point['votes'] for point in minutes], [2, 1, 1])
+        self.assertEqual(
+            self.client.get(self.results_url, {'interval': 'week'}).status_code, status.HTTP_400_BAD_REQUEST
+        )
+
+    def test_visibility_follows_show_results(self):
+        """Тест 2: Скрытый вопрос видит только создатель, в сводке комнаты он помечен"""
+        hidden_url = reverse('question-results', kwargs={'pk': self.hidden.pk})
+        self.assertEqual(self.client.get(hidden_url).status_code, status.HTTP_403_FORBIDDEN)
+        room = self.client.get(self.room_results_url).data
+        self.assertEqual([q.get('results_hidden', False) for q in room['questions']], [False, True])
+        self.assertNotIn('choices', room['questions'][1])
+
+        self.client.force_authenticate(user=self.owner)
+        self.assertEqual(self.client.get(hidden_url).status_code, status.HTTP_200_OK)
+        room = self.client.get(self.room_results_url).data
+        self.assertEqual(len(room['questions'][1]['choices']), 1)
+
+    def test_query_count_does_not_depend_on_votes(self):
+        """Тест 3: Результаты не читают таблицу Vote и не растут с числом голосов"""
+        for index in range(20):
+            self.vote_at(index, self.choice_a if index % 3 else self.choice_b, f"g{index}")
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.results_url)
+            self.client.get(self.room_results_url)
+        self.assertEqual([q for q in ctx.captured_queries if 'FROM "rooms_vote"' in q['sql']], [])
+        # Вопрос: вопрос+комната, варианты, ряд. Комната: комната, вопросы, варианты, ряд
+        self.assertEqual(len(ctx.captured_queries), 7)
+
+    def test_bans_and_rebuild_keep_rollups_exact(self):
+        """Тест 4: Бан вычитает голоса из агрегатов; полная пересборка дает те же строки"""
+        self.vote_at(0, self.choice_a, "Spam")
+        self.vote_at(1, self.choice_a, "Fine")
+        self.vote_at(1, self.choice_b, "Spam2")
+        self.client.force_authenticate(user=self.owner)
+        self.client.post(
+            reverse('room-ban-users', kwargs={'slug': self.room.slug}), {"nicknames": ["Spam", "Spam2"]}, format='json'
+        )
+
+        incremental = set(VoteRollup.objects.filter(count__gt=0).values_list('choice', 'bucket', 'count'))
+        self.assertEqual(incremental, {(self.choice_a.pk, self.START + datetime.timedelta(minutes=1), 1)})
+        rebuild_rollups()
+        self.assertEqual(set(VoteRollup.objects.values_list('choice', 'bucket', 'count')), incremental)
+
+
+class ExportTests(APITestCase):
+    """Потоковая выгрузка голосов комнаты для создателя."""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            email='owner@test.com', username='owner',
+            password='password', display_name='Owner'
+        )
+        self.member = User.objects.create_user(
+            email='member@test.com', username='member',
+            password='password', display_name=''
+        )
+        self.room = Room.objects.create(title="Room", slug="room", creator="Owner")
+        self.question = Question.objects.create(room=self.room, text="Q, with comma")
+        self.choice_a = Choice.objects.create(question=self.question, text="A")
+        self.choice_b = Choice.objects.create(question=self.question, text="B")
+        Vote.objects.create(choice=self.choice_a, guest_nickname="Guest")
+        Vote.objects.create(choice=self.choice_b, user=self.member, guest_nickname="")
+        self.export_url = reverse('room-export', kwargs={'slug': self.room.slug})
+
+    def content(self, response):
+        return b"".join(response.streaming_content).decode()
+
+    def test_creator_gets_streamed_csv(self):
+        """Тест 1: CSV идет потоком, с заголовком и экранированием"""
+        self.client.force_authenticate(user=self.owner)
+        response = self.client.get(self.export_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment; filename="room-votes.csv"', response['Content-Disposition'])
+
+        lines = self.content(response).splitlines()
+        self.assertEqual(lines[0], "question_id,question,choice_id,choice,voter,is_guest,created_at")
+        self.assertTrue(lines[1].startswith(f'{self.question.id},"Q, with comma",{self.choice_a.id},A,Guest,True,'))
+        self.assertTrue(lines[2].startswith(f'{self.question.id},"Q, with comma",{self.choice_b.id},B,member@test.com,False,'))
+
+    def test_ndjson_and_permissions(self):
+        """Тест 2: NDJSON по строке на голос; выгрузка закрыта для всех, кроме создателя"""
+        self.assertEqual(self.client.get(self.export_url).status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_authenticate(user=self.member)
+        self.assertEqual(self.client.get(self.export_url).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=self.owner)
+        self.assertEqual(
+            self.client.get(self.export_url, {'export_format': 'xml'}).status_code, status.HTTP_400_BAD_REQUEST
+        )
+        response = self.client.get(self.export_url, {'export_format': 'ndjson'})
+        rows = [json.loads(line) for line in self.content(response).splitlines()]
+        self.assertEqual([(row['voter'], row['is_guest']) for row in rows], [("Guest", True), ("member@test.com", False)])
+
+    def test_csv_neutralizes_formulas_and_names_anonymous_voters(self):
+        """Тест 3: Ячейки-формулы экранируются в CSV (не в NDJSON); гость без ника — как в списке голосующих"""
+        Vote.objects.create(choice=self.choice_a, guest_nickname='=HYPERLINK("http://x")')
+        Vote.objects.create(choice=self.choice_a, guest_nickname="", voter_name="Legacy")
+        Vote.objects.create(choice=self.choice_a, guest_nickname=None)
+        Choice.objects.filter(pk=self.choice_b.pk).update(text="-2+3")
+        self.client.force_authenticate(user=self.owner)
+
+        rows = list(csv.reader(self.content(self.client.get(self.export_url)).splitlines()))
+        self.assertEqual([row[4] for row in rows[1:5]], ["Guest", "'=HYPERLINK(\"http://x\")", "Legacy", "Аноним"])
+        self.assertEqual(rows[5][3], "'-2+3")
+
+        response = self.client.get(self.export_url, {'export_format': 'ndjson'})
+        voters = [json.loads(line)['voter'] for line in self.content(response).splitlines()]
+        self.assertEqual(voters[1], '=HYPERLINK("http://x")')
+
+    def test_rows_are_read_lazily_in_chunks(self):
+        """Тест 4: Голоса читаются только при чтении потока, через iterator(chunk_size)"""
+        self.client.force_authenticate(user=self.owner)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.export_url)
+        self.assertEqual([q for q in ctx.captured_queries if 'FROM "rooms_vote"' in q['sql']], [])
+        with mock.patch('rooms.export.CHUNK_SIZE', 1), \
+                mock.patch.object(QuerySet, 'iterator', autospec=True, side_effect=QuerySet.iterator) as iterator:
+            self.content(response)
+        self.assertEqual({call.kwargs['chunk_size'] for call in iterator.call_args_list}, {1})
+
+    def test_async_stream_matches_sync(self):
+        """Тест 5: Под ASGI те же строки отдаются асинхронным генератором пачками"""
+        lines = list(csv_lines(vote_rows(self.room)))
+
+        async def collect():
+            return [chunk async for chunk in _async_chunks(csv_lines(vote_rows(self.room)), size=2)]
+
+        chunks = async_to_sync(collect)()
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual("".join(chunks), "".join(lines))
+
+
+class LoadTestingSuiteTests(APITestCase):
+    def setUp(self):
+        call_command(
+            'seed_rooms', prefix='t', rooms=3, questions=2, choices=3, users=4, guests=10,
+            voters=5, bans=2, registered_share=0.4, stdout=StringIO(),
+        )
+
+    def test_seed_creates_consistent_dataset(self):
+        """Тест 1: seed_rooms создает заданный объем данных с точными счетчиками и агрегатами"""
+        rooms = Room.objects.filter(slug__startswith='t-room-')
+        self.assertEqual(rooms.count(), 3)
+        self.assertEqual(Vote.objects.filter(question__room__in=rooms).count(), 3 * 2 * 5)
+        self.assertEqual(Vote.objects.filter(question__room__in=rooms, user__isnull=False).count(), 3 * 2 * 2)
+        self.assertEqual(RoomBan.objects.filter(room__in=rooms).count(), 3 * 2)
+        self.assertEqual(find_drift(), ([], []))
+        self.assertEqual(sum(VoteRollup.objects.values_list('count', flat=True)), 30)
+        self.assertTrue(User.objects.display_name_taken('T-USER-0'))
+
+        clear_dataset('t')
+        self.assertFalse(Room.objects.filter(slug__startswith='t-room-').exists())
+        self.assertFalse(User.objects.filter(username__startswith='t-user-').exists())
+
+    @override_settings(ALLOWED_HOSTS=['localhost'])
+    def test_bench_api_reports_every_scenario(self):
+        """Тест 2: bench_api проходит все сценарии через URLconf и пишет сравнимый JSON-отчет"""
+        out = StringIO()
+        call_command('bench_api', prefix='t', requests=3, warmup=1, json=True, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(set(report['scenarios']), {
+            'room_list', 'room_detail_guest', 'room_detail_creator', 'room_detail_voter',
+            'vote', 'ban', 'token_refresh',
+        })
+        for row in report['scenarios'].values():
+            self.assertEqual(row['count'], 3)
+            self.assertGreater(row['queries_mean'], 0)
+        self.assertEqual(report['meta']['rooms'], 3)
+        self.assertEqual(find_drift(), ([], []))
+
+        with self.assertRaises(CommandError):
+            call_command('bench_api', prefix='missing', stdout=StringIO())
+        # Пишет голоса и баны: на рабочей БД без DEBUG — только с --force
+        with mock.patch('core.bench.uses_test_database', return_value=False), self.assertRaises(CommandError):
+            call_command('bench_api', prefix='t', requests=1, warmup=0, stdout=StringIO())
+
+
+class AsyncViewTests(APITestCase):
+    """Async-чтения комнаты и результатов отвечают байт в байт как синхронные view."""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            email='owner@test.com', username='owner',
+            password='password', display_name='Owner'
+        )
+        self.voter = User.objects.create_user(
+            email='voter@test.com', username='voter',
+            password='password', display_name='Voter'
+        )
+        self.room = Room.objects.create(title="Комната", slug="room", creator="Owner")
+        self.question = Question.objects.create(room=self.room, text="Q", show_results=True)
+        self.choice = Choice.objects.create(question=self.question, text="A")
+        Choice.objects.create(question=self.question, text="B")
+        hidden = Question.objects.create(room=self.room, text="Hidden")
+        Choice.objects.create(question=hidden, text="X")
+        Vote.objects.create(choice=self.choice, user=self.voter)
+        Vote.objects.create(choice=self.choice, guest_nickname="Alice")
+        RoomBan.objects.create(room=self.room, banned_identifier="Troll")
+
+    def authorize(self, email):
+        token = self.client.post(
+            '/api/auth/jwt/create/', {'email': email, 'password': 'password'}, format='json'
+        ).data['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def assert_same_response(self, sync_url, async_url, params=None):
+        sync_response = self.client.get(sync_url, params)
+        async_response = self.client.get(async_url, params)
+        self.assertEqual(async_response.status_code, sync_response.status_code)
+        self.assertEqual(async_response.content, sync_response.content)
+        self.assertEqual(async_response.get('ETag'), sync_response.get('ETag'))
+        return async_response
+
+    def test_detail_matches_sync_view_for_every_viewer(self):
+        """Тест 1: Гость, проголосовавший гость, участник и Хост получают тот же JSON и ETag"""
+        sync_url = reverse('room-detail', kwargs={'slug': 'room'})
+        async_url = reverse('async-room-detail', kwargs={'slug': 'room'})
+        self.assert_same_response(sync_url, async_url)
+        alice = self.assert_same_response(sync_url, async_url, {'guest_name': 'Alice'})
+        self.assertEqual(alice.json()['questions'][0]['user_voted_choice'], self.choice.pk)
+
+        self.authorize('voter@test.com')
+        self.assert_same_response(sync_url, async_url)
+        self.authorize('owner@test.com')
+        etag = self.assert_same_response(sync_url, async_url)['ETag']
+        self.assertEqual(self.client.get(async_url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_results_match_sync_view(self):
+        """Тест 2: Результаты комнаты совпадают для гостя и Хоста, неверный интервал — 400"""
+        sync_url = reverse('room-results', kwargs={'slug': 'room'})
+        async_url = reverse('async-room-results', kwargs={'slug': 'room'})
+        self.assert_same_response(sync_url, async_url)
+        self.assert_same_response(sync_url, async_url, {'interval': 'minute'})
+        self.authorize('owner@test.com')
+        self.assertIn('choices', self.assert_same_response(sync_url, async_url).json()['questions'][1])
+        self.assertEqual(self.client.get(async_url, {'interval': 'week'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_errors_match_sync_view(self):
+        """Тест 3: Бан, несуществующая комната и битый токен дают те же коды и тексты; изменяющие методы — 405"""
+        self.assert_same_response(
+            reverse('room-detail', kwargs={'slug': 'room'}), reverse('async-room-detail', kwargs={'slug': 'room'}),
+            {'guest_name': 'Troll'},
+        )
+        self.assert_same_response(
+            reverse('room-detail', kwargs={'slug': 'nope'}), reverse('async-room-detail', kwargs={'slug': 'nope'}),
+        )
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer broken')
+        response = self.assert_same_response(
+            reverse('room-detail', kwargs={'slug': 'room'}), reverse('async-room-detail', kwargs={'slug': 'room'}),
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn('WWW-Authenticate', response)
+
+        self.client.credentials()
+        for url in (reverse('async-room-detail', kwargs={'slug': 'room'}),
+                    reverse('async-room-results', kwargs={'slug': 'room'})):
+            self.assertEqual(self.client.post(url).status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+            self.assertEqual(self.client.head(url).status_code, status.HTTP_200_OK)
+
+    def test_cache_hit_needs_no_worker_thread(self):
+        """Тест 4: При попадании в кэш дерево не сериализуется в отдельном потоке"""
+        url = reverse('async-room-detail', kwargs={'slug': 'room'})
+        self.client.get(url)
+        with mock.patch('rooms.async_views.sync_to_async') as to_thread:
+            response = self.client.get(url, {'guest_name': 'Bob'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        to_thread.assert_not_called()
+
+
+class RoomProjectionTests(APITestCase):
+    """Контракт: project_room дает тот же JSON, что и RoomSerializer."""
+
+    def setUp(self):
+        self.named = User.objects.create_user(
+            email='named@test.com', username='named',
+            password='password', display_name='Иван'
+        )
+        self.unnamed = User.objects.create_user(email='unnamed@test.com', username='unnamed', password='password')
+        self.room = Room.objects.create(title="Комната", description="", slug="room", creator="Иван")
+        open_question = Question.objects.create(room=self.room, text="Открытый", show_results=True)
+        hidden_question = Question.objects.create(room=self.room, text="Скрытый", is_active=False)
+        Question.objects.create(room=self.room, text="Без вариантов")
+        for question in (open_question, hidden_question):
+            first = Choice.objects.create(question=question, text="Да «точно»")
+            second = Choice.objects.create(question=question, text="Нет")
+            Vote.objects.create(choice=first, user=self.named)
+            Vote.objects.create(choice=second, user=self.unnamed)
+            Vote.objects.create(choice=first, guest_nickname="Гость")
+            Vote.objects.create(choice=second, guest_nickname=None, voter_name="Подпись")
+            Vote.objects.create(choice=second, guest_nickname=None)
+
+    def assert_contract(self, room, is_creator, voters=True):
+        renderer = JSONRenderer()
+        expected = renderer.render(drf_room_tree(room, is_creator, voters))
+        self.assertEqual(renderer.render(project_room(room, is_creator, voters)), expected)
+        return json.loads(expected)
+
+    def test_matches_serializer_for_creator_and_public(self):
+        """Тест 1: Хост и гость получают байт в байт тот же JSON — со списками голосующих и без"""
+        for is_creator in (True, False):
+            default = self.assert_contract(self.room, is_creator, voters=False)
+            self.assertNotIn('voters', default['questions'][0]['choices'][0])
+        creator = self.assert_contract(self.room, True)
+        self.assertEqual(
+            [len(choice['voters']) for question in creator['questions'] for choice in question['choices']],
+            [2, 3, 2, 3],
+        )
+        public = self.assert_contract(self.room, False)
+        self.assertEqual([choice['voters'] for choice in public['questions'][1]['choices']], [[], []])
+        self.assertEqual(public['questions'][0]['choices'][1]['voters'][1:], [
+            {"name": "Подпись", "choice": "Нет", "is_guest": True},
+            {"name": "Аноним", "choice": "Нет", "is_guest": True},
+        ])
+
+    def test_empty_room_and_fixed_queries(self):
+        """Тест 2: Пустая комната совпадает; число запросов не зависит от размера комнаты"""
+        self.assert_contract(Room.objects.create(title="Пусто", slug="empty", creator="x"), True)
+        with CaptureQueriesContext(connection) as ctx:
+            project_room(self.room, True)
+        # Вопросы и варианты; голоса — только для списков голосующих
+        self.assertEqual(len(ctx.captured_queries), 2)
+        with CaptureQueriesContext(connection) as ctx:
+            project_room(self.room, True, voters=True)
+        self.assertEqual(len(ctx.captured_queries), 3)
+        empty = Room.objects.create(title="Пусто", slug="empty-2", creator="x")
+        with CaptureQueriesContext(connection) as ctx:
+            project_room(empty, True)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+
+class SparseFieldsTests(APITestCase):
+    """?fields= / ?include=voters и постраничные голосующие варианта."""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            email='owner@test.com', username='owner',
+            password='password', display_name='Owner'
+        )
+        self.room = Room.objects.create(title="Room", slug="room", creator="Owner")
+        self.question = Question.objects.create(room=self.room, text="Q", show_results=True)
+        self.choice = Choice.objects.create(question=self.question, text="A")
+        self.hidden = Question.objects.create(room=self.room, text="Hidden")
+        self.hidden_choice = Choice.objects.create(question=self.hidden, text="X")
+        for index in range(5):
+            Vote.objects.create(choice=self.choice, guest_nickname=f"guest-{index}")
+            Vote.objects.create(choice=self.hidden_choice, guest_nickname=f"guest-{index}")
+        rebuild_counters()
+        self.room_url = reverse('room-detail', kwargs={'slug': 'room'})
+        room_cache.cache.clear()
+
+    def test_voters_are_opt_in(self):
+        """Тест 1: По умолчанию списков голосующих нет и голоса не читаются; ?include=voters их добавляет"""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.room_url)
+        self.assertNotIn('voters', response.data['questions'][0]['choices'][0])
+        self.assertEqual([q for q in ctx.captured_queries if 'FROM "rooms_vote"' in q['sql']], [])
+
+        included = self.client.get(self.room_url, {'include': 'voters'})
+        self.assertEqual(len(included.data['questions'][0]['choices'][0]['voters']), 5)
+        self.assertEqual(included.data['questions'][1]['choices'][0]['voters'], [])
+        self.assertNotEqual(included['ETag'], response['ETag'])
+
+        question_url = f'/api/questions/{self.question.pk}/'
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertNotIn('voters', self.client.get(question_url).data['choices'][0])
+        self.assertEqual([q for q in ctx.captured_queries if 'FROM "rooms_vote"' in q['sql']], [])
+        self.assertEqual(len(self.client.get(question_url, {'include': 'voters'}).data['choices'][0]['voters']), 5)
+
+    def test_sparse_fieldset_matches_serializer(self):
+        """Тест 2: ?fields= отдает только выбранные поля — как RoomSerializer с тем же выбором, sync и async"""
+        params = {'fields': 'title,questions.text,questions.choices.votes_count,questions.choices.voters'}
+        response = self.client.get(self.room_url, params)
+        voters = [{'name': f"guest-{index}", 'choice': "A", 'is_guest': True} for index in range(5)]
+        self.assertEqual(response.json(), {
+            'title': "Room",
+            'questions': [
+                {'text': "Q", 'choices': [{'votes_count': 5, 'voters': voters}]},
+                {'text': "Hidden", 'choices': [{'votes_count': 5, 'voters': []}]},
+            ],
+        })
+
+        request = APIRequestFactory().get(self.room_url, params)
+        selection = FieldSelection.from_request(request)
+        expected = RoomSerializer(
+            Room.objects.get(pk=self.room.pk),
+            context={'is_creator': False, 'voted_choices': {}, 'selection': selection},
+        ).data
+        self.assertEqual(response.content, JSONRenderer().render(expected))
+        async_response = self.client.get(reverse('async-room-detail', kwargs={'slug': 'room'}), params)
+        self.assertEqual(async_response.content, response.content)
+        self.assertEqual(async_response['ETag'], response['ETag'])
+
+        self.assertEqual(set(self.client.get(self.room_url, {'fields': 'id,slug'}).data), {'id', 'slug'})
+
+    def test_voters_subresource_is_paginated_and_respects_visibility(self):
+        """Тест 3: GET /api/choices/{id}/voters/ постранично; скрытые результаты — только Хосту"""
+        url = reverse('choice-voters', kwargs={'pk': self.choice.pk})
+        first = self.client.get(url, {'page_size': 2}).data
+        self.assertEqual([voter['name'] for voter in first['results']], ['guest-0', 'guest-1'])
+        self.assertEqual(first['results'][0], {"name": "guest-0", "choice": "A", "is_guest": True})
+        second = self.client.get(first['next']).data
+        self.assertEqual([voter['name'] for voter in second['results']], ['guest-2', 'guest-3'])
+
+        hidden_url = reverse('choice-voters', kwargs={'pk': self.hidden_choice.pk})
+        self.assertEqual(self.client.get(hidden_url).status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_authenticate(user=self.owner)
+        self.assertEqual(len(self.client.get(hidden_url).data['results']), 5)
+
+    def test_voters_subresource_checks_bans(self):
+        """Тест 4: Забаненный зритель не получает список голосующих"""
+        RoomBan.objects.create(room=self.room, banned_identifier="Troll")
+        url = reverse('choice-voters', kwargs={'pk': self.choice.pk})
+        response = self.client.get(url, {'guest_name': "Troll"})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.data['detail'], "Вы забанены в этой комнате.")
+        self.assertEqual(self.client.get(url, {'guest_name': "guest-0"}).status_code, status.HTTP_200_OK)
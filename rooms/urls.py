@@ -1,5 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import async_views
+from .realtime import room_events
 from .views import RoomViewSet, QuestionViewSet, VoteCreateView, ChoiceViewSet
 
 # Создаем роутер и регистрируем ViewSets
@@ -15,4 +17,11 @@ urlpatterns = [
 
     # Отдельный маршрут для голосования
     path('votes/', VoteCreateView.as_view(), name='create-vote'),
+
+    # Поток событий комнаты (Server-Sent Events, только под ASGI)
+    path('rooms/<slug:slug>/events/', room_events, name='room-events'),
+
+    # Async-чтения для ASGI-сервера: те же ответы, что у RoomViewSet (rooms/async_views.py)
+    path('async/rooms/<slug:slug>/', async_views.room_detail, name='async-room-detail'),
+    path('async/rooms/<slug:slug>/results/', async_views.room_results, name='async-room-results'),
 ]
\ No newline at end of file
@@ -1,41 +1,283 @@
+import hashlib
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, IntegerField, OuterRef, Prefetch, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils.cache import patch_vary_headers
 from rest_framework import viewsets, generics, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticatedOrReadOnly, AllowAny
-from rest_framework.exceptions import PermissionDenied
-from .models import Room, Question, Vote, Choice, RoomBan
-from .serializers import RoomSerializer, QuestionSerializer, VoteSerializer, ChoiceCreateSerializer
+from rest_framework.permissions import SAFE_METHODS, IsAuthenticated, IsAuthenticatedOrReadOnly, AllowAny
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from core.compression import compress, compression_settings, encoded_response, negotiate
+from core.metrics import VOTES
+from core.renderers import ORJSONRenderer, render_json
+from core.timing import span
+from users.authentication import ClaimsJWTAuthentication
+
+from . import counters, realtime
+from .ingest import Backpressure, VoteRejected, get_vote_buffer, ingestion_settings
+from .bans import apply_bans
+from .cache import ban_cache, room_cache, with_viewer_overlay
+from .models import Room, Question, Vote, Choice
+from .export import FORMATS as EXPORT_FORMATS, export_response
+from .pagination import RoomCursorPagination, VoterCursorPagination
+from .projection import needs_voters, project_room, select_fields
+from .results import DEFAULT_INTERVAL, INTERVALS, question_results, room_results
+from .serializers import (
+    RoomSerializer, RoomListSerializer, QuestionSerializer, VoteSerializer, ChoiceCreateSerializer,
+    ALREADY_VOTED, DEFAULT_SELECTION, FieldSelection, can_see_voters, get_viewer_name,
+    is_room_creator, voter_entry,
+)
+
+
+def choices_prefetch(votes_queryset=None):
+    """
+    Prefetch вариантов ответа вместе с голосами и пользователями — без запросов на каждый вариант.
+    Число голосов берется из денормализованного Choice.votes_count; голоса (votes_queryset)
+    нужны только для списков голосующих (?include=voters).
+    """
+    choices = Choice.objects.order_by('id')
+    if votes_queryset is not None:
+        choices = choices.prefetch_related(Prefetch('votes', queryset=votes_queryset))
+    return Prefetch('choices', queryset=choices)
+
+
+def questions_prefetch(votes_queryset=None):
+    """Prefetch всего дерева комнаты: вопросы -> варианты -> голоса."""
+    questions = Question.objects.prefetch_related(choices_prefetch(votes_queryset)).order_by('id')
+    return Prefetch('questions', queryset=questions)
+
+
+def serialize_room_tree(room, is_creator, voters=False):
+    """
+    Общая часть детальной страницы (без user_voted_choice) для зрителя вида is_creator,
+    со списками голосующих при voters. Дерево загружается фиксированным числом запросов
+    (не зависит от размера комнаты) и собирается из строк БД напрямую (rooms/projection.py) —
+    тот же JSON, что у RoomSerializer.
+    """
+    with span('serialize'):
+        return project_room(room, is_creator, voters)
+
+
+def drf_room_tree(room, is_creator, voters=False):
+    """То же дерево через RoomSerializer: эталон для project_room (RoomProjectionTests, bench_room_serialization)."""
+    votes = None
+    if voters:
+        votes = Vote.objects.select_related('user').order_by('id')
+        if not is_creator:
+            votes = votes.filter(question__show_results=True)
+    room = Room.objects.prefetch_related(questions_prefetch(votes)).get(pk=room.pk)
+    selection = FieldSelection(include=frozenset({'voters'})) if voters else DEFAULT_SELECTION
+    return RoomSerializer(room, context={'is_creator': is_creator, 'voted_choices': {}, 'selection': selection}).data
+
+
+def room_variant(is_creator, voters):
+    """Вариант общей части в кэше комнаты (rooms/cache.py VARIANTS)."""
+    variant = 'creator' if is_creator else 'public'
+    return f"{variant}+voters" if voters else variant
+
+
+def viewer_votes(room, user, guest_name):
+    """Голоса зрителя в комнате (пользователь или гость из ?guest_name=) или None, если зритель неизвестен."""
+    votes = Vote.objects.filter(question__room=room)
+    if user.is_authenticated:
+        return votes.filter(user=user)
+    if not guest_name:
+        return None
+    return votes.filter(guest_nickname=guest_name)
+
+
+def get_voted_choices(room, request):
+    """Одним запросом собирает {question_id: choice_id} для текущего зрителя."""
+    votes = viewer_votes(room, request.user, request.query_params.get('guest_name'))
+    if votes is None:
+        return {}
+    return dict(votes.values_list('question_id', 'choice_id'))
+
+
+def ban_name(user, guest_name):
+    """Имя, по которому зритель проверяется в банах комнаты: пользователь или гость из ?guest_name=."""
+    return get_viewer_name(user) if user.is_authenticated else guest_name
+
+
+def ban_detail(user):
+    return "Бан" if user.is_authenticated else "Вы забанены в этой комнате."
+
+
+def banned_response(request, room):
+    """403, если зритель забанен в комнате, иначе None. Общая проверка для всех чтений комнаты."""
+    name = ban_name(request.user, request.query_params.get('guest_name'))
+    # Множество банов комнаты берется из кэша по room.bans_version — без запроса к БД
+    if ban_cache.is_banned(room, name):
+        return Response({"detail": ban_detail(request.user)}, status=status.HTTP_403_FORBIDDEN)
+    return None
+
+
+def room_etag(request, room, resource):
+    """
+    Слабый ETag ресурса комнаты: Room.version + отпечаток зрителя и формата ответа.
+    У каждого зрителя свой user_voted_choice и своя видимость списков голосующих,
+    поэтому один и тот же ETag никогда не подходит к чужому представлению.
+    """
+    renderer = request.accepted_renderer.format if getattr(request, 'accepted_renderer', None) else ''
+    return viewer_etag(
+        request.user, request.query_params.get('guest_name', ''), renderer, room, resource,
+        FieldSelection.from_request(request),
+    )
+
+
+def viewer_etag(user, guest_name, renderer, room, resource, selection=DEFAULT_SELECTION):
+    if user.is_authenticated:
+        viewer = f"user:{user.pk}:{get_viewer_name(user)}"
+    else:
+        viewer = f"guest:{guest_name}"
+    # ?fields=/?include= меняют тело ответа — и ETag
+    fingerprint = hashlib.sha1(f"{viewer}|{renderer}|{selection.key()}".encode()).hexdigest()[:16]
+    return f'W/"{resource}-v{room.version}-{fingerprint}"'
+
+
+def etag_matches(request, etag):
+    if_none_match = request.headers.get('If-None-Match')
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == '*' or etag in [tag.strip() for tag in if_none_match.split(',')]
+
+
+def conditional_response(request, etag, build_data):
+    """304 без построения тела, если клиент прислал актуальный ETag, иначе 200 + ETag."""
+    if etag_matches(request, etag):
+        return conditional_headers(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+    return conditional_headers(Response(build_data()), etag)
+
+
+def conditional_headers(response, etag):
+    response['ETag'] = etag
+    # Ответ персональный: кэшировать только в браузере и всегда перепроверять
+    response['Cache-Control'] = 'private, no-cache'
+    patch_vary_headers(response, ('Authorization',))
+    return response
+
+
+def read_selection(request):
+    """?fields=/?include= действуют только на чтение: запись валидирует все поля как раньше."""
+    if request.method in SAFE_METHODS:
+        return FieldSelection.from_request(request)
+    return DEFAULT_SELECTION
+
+
+def renders_plain_json(request):
+    """Ответ уйдет компактным JSON (не Browsable API и не JSON с отступами)."""
+    renderer = getattr(request, 'accepted_renderer', None)
+    return isinstance(renderer, ORJSONRenderer) and 'indent' not in (request.accepted_media_type or '')
+
+
+MAX_BULK_BAN = 500
+
+
+def vote_outcome(response, reason):
+    """
+    Метка rooms_votes_total: 'accepted', причина отказа, записанная там, где голос отклонен
+    (VoteSerializer, VoteRejected, VoteCreateView), 'invalid' для прочих ошибок валидации
+    и 'error' для остального (аутентификация, CSRF, 5xx).
+    """
+    if reason:
+        return reason
+    if response.status_code < 300:
+        return 'accepted'
+    if response.status_code == status.HTTP_400_BAD_REQUEST:
+        return 'invalid'
+    return 'error'
+
+
+def results_interval(request):
+    interval = request.query_params.get('interval', DEFAULT_INTERVAL)
+    if interval not in INTERVALS:
+        raise ValidationError({"interval": [f"Допустимые значения: {', '.join(INTERVALS)}"]})
+    return interval
 
 
 class RoomViewSet(viewsets.ModelViewSet):
     queryset = Room.objects.all().order_by('-created_at')
     serializer_class = RoomSerializer
     lookup_field = 'slug'
+    # Пользователь собирается из claims токена, без SELECT на каждый запрос (при USERS_JWT_CLAIMS['CACHE'])
+    authentication_classes = [ClaimsJWTAuthentication]
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = RoomCursorPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            # Счетчики считаются коррелированными подзапросами по индексу room_id,
+            # чтобы не размножать строки комнат JOIN-ами; голоса — из Question.votes_count
+            question_count = (
+                Question.objects.filter(room=OuterRef('pk'))
+                .order_by().values('room').annotate(count=Count('pk')).values('count')
+            )
+            total_votes = (
+                Question.objects.filter(room=OuterRef('pk'))
+                .order_by().values('room').annotate(total=Sum('votes_count')).values('total')
+            )
+            queryset = queryset.annotate(
+                question_count=Coalesce(Subquery(question_count, output_field=IntegerField()), 0),
+                total_votes=Coalesce(Subquery(total_votes, output_field=IntegerField()), 0),
+            )
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return RoomListSerializer
+        return super().get_serializer_class()
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), 'selection': read_selection(self.request)}
+
+    def list(self, request, *args, **kwargs):
+        # SQL страницы уходит в 'db' Server-Timing, остальное время — сериализация
+        with span('serialize'):
+            return super().list(request, *args, **kwargs)
 
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
+        banned = banned_response(request, instance)
+        if banned is not None:
+            return banned
 
-        # 1. Если пользователь авторизован
-        if request.user.is_authenticated:
-            user_name = request.user.display_name or request.user.email
-            if self.is_banned(instance, user_name):
-                return Response({"detail": "Бан"}, status=status.HTTP_403_FORBIDDEN)
+        etag = room_etag(request, instance, f"room-{instance.pk}")
+        if etag_matches(request, etag):
+            return conditional_headers(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+        return conditional_headers(self.room_response(instance), etag)
 
-        # 2. Если гость
-        else:
-            guest_name = request.query_params.get('guest_name')
-            if guest_name and self.is_banned(instance, guest_name):
-                return Response(
-                    {"detail": "Вы забанены в этой комнате."},
-                    status=status.HTTP_403_FORBIDDEN
-                )
+    def room_response(self, instance):
+        # Общая часть (вопросы, счетчики, списки голосующих) берется из кэша,
+        # поверх нее накладывается только персональный user_voted_choice
+        is_creator = is_room_creator(self.request.user, instance)
+        selection = FieldSelection.from_request(self.request)
+        voters = needs_voters(selection)
+        variant = room_variant(is_creator, voters)
+        voted = get_voted_choices(instance, self.request)
+        encoding = negotiate(self.request.headers.get('Accept-Encoding'))
+        if encoding and not voted and selection.tree is None and renders_plain_json(self.request):
+            # Без голосов ответ равен общей части: готовое сжатое тело одно на всех таких зрителей
+            body = room_cache.get(instance, variant, encoding)
+            if body is None:
+                payload = render_json(self.room_payload(instance, variant, is_creator, voters))
+                body = compress(payload, encoding, compression_settings())
+                room_cache.set(instance, variant, body, encoding)
+            return encoded_response(body[1], body[0])
+        payload = self.room_payload(instance, variant, is_creator, voters)
+        return Response(select_fields(with_viewer_overlay(payload, voted), selection))
 
-        return super().retrieve(request, *args, **kwargs)
+    def room_payload(self, instance, variant, is_creator, voters):
+        payload = room_cache.get(instance, variant)
+        if payload is None:
+            payload = self.serialize_room(instance, is_creator, voters)
+            room_cache.set(instance, variant, payload)
+        return payload
 
-    def is_banned(self, room, name):
-        # Проверяем наличие записи в таблице банов
-        return RoomBan.objects.filter(room=room, banned_identifier=name).exists()
+    def serialize_room(self, instance, is_creator, voters=False):
+        return serialize_room_tree(instance, is_creator, voters)
 
     @action(detail=True, methods=['post'])
     def ban_user(self, request, slug=None):
@@ -49,15 +291,64 @@ class RoomViewSet(viewsets.ModelViewSet):
         if not target_name:
             return Response({"error": "Укажите ник"}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Создаем запись в модели RoomBan (get_or_create чтобы не дублировать)
-        RoomBan.objects.get_or_create(room=room, banned_identifier=target_name)
+        apply_bans(room, [target_name])
+        return Response({"status": f"Пользователь {target_name} забанен."})
 
-        # Удаляем все следы пользователя (голоса)
-        Vote.objects.filter(choice__question__room=room, guest_nickname=target_name).delete()
-        Vote.objects.filter(choice__question__room=room, user__display_name=target_name).delete()
-        Vote.objects.filter(choice__question__room=room, user__email=target_name).delete()
+    @action(detail=True, methods=['post'])
+    def ban_users(self, request, slug=None):
+        """Массовый бан (зачистка спам-волны): {"nicknames": ["a", "b", ...]} одной операцией."""
+        room = self.get_object()
+        if not is_room_creator(request.user, room):
+            raise PermissionDenied("Только создатель может банить!")
 
-        return Response({"status": f"Пользователь {target_name} забанен."})
+        nicknames = request.data.get('nicknames')
+        if (
+            not isinstance(nicknames, list) or not nicknames
+            or not all(isinstance(name, str) and name for name in nicknames)
+        ):
+            return Response({"error": "Укажите список ников"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(nicknames) > MAX_BULK_BAN:
+            return Response(
+                {"error": f"Не больше {MAX_BULK_BAN} ников за запрос"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        votes_deleted = apply_bans(room, nicknames)
+        return Response({"banned": sorted(set(nicknames)), "votes_deleted": votes_deleted})
+
+    @action(detail=True, methods=['get'])
+    def export(self, request, slug=None):
+        """Потоковая выгрузка всех голосов для создателя: ?export_format=csv|ndjson (rooms/export.py)."""
+        room = self.get_object()
+        if not is_room_creator(request.user, room):
+            raise PermissionDenied("Выгрузка доступна только создателю комнаты.")
+        # ?format= занят DRF под выбор рендерера
+        export_format = request.query_params.get('export_format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            raise ValidationError({"export_format": [f"Допустимые значения: {', '.join(EXPORT_FORMATS)}"]})
+        return export_response(request._request, room, export_format)
+
+    @action(detail=True, methods=['post'], url_path='events-ticket', permission_classes=[IsAuthenticated])
+    def events_ticket(self, request, slug=None):
+        """Короткоживущий билет для подписки на события комнаты (?ticket=): EventSource не шлет Authorization."""
+        room = self.get_object()
+        return Response({"ticket": realtime.issue_ticket(room, request.user), "expires_in": realtime.ticket_ttl()})
+
+    @action(detail=True, methods=['get'])
+    def results(self, request, slug=None):
+        """Счетчики, проценты и временной ряд по всем вопросам (?interval=minute|hour|day)."""
+        room = self.get_object()
+        banned = banned_response(request, room)
+        if banned is not None:
+            return banned
+        interval = results_interval(request)
+
+        def build():
+            questions = list(room.questions.order_by('id'))
+            is_creator = is_room_creator(request.user, room)
+            visible = {question.pk for question in questions if is_creator or question.show_results}
+            return room_results(room, questions, visible, interval)
+
+        return conditional_response(request, room_etag(request, room, f"results-{room.pk}-{interval}"), build)
 
     def perform_create(self, serializer):
         user = self.request.user
@@ -66,29 +357,86 @@ class RoomViewSet(viewsets.ModelViewSet):
 
 
 class QuestionViewSet(viewsets.ModelViewSet):
-    queryset = Question.objects.all()
+    queryset = Question.objects.select_related('room')
     serializer_class = QuestionSerializer
+    authentication_classes = [ClaimsJWTAuthentication]
     permission_classes = [IsAuthenticatedOrReadOnly]
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'results':
+            # Результатам не нужны голоса — только вопрос с комнатой
+            return queryset
+        # Голоса читаются только для ?include=voters
+        selection = read_selection(self.request)
+        votes = Vote.objects.select_related('user') if needs_voters(selection, path=('choices',)) else None
+        return queryset.prefetch_related(choices_prefetch(votes))
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), 'selection': read_selection(self.request)}
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        return conditional_response(
+            request, room_etag(request, instance.room, f"question-{instance.pk}"),
+            lambda: self.get_serializer(instance).data,
+        )
+
+    @action(detail=True, methods=['get'])
+    def results(self, request, pk=None):
+        """Счетчики, проценты и временной ряд вопроса (?interval=minute|hour|day)."""
+        question = self.get_object()
+        banned = banned_response(request, question.room)
+        if banned is not None:
+            return banned
+        if not (question.show_results or is_room_creator(request.user, question.room)):
+            raise PermissionDenied("Результаты скрыты создателем комнаты.")
+        interval = results_interval(request)
+        return conditional_response(
+            request, room_etag(request, question.room, f"results-question-{question.pk}-{interval}"),
+            lambda: question_results(question, interval),
+        )
+
     def perform_create(self, serializer):
         room = serializer.validated_data['room']
         user = self.request.user
         user_name = user.display_name if user.display_name else user.email
         if room.creator != user_name:
             raise PermissionDenied("Нет прав!")
-        serializer.save()
+        question = serializer.save()
+        realtime.publish(room.slug, {"type": "question_created", "question": question.id})
 
     def perform_update(self, serializer):
         if not self.request.user.is_authenticated:
             raise PermissionDenied("Нужна авторизация!")
-        serializer.save()
+        question = serializer.save()
+        realtime.publish(question.room.slug, {
+            "type": "question",
+            "question": question.id,
+            "is_active": question.is_active,
+            "show_results": question.show_results,
+        })
 
 
 class ChoiceViewSet(viewsets.ModelViewSet):
-    queryset = Choice.objects.all()
+    queryset = Choice.objects.select_related('question__room')
     serializer_class = ChoiceCreateSerializer
+    authentication_classes = [ClaimsJWTAuthentication]
     permission_classes = [IsAuthenticatedOrReadOnly]
 
+    @action(detail=True, methods=['get'])
+    def voters(self, request, pk=None):
+        """Голосующие за вариант постранично (?cursor=, ?page_size=) — вместо списков в дереве комнаты."""
+        choice = self.get_object()
+        banned = banned_response(request, choice.question.room)
+        if banned is not None:
+            return banned
+        if not can_see_voters(request.user, choice.question):
+            raise PermissionDenied("Результаты скрыты создателем комнаты.")
+        paginator = VoterCursorPagination()
+        page = paginator.paginate_queryset(choice.votes.select_related('user'), request, view=self)
+        return paginator.get_paginated_response([voter_entry(vote, choice.text) for vote in page])
+
     def perform_create(self, serializer):
         question = serializer.validated_data['question']
         room = question.room
@@ -96,35 +444,84 @@ class ChoiceViewSet(viewsets.ModelViewSet):
         user_name = user.display_name if user.display_name else user.email
         if room.creator != user_name:
             raise PermissionDenied("Нет прав!")
-        serializer.save()
+        choice = serializer.save()
+        realtime.publish(room.slug, {"type": "choice_created", "question": question.id, "choice": choice.id})
 
 
 class VoteCreateView(generics.CreateAPIView):
     queryset = Vote.objects.all()
     serializer_class = VoteSerializer
+    authentication_classes = [ClaimsJWTAuthentication]
     permission_classes = [AllowAny]
 
+    rejection_reason = None
+    vote_serializer = None
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        # Сюда приходят и успешные ответы, и ответы на исключения валидации
+        if request.method == 'POST':
+            reason = self.rejection_reason or getattr(self.vote_serializer, 'rejection_reason', None)
+            VOTES.labels(vote_outcome(response, reason)).inc()
+        return super().finalize_response(request, response, *args, **kwargs)
+
+    def get_serializer(self, *args, **kwargs):
+        # Причину отказа из validate() сериализатор оставляет в rejection_reason
+        self.vote_serializer = super().get_serializer(*args, **kwargs)
+        return self.vote_serializer
+
+    def create(self, request, *args, **kwargs):
+        if ingestion_settings()['MODE'] == 'buffered':
+            return self.create_buffered(request)
+        return super().create(request, *args, **kwargs)
+
+    def create_buffered(self, request):
+        # Проверка по состоянию в памяти и постановка в очередь: см. rooms/ingest.py
+        try:
+            vote = get_vote_buffer().submit(
+                request.user, request.data.get('choice'), request.data.get('guest_nickname'),
+            )
+        except VoteRejected as rejected:
+            self.rejection_reason = rejected.reason
+            return Response(rejected.data, status=rejected.status_code)
+        except Backpressure:
+            self.rejection_reason = 'backpressure'
+            return Response(
+                {"detail": "Слишком много голосов, повторите через секунду."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': '1'},
+            )
+        return Response(
+            {"choice": vote.choice_id, "guest_nickname": vote.guest_nickname, "user": vote.user_id, "status": "accepted"},
+            status=status.HTTP_202_ACCEPTED,
+        )
+
     def perform_create(self, serializer):
-        if self.request.user.is_authenticated:
-            serializer.save(user=self.request.user)
-        else:
-            serializer.save()
-
-    def post(self, request, *args, **kwargs):
-        choice_id = request.data.get('choice')
-        nickname = request.data.get('guest_nickname')
-        current_name = nickname
-        if request.user.is_authenticated:
-            current_name = request.user.display_name
-
-        if choice_id:
-            try:
-                choice_obj = Choice.objects.get(id=choice_id)
-                room = choice_obj.question.room
-                # Проверка бана через новую модель
-                if current_name and RoomBan.objects.filter(room=room, banned_identifier=current_name).exists():
-                    return Response({"detail": "Вы забанены!"}, status=status.HTTP_403_FORBIDDEN)
-            except Exception:
-                pass
-
-        return super().post(request, *args, **kwargs)
\ No newline at end of file
+        choice = serializer.validated_data['choice']
+        # Вставка голоса и +1 к счетчикам — одна транзакция; повторный голос
+        # отклоняет уникальное ограничение БД, а не отдельный SELECT перед INSERT
+        try:
+            with transaction.atomic():
+                vote = serializer.save()
+                votes_count = counters.record_vote(vote)
+                Room.bump_version(choice.question.room_id)
+        except IntegrityError as error:
+            # Только "один голос на вопрос"; остальные нарушения целостности — ошибки сервера
+            if not Vote.is_duplicate_vote_error(error):
+                raise
+            self.rejection_reason = 'duplicate'
+            raise ValidationError({"non_field_errors": [ALREADY_VOTED]})
+
+        event = {
+            "type": "vote",
+            "question": choice.question_id,
+            "choice": choice.id,
+            "votes_count": votes_count,
+        }
+        # Имена голосующих и так публичны, когда результаты открыты — тогда отправляем и имя
+        if choice.question.show_results:
+            event["voter"] = {
+                "name": vote.user.display_name or vote.user.email if vote.user else vote.guest_nickname,
+                "choice": choice.text,
+                "is_guest": vote.user is None,
+            }
+        realtime.publish(choice.question.room.slug, event)
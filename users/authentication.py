@@ -0,0 +1,140 @@
+"""
+JWT-аутентификация по claims токена, без SELECT пользователя на каждый запрос.
+
+Access-токен из /api/auth/jwt/create/ (и /jwt/refresh/) несет email и display_name —
+ровно то, что читают view комнат. ClaimsJWTAuthentication собирает из них экземпляр User
+без обращения к БД: id/email/display_name заполнены, остальные поля отложены (deferred)
+и подгружаются из БД только если к ним обратиться, т.е. только там, где нужна полная модель.
+
+Инвалидация: при изменении пользователя (PATCH /api/auth/users/me/, админка, удаление,
+деактивация) в кэш USERS_JWT_CLAIMS['CACHE'] пишется отметка времени. Токены с claims, выданными
+не позже отметки, обслуживаются обычным путем — загрузкой пользователя из БД (с проверкой
+is_active) — пока не истекут или не будут обновлены через /jwt/refresh/, который перечитывает
+claims из БД.
+
+Отметку должны видеть все воркеры, поэтому кэш — общий (Redis); кэш процесса (LocMemCache)
+отклоняет проверка users.E002 (users/checks.py). CACHE = None (по умолчанию) — claims не
+используются для сборки пользователя, он загружается из БД на каждый запрос, как в simplejwt.
+"""
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import router
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from core.timing import span
+
+CLAIMS_ISSUED_AT = 'claims_at'
+CLAIM_FIELDS = ('email', 'display_name')
+
+DEFAULTS = {
+    'CACHE': None,
+}
+
+
+def claims_settings():
+    return {**DEFAULTS, **getattr(settings, 'USERS_JWT_CLAIMS', {})}
+
+
+def claims_cache():
+    alias = claims_settings()['CACHE']
+    return caches[alias] if alias else None
+
+
+def add_user_claims(token, user):
+    for field in CLAIM_FIELDS:
+        token[field] = getattr(user, field)
+    token[CLAIMS_ISSUED_AT] = int(time.time())
+    return token
+
+
+def remove_user_claims(token):
+    for claim in (*CLAIM_FIELDS, CLAIMS_ISSUED_AT):
+        token.payload.pop(claim, None)
+    return token
+
+
+def stale_key(user_id):
+    return f"users:claims-stale:{user_id}"
+
+
+def mark_claims_stale(user_id):
+    cache = claims_cache()
+    if cache is None:
+        return
+    # Старше ACCESS_TOKEN_LIFETIME токенов с прежними claims не бывает — дальше отметка не нужна
+    timeout = int(api_settings.ACCESS_TOKEN_LIFETIME.total_seconds())
+    cache.set(stale_key(user_id), int(time.time()), timeout=timeout)
+
+
+def claims_are_fresh(token):
+    cache = claims_cache()
+    if cache is None or token.get(CLAIMS_ISSUED_AT) is None:
+        return False
+    return _fresher_than(token, cache.get(stale_key(token[api_settings.USER_ID_CLAIM])))
+
+
+async def aclaims_are_fresh(token):
+    cache = claims_cache()
+    if cache is None or token.get(CLAIMS_ISSUED_AT) is None:
+        return False
+    return _fresher_than(token, await cache.aget(stale_key(token[api_settings.USER_ID_CLAIM])))
+
+
+def refresh_claims_are_fresh(token):
+    """
+    claims refresh-токена можно переносить в новый access-токен без SELECT пользователя:
+    отметки устаревания нет, а claims выданы меньше ACCESS_TOKEN_LIFETIME назад — столько
+    живет отметка, поэтому для более старых claims ее отсутствие ничего не доказывает.
+    """
+    if not claims_are_fresh(token):
+        return False
+    return time.time() - token[CLAIMS_ISSUED_AT] < api_settings.ACCESS_TOKEN_LIFETIME.total_seconds()
+
+
+def _fresher_than(token, marker):
+    # Отметка с точностью до секунды: при совпадении секунд считаем claims устаревшими
+    return marker is None or token[CLAIMS_ISSUED_AT] > marker
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    def authenticate(self, request):
+        # Проверка подписи и сборка пользователя — участок 'auth' в Server-Timing
+        with span('auth'):
+            return super().authenticate(request)
+
+    async def aauthenticate(self, request):
+        """
+        authenticate() для async-view (rooms/async_views.py) поверх обычного HttpRequest.
+        Проверка подписи — чистый CPU; в БД идем только за пользователем с устаревшими claims.
+        """
+        with span('auth'):
+            header = self.get_header(request)
+            if header is None:
+                return None
+            raw_token = self.get_raw_token(header)
+            if raw_token is None:
+                return None
+            validated_token = self.get_validated_token(raw_token)
+            if await aclaims_are_fresh(validated_token):
+                return self.claims_user(validated_token), validated_token
+            return await sync_to_async(super().get_user)(validated_token), validated_token
+
+    def get_user(self, validated_token):
+        if not claims_are_fresh(validated_token):
+            # Токен без claims (выдан до их появления) или пользователь изменился
+            return super().get_user(validated_token)
+        return self.claims_user(validated_token)
+
+    def claims_user(self, validated_token):
+        # is_active=True: деактивация ставит отметку (users/signals.py), и такой токен сюда не попадает
+        field_names = [api_settings.USER_ID_FIELD, 'is_active', *CLAIM_FIELDS]
+        values = [
+            validated_token[api_settings.USER_ID_CLAIM], True,
+            *(validated_token[field] for field in CLAIM_FIELDS),
+        ]
+        User = self.user_model
+        return User.from_db(router.db_for_read(User), field_names, values)
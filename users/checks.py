@@ -0,0 +1,40 @@
+"""
+Проверки настроек (manage.py check, запуск сервера): кэши, которые читают разные процессы,
+не могут быть кэшем одного процесса.
+"""
+from django.conf import settings
+from django.core import checks
+
+from .authentication import claims_settings
+from .tokens import blacklist_settings
+
+PROCESS_LOCAL_BACKENDS = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+def is_process_local(alias):
+    return settings.CACHES.get(alias, {}).get('BACKEND') in PROCESS_LOCAL_BACKENDS
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_caches(app_configs, **kwargs):
+    errors = []
+    alias = blacklist_settings()['CACHE']
+    if alias and is_process_local(alias):
+        errors.append(checks.Error(
+            f"USERS_TOKEN_BLACKLIST['CACHE'] = {alias!r} — кэш одного процесса: прогрев из cron "
+            "и черный список других воркеров его не видят.",
+            hint="Укажите алиас общего кэша (Redis) или None — проверка по БД.",
+            id='users.E001',
+        ))
+    alias = claims_settings()['CACHE']
+    if alias and is_process_local(alias):
+        errors.append(checks.Error(
+            f"USERS_JWT_CLAIMS['CACHE'] = {alias!r} — кэш одного процесса: отметку об изменении "
+            "или деактивации пользователя не увидят другие воркеры.",
+            hint="Укажите алиас общего кэша (Redis) или None — пользователь загружается из БД.",
+            id='users.E002',
+        ))
+    return errors
@@ -0,0 +1,72 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from core.bench import require_disposable_database, summarize, write_report
+from users.models import normalize_display_name
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет проверку ника гостя (UserManager.display_name_taken) против прежнего "
+        "display_name__iexact на таблице из --users пользователей (например, --users 1000000). "
+        "Пользователи создаются в текущей БД и удаляются после замера, поэтому команда запускается "
+        "только при DEBUG, на тестовой БД или с --force."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, required=True, help="Пользователей в таблице (создаются в БД).")
+        parser.add_argument('--lookups', type=int, default=500, help="Проверок на каждый способ.")
+        parser.add_argument('--json', action='store_true', help="Вывести результат в JSON.")
+        parser.add_argument('--force', action='store_true', help="Запустить на рабочей БД (без DEBUG).")
+
+    def handle(self, *args, **options):
+        require_disposable_database(options['force'])
+        prefix = f"bench{time.time_ns()}"
+        self.seed(prefix, options['users'])
+        try:
+            # Половина проверок — занятые ники в другом регистре, половина — свободные
+            names = [
+                f"{prefix.upper()}-{index * 7919 % options['users']}" if index % 2 else f"{prefix}-free-{index}"
+                for index in range(options['lookups'])
+            ]
+            results = {
+                'normalized': self.measure(names, User.objects.display_name_taken),
+                'iexact': self.measure(names, lambda name: User.objects.filter(display_name__iexact=name).exists()),
+            }
+            results['speedup'] = {
+                'p50_x': round(results['iexact']['p50_ms'] / max(results['normalized']['p50_ms'], 0.001), 1),
+            }
+        finally:
+            self.cleanup(prefix)
+        write_report(self.stdout, results, options['json'])
+
+    def seed(self, prefix, total, batch_size=10000):
+        for start in range(0, total, batch_size):
+            User.objects.bulk_create(
+                User(
+                    email=f"{prefix}-{index}@bench.local", username=f"{prefix}-{index}",
+                    password='!', display_name=f"{prefix}-{index}",
+                    # bulk_create минует User.save()
+                    display_name_normalized=normalize_display_name(f"{prefix}-{index}"),
+                )
+                for index in range(start, min(start + batch_size, total))
+            )
+
+    def measure(self, names, lookup):
+        samples = []
+        for name in names:
+            started = time.perf_counter()
+            lookup(name)
+            samples.append(time.perf_counter() - started)
+        return summarize(samples)
+
+    def cleanup(self, prefix, batch_size=10000):
+        while True:
+            ids = list(User.objects.filter(username__startswith=prefix).values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            User.objects.filter(pk__in=ids).delete()
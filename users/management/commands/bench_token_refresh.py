@@ -0,0 +1,107 @@
+import datetime
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+from core.bench import stopwatch, summarize, write_report
+from users.tokens import READY_KEY, blacklist_cache, warm_blacklist_cache
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = (
+        "Пропускная способность POST /api/auth/jwt/refresh/ при большой истории токенов: проверка "
+        "черного списка и пользователя по БД и по кэшу (USERS_TOKEN_BLACKLIST и USERS_JWT_CLAIMS); "
+        "user_selects_per_refresh — SELECT-ов users_user на одно обновление. История (--history строк OutstandingToken, все в черном "
+        "списке) создается в текущей БД и удаляется после замера. Для 10M: --history 10000000."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--history', type=int, default=100000, help="Исторических токенов в таблицах.")
+        parser.add_argument('--expired', type=float, default=0.9, help="Доля истекших среди них.")
+        parser.add_argument('--refreshes', type=int, default=300, help="Обновлений токена на каждый режим.")
+        parser.add_argument('--keep-history', action='store_true', help="Не удалять историю после замера.")
+        parser.add_argument('--json', action='store_true', help="Вывести результат в JSON.")
+
+    def handle(self, *args, **options):
+        user = User.objects.create_user(
+            email=f"bench-{time.time_ns()}@bench.local", username=f"bench-{time.time_ns()}",
+            password='BenchPassword123!', display_name=None,
+        )
+        try:
+            with stopwatch() as seeding:
+                self.seed(user, options['history'], options['expired'])
+            results = {'history': {'tokens': options['history'], 'seed_s': round(seeding(), 1)}}
+            results['database'] = self.run(user, options['refreshes'], cached=False)
+            results['cache'] = self.run(user, options['refreshes'], cached=True)
+            results['speedup'] = {
+                'throughput_x': round(
+                    results['cache']['throughput_per_s'] / results['database']['throughput_per_s'], 2
+                ),
+            }
+        finally:
+            if not options['keep_history']:
+                self.cleanup(user)
+                user.delete()
+        write_report(self.stdout, results, options['json'])
+
+    def seed(self, user, total, expired_share, batch_size=10000):
+        now = aware_utcnow()
+        expired = int(total * expired_share)
+        for start in range(0, total, batch_size):
+            rows = OutstandingToken.objects.bulk_create(
+                OutstandingToken(
+                    user=user, jti=f"bench-{time.time_ns()}-{index}", token='',
+                    created_at=now,
+                    expires_at=now + datetime.timedelta(days=-1 if index < expired else 1),
+                )
+                for index in range(start, min(start + batch_size, total))
+            )
+            if rows[0].pk is None:
+                # Бэкенд не вернул pk из bulk_create — дочитываем
+                rows = OutstandingToken.objects.filter(jti__in=[row.jti for row in rows])
+            BlacklistedToken.objects.bulk_create(BlacklistedToken(token=row) for row in rows)
+
+    def run(self, user, refreshes, cached):
+        client = APIClient(SERVER_NAME='localhost')
+        alias = 'default' if cached else None
+        samples = []
+        with override_settings(USERS_TOKEN_BLACKLIST={'CACHE': alias}, USERS_JWT_CLAIMS={'CACHE': alias}):
+            cache = blacklist_cache()
+            if cache is not None:
+                cache.delete(READY_KEY)
+                warm_blacklist_cache()
+            refresh = client.post(
+                '/api/auth/jwt/create/', {'email': user.email, 'password': 'BenchPassword123!'}, format='json'
+            ).data['refresh']
+            with stopwatch() as elapsed, CaptureQueriesContext(connection) as queries:
+                for _ in range(refreshes):
+                    started = time.perf_counter()
+                    response = client.post('/api/auth/jwt/refresh/', {'refresh': refresh}, format='json')
+                    samples.append(time.perf_counter() - started)
+                    assert response.status_code == 200, response.content
+                    refresh = response.data['refresh']
+        user_selects = [query for query in queries.captured_queries if 'FROM "users_user"' in query['sql']]
+        return {**summarize(samples, elapsed()), 'user_selects_per_refresh': round(len(user_selects) / refreshes, 2)}
+
+    def cleanup(self, user, batch_size=10000):
+        # История и токены входа привязаны к пользователю бенчмарка; ротированные токены
+        # без пользователя удалит purge_expired_tokens после их истечения
+        while True:
+            ids = list(
+                OutstandingToken.objects.filter(user=user)
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            BlacklistedToken.objects.filter(token_id__in=ids).delete()
+            OutstandingToken.objects.filter(pk__in=ids)._raw_delete(OutstandingToken.objects.db)
+        caches['default'].delete(READY_KEY)
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+from users.tokens import warm_blacklist_cache
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет истекшие токены из OutstandingToken/BlacklistedToken небольшими пачками "
+        "(каждая — отдельная короткая транзакция) и прогревает кэш черного списка JTI. "
+        "Рассчитана на запуск по расписанию (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Токенов в одной транзакции.")
+        parser.add_argument('--pause', type=float, default=0.0, help="Пауза между пачками, секунды.")
+        parser.add_argument('--no-warm', action='store_true', help="Не прогревать кэш черного списка.")
+
+    def handle(self, *args, **options):
+        now = aware_utcnow()
+        last_pk = 0
+        purged = 0
+        while True:
+            # Проход по первичному ключу: истекшие токены — самые старые, поиск идет по индексу PK
+            ids = list(
+                OutstandingToken.objects.filter(pk__gt=last_pk, expires_at__lte=now)
+                .order_by('pk').values_list('pk', flat=True)[:options['chunk_size']]
+            )
+            if not ids:
+                break
+            with transaction.atomic():
+                # Сначала зависимые строки: удалению OutstandingToken каскадировать уже нечего
+                BlacklistedToken.objects.filter(token_id__in=ids).delete()
+                OutstandingToken.objects.filter(pk__in=ids).delete()
+            purged += len(ids)
+            last_pk = ids[-1]
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        self.stdout.write(f"Удалено истекших токенов: {purged}")
+        if not options['no_warm']:
+            self.stdout.write(f"JTI в кэше черного списка: {warm_blacklist_cache(options['chunk_size'])}")
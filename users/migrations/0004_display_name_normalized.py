@@ -0,0 +1,38 @@
+# Generated by Django 5.0.1 on 2026-10-18 16:29
+
+from django.db import migrations, models
+
+
+def backfill_normalized(apps, schema_editor):
+    # Исторические модели не вызывают User.save(), поэтому casefold считается здесь, пачками
+    User = apps.get_model('users', 'User')
+    batch = []
+    users = User.objects.exclude(display_name__isnull=True).only('pk', 'display_name')
+    for user in users.iterator(chunk_size=2000):
+        user.display_name_normalized = user.display_name.casefold() if user.display_name else None
+        batch.append(user)
+        if len(batch) >= 2000:
+            User.objects.bulk_update(batch, ['display_name_normalized'])
+            batch = []
+    User.objects.bulk_update(batch, ['display_name_normalized'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_display_name_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='display_name_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=150, null=True),
+        ),
+        migrations.RunPython(backfill_normalized, migrations.RunPython.noop),
+        # Функциональный индекс UPPER(display_name) больше не нужен
+        migrations.RemoveIndex(
+            model_name='user',
+            name='user_display_name_upper_idx',
+        ),
+    ]
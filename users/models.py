@@ -1,14 +1,49 @@
 from django.db import models
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager as BaseUserManager
+
+
+def normalize_display_name(name):
+    """Ключ регистронезависимого сравнения ников (casefold: 'Straße' и 'STRASSE' совпадают)."""
+    return name.casefold() if name else None
+
+
+class UserManager(BaseUserManager):
+    def display_name_taken(self, name):
+        """
+        Занят ли ник зарегистрированным пользователем (без учета регистра).
+        Равенство по display_name_normalized — index-only поиск, в отличие от iexact.
+        """
+        return self.filter(display_name_normalized=normalize_display_name(name)).exists()
+
 
 class User(AbstractUser):
     email = models.EmailField(unique=True)
     # Наше новое поле для "Мягкого ограничения"
     display_name = models.CharField(max_length=50, blank=True, null=True, verbose_name="Отображаемое имя")
+    # casefold(display_name): поддерживается в save(), по нему проверяются ники гостей
+    # casefold может удлинить строку (ß -> ss), поэтому длина с запасом
+    display_name_normalized = models.CharField(max_length=150, blank=True, null=True, editable=False, db_index=True)
+
+    objects = UserManager()
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'display_name'] # Добавили display_name
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Точное совпадение: бан по нику удаляет голоса пользователя с этим display_name
+            models.Index(fields=['display_name'], name='user_display_name_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Через save() проходят регистрация и PATCH /users/me/ (сериализаторы djoser) и админка;
+        # QuerySet.update(display_name=...) нормализованное имя не обновит
+        self.display_name_normalized = normalize_display_name(self.display_name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'display_name' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'display_name_normalized'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         # Показываем ник, если есть, иначе email
-        return self.display_name if self.display_name else self.email
\ No newline at end of file
+        return self.display_name if self.display_name else self.email
@@ -1,7 +1,14 @@
+import time
+
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
-from rest_framework_simplejwt.tokens import RefreshToken, TokenError
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import TokenError
+
+from .authentication import CLAIMS_ISSUED_AT, add_user_claims, refresh_claims_are_fresh, remove_user_claims
+from .tokens import CachedBlacklistRefreshToken
 
 User = get_user_model()
 
@@ -14,8 +21,8 @@ class LogoutSerializer(serializers.Serializer):
 
     def save(self, **kwargs):
         try:
-            # Создаем объект RefreshToken из строки
-            token = RefreshToken(self.token)
+            # Создаем объект RefreshToken из строки (проверка черного списка — по кэшу)
+            token = CachedBlacklistRefreshToken(self.token)
             # И отправляем его в черный список
             token.blacklist()
         except TokenError:
@@ -33,4 +40,49 @@ class CustomUserCreateSerializer(UserCreateSerializer):
 class CustomUserSerializer(UserSerializer):
     class Meta(UserSerializer.Meta):
         model = User
-        fields = ('id', 'email', 'username', 'display_name', 'is_staff')
\ No newline at end of file
+        fields = ('id', 'email', 'username', 'display_name', 'is_staff')
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """jwt/create: кладет email и display_name в токены (см. users/authentication.py)."""
+    token_class = CachedBlacklistRefreshToken
+
+    @classmethod
+    def get_token(cls, user):
+        return add_user_claims(super().get_token(user), user)
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    jwt/refresh: черный список проверяется по кэшу (users/tokens.py). Пока отметка устаревания
+    в USERS_JWT_CLAIMS['CACHE'] подтверждает, что пользователь не менялся (имя, is_active,
+    удаление), claims переносятся без SELECT; иначе перечитываются из БД, чтобы новое имя
+    попало в следующий access-токен. Ротация — как в simplejwt.
+    """
+    token_class = CachedBlacklistRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if refresh_claims_are_fresh(refresh):
+            # Claims подтверждены на текущий момент: следующий refresh отсчитывает срок от него
+            refresh[CLAIMS_ISSUED_AT] = int(time.time())
+        else:
+            self.reload_claims(refresh)
+
+        data = {'access': str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+        return data
+
+    def reload_claims(self, refresh):
+        user = User.objects.filter(**{api_settings.USER_ID_FIELD: refresh[api_settings.USER_ID_CLAIM]}).first()
+        if user is not None and user.is_active:
+            add_user_claims(refresh, user)
+        else:
+            # Без claims токен обслуживается загрузкой из БД, где и будет отклонен
+            remove_user_claims(refresh)
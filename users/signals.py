@@ -0,0 +1,37 @@
+"""
+Отметка устаревания claims JWT (см. users/authentication.py) при изменении пользователя
+и JTI черного списка в кэше (см. users/tokens.py) при любом занесении токена в черный список.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from .authentication import CLAIM_FIELDS, mark_claims_stale
+from .tokens import remember_blacklisted
+
+User = get_user_model()
+
+# Поля, от которых зависит пользователь, собранный из claims
+WATCHED_FIELDS = {*CLAIM_FIELDS, 'is_active'}
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields, **kwargs):
+    if created:
+        return
+    # Сохранение только last_login (при каждом входе) claims не затрагивает
+    if update_fields is not None and not WATCHED_FIELDS & set(update_fields):
+        return
+    mark_claims_stale(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    mark_claims_stale(instance.pk)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def token_blacklisted(sender, instance, created, **kwargs):
+    if created:
+        remember_blacklisted(instance.token.jti, instance.token.expires_at.timestamp())
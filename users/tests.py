@@ -1,8 +1,26 @@
+import datetime
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from rest_framework_simplejwt.utils import aware_utcnow
 from django.contrib.auth import get_user_model
 
+from rooms.models import Choice, Question, Room, Vote
+from .checks import check_shared_caches
+from .tokens import READY_KEY, warm_blacklist_cache
+
 User = get_user_model()
 
 
@@ -105,4 +123,245 @@ class AuthTests(APITestCase):
             'password': 'password'
         }
         response = self.client.post(self.login_url, login_data)
-        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+# В тестах один процесс — кэш процесса для отметок допустим
+@override_settings(USERS_JWT_CLAIMS={'CACHE': 'default'})
+class ClaimsAuthenticationTests(APITestCase):
+    """Пользователь для view комнат собирается из claims токена, без SELECT в users_user."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='voter@test.com', username='voter',
+            password='StrongPassword123!', display_name='Voter'
+        )
+        self.room = Room.objects.create(title="Room", slug="room", creator="Owner")
+        self.question = Question.objects.create(room=self.room, text="Q")
+        self.choice = Choice.objects.create(question=self.question, text="A")
+        self.room_url = reverse('room-detail', kwargs={'slug': self.room.slug})
+        tokens = self.client.post('/api/auth/jwt/create/', {
+            'email': 'voter@test.com', 'password': 'StrongPassword123!'
+        }).data
+        self.access, self.refresh = tokens['access'], tokens['refresh']
+
+    def authorize(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def user_selects(self, ctx):
+        return [q['sql'] for q in ctx.captured_queries if 'FROM "users_user"' in q['sql']]
+
+    def test_room_requests_skip_user_select(self):
+        """Тест 1: Просмотр комнаты и голос не загружают пользователя из БД"""
+        self.authorize(self.access)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.room_url)
+            response = self.client.post('/api/votes/', {"choice": self.choice.id})
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.user_selects(ctx), [])
+        self.assertEqual(Vote.objects.get().user, self.user)
+
+    def test_full_model_endpoints_still_work(self):
+        """Тест 2: /users/me/ и токены без claims обслуживаются загрузкой из БД"""
+        self.authorize(self.access)
+        response = self.client.get('/api/auth/users/me/')
+        self.assertEqual(response.data['username'], 'voter')
+
+        self.authorize(str(AccessToken.for_user(self.user)))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/rooms/', {"title": "Mine", "slug": "mine"})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(self.user_selects(ctx)), 1)
+        self.assertEqual(Room.objects.get(slug="mine").creator, "Voter")
+
+    def test_display_name_change_invalidates_claims(self):
+        """Тест 3: После смены имени через /users/me/ старый токен уже не отдает прежнее имя"""
+        self.authorize(self.access)
+        self.client.patch('/api/auth/users/me/', {"display_name": "Renamed"})
+
+        self.client.post('/api/rooms/', {"title": "Mine", "slug": "mine"})
+        self.assertEqual(Room.objects.get(slug="mine").creator, "Renamed")
+
+        # Обновленный токен снова несет claims, уже с новым именем
+        access = self.client.post('/api/auth/jwt/refresh/', {"refresh": self.refresh}).data['access']
+        self.assertEqual(AccessToken(access)['display_name'], "Renamed")
+
+    def test_deactivated_user_is_rejected(self):
+        """Тест 4: Деактивированный пользователь не проходит по старому токену"""
+        self.user.is_active = False
+        self.user.save()
+        self.authorize(self.access)
+        response = self.client.post('/api/votes/', {"choice": self.choice.id})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_reuses_claims_until_user_changes(self):
+        """Тест 6: jwt/refresh не читает пользователя, пока он не изменился; деактивация видна сразу"""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/auth/jwt/refresh/', {"refresh": self.refresh})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.user_selects(ctx), [])
+        self.assertEqual(AccessToken(response.data['access'])['display_name'], "Voter")
+
+        # Claims старше срока жизни отметки устаревания перечитываются из БД
+        aged = RefreshToken(response.data['refresh'])
+        aged['claims_at'] -= int(api_settings.ACCESS_TOKEN_LIFETIME.total_seconds())
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/auth/jwt/refresh/', {"refresh": str(aged)})
+        self.assertEqual(len(self.user_selects(ctx)), 1)
+
+        self.user.is_active = False
+        self.user.save()
+        access = self.client.post('/api/auth/jwt/refresh/', {"refresh": response.data['refresh']}).data['access']
+        self.assertNotIn('display_name', AccessToken(access))
+        self.authorize(access)
+        self.assertEqual(
+            self.client.post('/api/votes/', {"choice": self.choice.id}).status_code, status.HTTP_401_UNAUTHORIZED
+        )
+
+    def test_without_shared_cache_user_is_loaded_from_database(self):
+        """Тест 7: Без USERS_JWT_CLAIMS['CACHE'] claims не используются — пользователь читается из БД"""
+        self.authorize(self.access)
+        with override_settings(USERS_JWT_CLAIMS={'CACHE': None}):
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.get(self.room_url)
+            self.assertEqual(len(self.user_selects(ctx)), 1)
+            self.assertEqual([error.id for error in check_shared_caches(None)], [])
+        self.assertEqual([error.id for error in check_shared_caches(None)], ['users.E002'])
+
+
+# В тестах один процесс — кэш процесса для черного списка допустим
+@override_settings(USERS_TOKEN_BLACKLIST={'CACHE': 'default', 'READY_TTL': 900})
+class TokenBlacklistTests(APITestCase):
+    """Черный список refresh-токенов: проверка по кэшу и порционная чистка истекших."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='user@test.com', username='user',
+            password='StrongPassword123!', display_name='User'
+        )
+        self.refresh = self.client.post('/api/auth/jwt/create/', {
+            'email': 'user@test.com', 'password': 'StrongPassword123!'
+        }).data['refresh']
+
+    def refresh_token(self, token):
+        return self.client.post('/api/auth/jwt/refresh/', {"refresh": token})
+
+    def blacklist_checks(self, ctx):
+        # Проверка simplejwt — JOIN черного списка с OutstandingToken по jti
+        return [q['sql'] for q in ctx.captured_queries if 'INNER JOIN "token_blacklist_outstandingtoken"' in q['sql']]
+
+    def test_refresh_skips_blacklist_query_when_cache_is_warm(self):
+        """Тест 1: После прогрева проверка черного списка при refresh не идет в БД"""
+        warm_blacklist_cache()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.refresh_token(self.refresh)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.blacklist_checks(ctx), [])
+
+    def test_rotated_and_logged_out_tokens_are_rejected(self):
+        """Тест 2: Старый токен после ротации и токен после logout отклоняются по кэшу"""
+        warm_blacklist_cache()
+        rotated = self.refresh_token(self.refresh).data['refresh']
+        self.assertEqual(self.refresh_token(self.refresh).status_code, status.HTTP_401_UNAUTHORIZED)
+
+        access = self.refresh_token(rotated).data['access']
+        self.assertEqual(self.refresh_token(rotated).status_code, status.HTTP_401_UNAUTHORIZED)
+
+        newest = self.client.post('/api/auth/jwt/create/', {
+            'email': 'user@test.com', 'password': 'StrongPassword123!'
+        }).data['refresh']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.client.post('/api/logout/', {"refresh": newest})
+        self.assertEqual(self.refresh_token(newest).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_cold_cache_falls_back_to_database(self):
+        """Тест 3: Без прогрева (кэш сброшен) черный список проверяется по БД"""
+        warm_blacklist_cache()
+        self.refresh_token(self.refresh)
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.refresh_token(self.refresh)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(len(self.blacklist_checks(ctx)), 1)
+
+    def test_purge_removes_only_expired_tokens(self):
+        """Тест 4: Чистка пачками удаляет истекшие токены и прогревает кэш неистекшими"""
+        now = aware_utcnow()
+        for index in range(5):
+            token = OutstandingToken.objects.create(
+                user=self.user, jti=f"old-{index}", token='', expires_at=now - datetime.timedelta(hours=1)
+            )
+            BlacklistedToken.objects.create(token=token)
+        live = OutstandingToken.objects.create(
+            user=self.user, jti="live", token='', expires_at=now + datetime.timedelta(hours=1)
+        )
+        BlacklistedToken.objects.create(token=live)
+
+        call_command('purge_expired_tokens', '--chunk-size', '2', stdout=StringIO())
+
+        self.assertFalse(OutstandingToken.objects.filter(jti__startswith="old-").exists())
+        self.assertEqual(BlacklistedToken.objects.get().token, live)
+        # Токен входа из setUp еще не истек
+        self.assertTrue(OutstandingToken.objects.filter(user=self.user).exclude(jti="live").exists())
+        self.assertTrue(cache.get(READY_KEY))
+
+    def test_blacklisting_outside_our_token_class_is_honoured(self):
+        """Тест 5: Токен, занесенный в черный список штатным simplejwt (или админкой), отклоняется и при теплом кэше"""
+        warm_blacklist_cache()
+        RefreshToken(self.refresh).blacklist()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.refresh_token(self.refresh)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.blacklist_checks(ctx), [])
+
+    def test_process_local_cache_is_rejected_by_system_check(self):
+        """Тест 6: Кэш одного процесса для черного списка — ошибка users.E001; None допустим"""
+        self.assertEqual([error.id for error in check_shared_caches(None)], ['users.E001'])
+        with override_settings(USERS_TOKEN_BLACKLIST={'CACHE': None}):
+            self.assertEqual(check_shared_caches(None), [])
+
+
+class DisplayNameRegistryTests(APITestCase):
+    """Нормализованный ник (casefold) для регистронезависимой проверки ников гостей."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@test.com', username='user',
+            password='StrongPassword123!', display_name='Straße'
+        )
+
+    def test_normalized_name_follows_create_and_update(self):
+        """Тест 1: Регистрация и PATCH /users/me/ поддерживают display_name_normalized"""
+        self.assertEqual(self.user.display_name_normalized, 'strasse')
+
+        self.client.force_authenticate(user=self.user)
+        self.client.patch('/api/auth/users/me/', {"display_name": "Renamed"})
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.display_name_normalized, 'renamed')
+
+        self.user.display_name = "AGAIN"
+        self.user.save(update_fields=['display_name'])
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.display_name_normalized, 'again')
+
+    def test_guest_nickname_check_is_single_indexed_lookup(self):
+        """Тест 2: Проверка ника гостя без учета регистра — один запрос по нормализованному полю"""
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertTrue(User.objects.display_name_taken('STRASSE'))
+        self.assertFalse(User.objects.display_name_taken('Stranger'))
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertIn('"display_name_normalized" =', ctx.captured_queries[0]['sql'])
+
+    def test_benchmark_needs_explicit_size_and_disposable_database(self):
+        """Тест 3: bench_display_name_lookup требует --users и не пишет в рабочую БД без --force"""
+        with self.assertRaises(CommandError):
+            call_command('bench_display_name_lookup', stdout=StringIO())
+        with mock.patch('core.bench.uses_test_database', return_value=False), self.assertRaises(CommandError):
+            call_command('bench_display_name_lookup', users=10, lookups=4, stdout=StringIO())
+        self.assertEqual(User.objects.count(), 1)
+
+        call_command('bench_display_name_lookup', users=10, lookups=4, stdout=StringIO())
+        self.assertEqual(User.objects.count(), 1)
@@ -0,0 +1,100 @@
+"""
+Черный список refresh-токенов с проверкой по кэшу, а не по таблицам token_blacklist.
+
+С ROTATE_REFRESH_TOKENS + BLACKLIST_AFTER_ROTATION каждый refresh и logout добавляет строки
+в OutstandingToken/BlacklistedToken, а каждый refresh проверяет JOIN по ним. Здесь:
+
+  * любая новая строка BlacklistedToken (logout, ротация, RefreshToken.blacklist() simplejwt,
+    админка, shell) сразу пишет JTI в кэш USERS_TOKEN_BLACKLIST['CACHE'] — receiver post_save
+    в users/signals.py (запись живет, пока не истечет сам токен);
+  * warm_blacklist_cache() загружает в кэш все неистекшие JTI из БД и ставит отметку
+    "кэш полный" на READY_TTL секунд — пока она есть, проверка отвечает только по кэшу, не обращаясь
+    к Postgres. Ее вызывает purge_expired_tokens (запускается по расписанию чаще READY_TTL);
+  * без отметки (истекла, кэш очищен, Redis перезапущен) проверка идет в БД, как в simplejwt.
+    Поэтому строки, вставленные в обход сигналов (bulk_create, SQL), учитываются не позже
+    чем через READY_TTL.
+
+Кэш должен быть общим для всех процессов и без вытеснения ключей (Redis с noeviction),
+иначе вытесненный JTI снова станет годным до следующего прогрева. Кэш процесса (LocMemCache)
+не подходит: прогрев идет в процессе cron, а не веб-воркера — такую настройку отклоняет
+проверка users.E001 (users/checks.py). CACHE = None — проверка только по БД.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+READY_KEY = 'users:jti-blacklist:ready'
+
+DEFAULTS = {
+    'CACHE': None,
+    'READY_TTL': 900,
+}
+
+
+def blacklist_settings():
+    return {**DEFAULTS, **getattr(settings, 'USERS_TOKEN_BLACKLIST', {})}
+
+
+def blacklist_cache():
+    alias = blacklist_settings()['CACHE']
+    return caches[alias] if alias else None
+
+
+def jti_key(jti):
+    return f"users:jti-blacklist:{jti}"
+
+
+def remember_blacklisted(jti, exp):
+    cache = blacklist_cache()
+    if cache is not None:
+        cache.set(jti_key(jti), True, timeout=max(int(exp - time.time()), 1))
+
+
+def is_blacklisted(jti):
+    cache = blacklist_cache()
+    if cache is not None:
+        found = cache.get_many([jti_key(jti), READY_KEY])
+        if jti_key(jti) in found:
+            return True
+        if READY_KEY in found:
+            return False
+    return BlacklistedToken.objects.filter(token__jti=jti).exists()
+
+
+def warm_blacklist_cache(chunk_size=5000):
+    """Загружает в кэш JTI неистекших токенов черного списка. Возвращает их число."""
+    cache = blacklist_cache()
+    if cache is None:
+        return 0
+    timeout = int(api_settings.REFRESH_TOKEN_LIFETIME.total_seconds())
+    jtis = (
+        BlacklistedToken.objects.filter(token__expires_at__gt=aware_utcnow())
+        .values_list('token__jti', flat=True).iterator(chunk_size=chunk_size)
+    )
+    count = 0
+    batch = {}
+    for jti in jtis:
+        batch[jti_key(jti)] = True
+        if len(batch) >= chunk_size:
+            cache.set_many(batch, timeout=timeout)
+            count += len(batch)
+            batch = {}
+    cache.set_many(batch, timeout=timeout)
+    count += len(batch)
+    # Отметка ставится последней: до нее незагруженные JTI проверяются по БД
+    cache.set(READY_KEY, True, timeout=blacklist_settings()['READY_TTL'])
+    return count
+
+
+class CachedBlacklistRefreshToken(RefreshToken):
+    # blacklist() — как в simplejwt: JTI попадает в кэш через post_save BlacklistedToken
+    def check_blacklist(self):
+        if is_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))